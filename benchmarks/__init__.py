@@ -0,0 +1 @@
+"""Local tooling to measure the LibreLink integration without hitting LibreView."""
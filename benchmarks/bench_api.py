@@ -0,0 +1,288 @@
+"""Load benchmark for `LibreLinkAPI` and `LibreLinkDataUpdateCoordinator`.
+
+Starts a `MockLibreLinkServer` in-process and measures, for a number of
+simulated accounts:
+
+- `LibreLinkAPI._call_api` latency on `/llu/connections`,
+- `Patient.from_api_response_data` parse cost per patient,
+- memory newly allocated per patient by the parse of each poll,
+- `LibreLinkDataUpdateCoordinator._async_update_data` poll latency,
+- memory held per account (API client, coordinator and its data),
+- connection reuse of the pooled `LibreLinkSession`.
+
+Usage: `python -m benchmarks.bench_api --accounts 50 --patients 10`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+import gc
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+
+import aiohttp
+
+from custom_components.librelink.api import LibreLinkAPI, LibreLinkAPIError, Patient
+from custom_components.librelink.const import CONNECTION_URL
+from custom_components.librelink.coordinator import LibreLinkDataUpdateCoordinator
+from custom_components.librelink.session import LibreLinkSession
+from custom_components.librelink.traffic import TrafficRecorder
+from custom_components.librelink.store import LibreLinkStore
+from custom_components.librelink.throttle import HostThrottleRegistry
+
+from .common import Timings, create_hass
+from .mock_server import (
+    MockLibreLinkServer,
+    MockServerConfig,
+    _patient_id,
+    build_connections,
+)
+
+
+async def _timed(timings: Timings, call: Callable[[], Awaitable]) -> None:
+    start = time.perf_counter()
+    try:
+        await call()
+    except LibreLinkAPIError as e:
+        timings.errors[type(e).__name__] += 1
+    else:
+        timings.durations.append(time.perf_counter() - start)
+
+
+async def _login_all(
+    server: MockLibreLinkServer,
+    session: aiohttp.ClientSession,
+    accounts: int,
+    throttles: HostThrottleRegistry | None = None,
+) -> list[LibreLinkAPI]:
+    apis = [
+        LibreLinkAPI(base_url=server.url, session=session, throttles=throttles)
+        for _ in range(accounts)
+    ]
+    await asyncio.gather(
+        *(
+            api.async_login(username=f"account{index}@example.com", password="secret")
+            for index, api in enumerate(apis)
+        )
+    )
+    return apis
+
+
+def _coordinators(
+    hass, apis: list[LibreLinkAPI], tracked: int
+) -> list[LibreLinkDataUpdateCoordinator]:
+    """Create one coordinator per account, tracking its first `tracked` patients."""
+    coordinators = []
+    for index, api in enumerate(apis):
+        coordinator = LibreLinkDataUpdateCoordinator(
+            hass=hass,
+            api=api,
+            patient_id=_patient_id(0),
+            store=LibreLinkStore(hass, f"account{index}@example.com"),
+        )
+        for patient in range(1, tracked):
+            coordinator.register_patient(_patient_id(patient))
+        coordinators.append(coordinator)
+    return coordinators
+
+
+async def bench_call_api(apis: list[LibreLinkAPI], polls: int) -> Timings:
+    """Measure raw `_call_api` latency with every account polling concurrently."""
+    timings = Timings("_call_api")
+    start = time.perf_counter()
+    for _ in range(polls):
+        await asyncio.gather(
+            *(
+                _timed(timings, lambda api=api: api._call_api(url=CONNECTION_URL))
+                for api in apis
+            )
+        )
+    timings.elapsed = time.perf_counter() - start
+    return timings
+
+
+def bench_parse(patients: int, iterations: int) -> Timings:
+    """Measure `Patient.from_api_response_data` cost per patient."""
+    timings = Timings("from_api_response_data")
+    payload = build_connections(patients)
+    for _ in range(iterations):
+        for data in payload:
+            start = time.perf_counter()
+            Patient.from_api_response_data(data)
+            timings.durations.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_allocations(patients: int, polls: int) -> Timings:
+    """Measure the bytes allocated per patient by the parse of each poll.
+
+    Polls come every 30s, so every other one repeats the last reading. The
+    patients of the previous poll are kept alive while the next one is parsed,
+    as by the coordinator, so only the objects not shared between both count:
+    the garbage a poll leaves once the next one replaced it.
+    """
+    timings = Timings("allocated per patient")
+    now = datetime.now(UTC)
+    payloads = [
+        build_connections(patients, now + timedelta(seconds=30 * poll))
+        for poll in range(polls)
+    ]
+    gc.collect()
+    tracemalloc.start()
+    previous = [Patient.from_api_response_data(data) for data in payloads[0]]
+    for payload in payloads[1:]:
+        before = tracemalloc.get_traced_memory()[0]
+        current = [Patient.from_api_response_data(data) for data in payload]
+        timings.durations.append(
+            (tracemalloc.get_traced_memory()[0] - before) / patients
+        )
+        # Keeps the last poll alive while the next one is parsed.
+        previous = current
+    tracemalloc.stop()
+    del previous
+    return timings
+
+
+async def bench_coordinator(
+    coordinators: list[LibreLinkDataUpdateCoordinator], polls: int
+) -> Timings:
+    """Measure `_async_update_data` end to end for every account concurrently."""
+    timings = Timings("_async_update_data")
+    start = time.perf_counter()
+    for _ in range(polls):
+        await asyncio.gather(
+            *(
+                _timed(timings, coordinator._async_update_data)
+                for coordinator in coordinators
+            )
+        )
+    timings.elapsed = time.perf_counter() - start
+    return timings
+
+
+async def measure_memory_per_account(
+    hass,
+    server: MockLibreLinkServer,
+    session: aiohttp.ClientSession,
+    accounts: int,
+    tracked: int,
+) -> float:
+    """Return the bytes retained per account after login and one poll."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    apis = await _login_all(server, session, accounts)
+    coordinators = _coordinators(hass, apis, tracked)
+    for coordinator in coordinators:
+        try:
+            coordinator.data = await coordinator._async_update_data()
+        except LibreLinkAPIError:
+            coordinator.data = None
+
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return retained / accounts
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run every benchmark scenario and print a report."""
+    tracked = min(args.tracked or args.patients, args.patients)
+
+    config = MockServerConfig(
+        patients=args.patients,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        unauthorized_rate=args.unauthorized_rate,
+        forbidden_rate=args.forbidden_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_delay=args.timeout_delay,
+        rate_limited_rate=args.rate_limited_rate,
+        retry_after=args.retry_after,
+        compress=args.compress,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = create_hass(config_dir)
+        pool = LibreLinkSession()
+        async with MockLibreLinkServer(config) as server, pool.session as session:
+            throttles = HostThrottleRegistry() if args.throttle else None
+            apis = await _login_all(server, session, args.accounts, throttles)
+            if args.record:
+                for index, api in enumerate(apis):
+                    api.recorder = TrafficRecorder(
+                        Path(args.record) / f"account{index}.jsonl.gz"
+                    )
+            coordinators = _coordinators(hass, apis, tracked)
+
+            results = [
+                await bench_call_api(apis, args.polls),
+                bench_parse(args.patients, args.polls),
+                bench_allocations(args.patients, args.polls),
+                await bench_coordinator(coordinators, args.polls),
+            ]
+            memory = await measure_memory_per_account(
+                hass, server, session, args.accounts, tracked
+            )
+            for api in apis:
+                if api.recorder is not None:
+                    await api.recorder.async_close()
+
+    print(  # noqa: T201
+        f"accounts={args.accounts} patients/account={args.patients} "
+        f"tracked/account={tracked} polls={args.polls}"
+    )
+    for result in results:
+        if result.name == "from_api_response_data":
+            print(result.report(unit="us", scale=1e6))  # noqa: T201
+        elif result.name == "allocated per patient":
+            print(result.report(unit="B", scale=1))  # noqa: T201
+        else:
+            print(result.report())  # noqa: T201
+    print(f"{'memory per account':<28} {memory / 1024:.1f} KiB")  # noqa: T201
+    print(f"{'server requests':<28} {dict(server.requests)}")  # noqa: T201
+    print(f"{'server responses':<28} {dict(server.responses)}")  # noqa: T201
+    if throttles is not None:
+        for host, stats in throttles.stats.items():
+            print(f"{'throttle ' + host:<28} {stats}")  # noqa: T201
+    for host, stats in pool.stats.items():
+        print(f"{'connections ' + host:<28} {stats.as_dict()}")  # noqa: T201
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--patients", type=int, default=1)
+    parser.add_argument(
+        "--tracked", type=int, default=0, help="patients tracked per account (all)"
+    )
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0)
+    parser.add_argument("--forbidden-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-delay", type=float, default=30.0, help="seconds")
+    parser.add_argument("--rate-limited-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=5, help="seconds")
+    parser.add_argument(
+        "--throttle", action="store_true", help="share a per-host throttle"
+    )
+    parser.add_argument("--compress", action="store_true", help="gzip responses")
+    parser.add_argument("--record", help="directory to record the traffic into")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(_parse_args()))
@@ -0,0 +1,194 @@
+"""State write benchmark for the LibreLink sensor and binary_sensor entities.
+
+Creates the entities of every patient of an account of a `MockLibreLinkServer`,
+as the platforms do, and measures the listener notification of the coordinator
+when new readings come in:
+
+- `tick`: a refresh polls the new readings, as on schedule,
+- `full tick`: the readings are pushed with `async_set_updated_data`, which
+  notifies every entity.
+
+`--baseline REV` runs the same scenario on the integration of a git revision,
+in a subprocess, to compare both implementations.
+
+Usage: `python -m benchmarks.bench_entities --patients 50 --baseline HEAD~1`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import UTC, datetime, timedelta
+import inspect
+import logging
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_UNIT_OF_MEASUREMENT, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from custom_components.librelink import binary_sensor, sensor
+from custom_components.librelink.api import LibreLinkAPI
+from custom_components.librelink.const import CONF_PATIENT_ID, DOMAIN
+from custom_components.librelink.coordinator import LibreLinkDataUpdateCoordinator
+
+from .common import Timings, create_hass
+from .mock_server import MockLibreLinkServer, MockServerConfig, _patient_id
+
+USERNAME = "account@example.com"
+
+
+def _coordinator(
+    hass: HomeAssistant, api: LibreLinkAPI
+) -> LibreLinkDataUpdateCoordinator:
+    """Create the coordinator, with a store on the revisions persisting one."""
+    kwargs = {}
+    if "store" in inspect.signature(LibreLinkDataUpdateCoordinator).parameters:
+        from custom_components.librelink.store import LibreLinkStore
+
+        kwargs["store"] = LibreLinkStore(hass, USERNAME)
+    return LibreLinkDataUpdateCoordinator(
+        hass=hass, api=api, patient_id=_patient_id(0), **kwargs
+    )
+
+
+def _config_entry(**kwargs) -> ConfigEntry:
+    """Create a config entry, with the minor version releases from 2023.12 on require."""
+    if "minor_version" in inspect.signature(ConfigEntry).parameters:
+        kwargs["minor_version"] = 1
+    return ConfigEntry(version=1, **kwargs)
+
+
+async def _async_add_entities(
+    hass: HomeAssistant, coordinator: LibreLinkDataUpdateCoordinator, patients: int
+) -> list:
+    """Create and add the entities of every patient, without entity registry."""
+    entities = []
+    for index in range(patients):
+        entry = _config_entry(
+            domain=DOMAIN,
+            title=f"Patient{index}",
+            data={
+                CONF_USERNAME: USERNAME,
+                CONF_PATIENT_ID: _patient_id(index),
+                CONF_UNIT_OF_MEASUREMENT: "mg/dL",
+            },
+            source="user",
+        )
+        for platform in (sensor, binary_sensor):
+            await platform.async_setup_entry(hass, entry, entities.extend)
+
+    for number, entity in enumerate(entities):
+        entity.hass = hass
+        entity.entity_id = f"{DOMAIN}.bench_{number}"
+        await entity.async_added_to_hass()
+        entity.async_write_ha_state()
+    return entities
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Run the tick scenario and print a report."""
+    # Entities are added without platform, which Home Assistant warns about once each.
+    logging.getLogger("homeassistant").setLevel(logging.ERROR)
+
+    server = MockLibreLinkServer(MockServerConfig(patients=args.patients))
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = create_hass(config_dir)
+        async with server, aiohttp.ClientSession() as session:
+            server.now = datetime.now(UTC)
+            api = LibreLinkAPI(base_url=server.url, session=session)
+            await api.async_login(USERNAME, "password")
+            coordinator = _coordinator(hass, api)
+            for index in range(1, args.patients):
+                coordinator.register_patient(_patient_id(index))
+            await coordinator.async_refresh()
+            hass.data[DOMAIN] = {USERNAME: coordinator}
+
+            entities = await _async_add_entities(hass, coordinator, args.patients)
+
+            # Only the notification is measured, not the poll and its parsing.
+            durations: list[float] = []
+            update_listeners = coordinator.async_update_listeners
+
+            def _async_update_listeners() -> None:
+                start = time.perf_counter()
+                update_listeners()
+                durations.append(time.perf_counter() - start)
+
+            coordinator.async_update_listeners = _async_update_listeners
+
+            results = []
+            for timings in (Timings("tick"), Timings("full tick")):
+                durations.clear()
+                for _ in range(args.ticks):
+                    # New readings every tick.
+                    server.now += timedelta(minutes=1)
+                    if timings.name == "tick":
+                        await coordinator.async_refresh()
+                    else:
+                        coordinator.async_set_updated_data(
+                            {
+                                patient.id: patient
+                                for patient in await api.async_get_data()
+                            }
+                        )
+                timings.durations = list(durations)
+                timings.elapsed = sum(durations)
+                results.append(timings)
+            await coordinator.async_shutdown()
+
+    print(  # noqa: T201
+        f"[{args.label}] entities={len(entities)} patients={args.patients} "
+        f"ticks={args.ticks}"
+    )
+    for timings in results:
+        per_entity = sorted(timings.durations)[args.ticks // 2] / len(entities)
+        print(f"{timings.report()} per entity={per_entity * 1e6:.2f}us")  # noqa: T201
+
+
+def run_baseline(args: argparse.Namespace) -> None:
+    """Run the scenario on the integration of the `--baseline` revision."""
+    root = Path(__file__).resolve().parent.parent
+    with tempfile.TemporaryDirectory() as work_dir:
+        archive = subprocess.run(
+            ["git", "archive", args.baseline, "custom_components"],
+            cwd=root,
+            check=True,
+            capture_output=True,
+        ).stdout
+        subprocess.run(["tar", "-x", "-C", work_dir], input=archive, check=True)
+        shutil.copytree(root / "benchmarks", Path(work_dir) / "benchmarks")
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_entities",
+                f"--patients={args.patients}",
+                f"--ticks={args.ticks}",
+                f"--label={args.baseline}",
+            ],
+            cwd=work_dir,
+            check=True,
+        )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--label", default="working tree", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.baseline:
+        run_baseline(args)
+    asyncio.run(run(args))
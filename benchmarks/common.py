@@ -0,0 +1,53 @@
+"""Helpers shared by the benchmarks.
+
+Nothing of the integration is imported here, so a benchmark run with
+`--baseline` on the integration of any revision can import them.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+from homeassistant.core import HomeAssistant
+
+
+@dataclass
+class Timings:
+    """Collected durations (in seconds) and failures of one scenario."""
+
+    name: str
+    durations: list[float] = field(default_factory=list)
+    errors: Counter[str] = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    def report(self, unit: str = "ms", scale: float = 1e3) -> str:
+        """Return a one-line summary of the scenario."""
+        if not self.durations:
+            return f"{self.name:<28} no successful samples, errors={dict(self.errors)}"
+        ordered = sorted(self.durations)
+
+        def pct(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * scale
+
+        line = (
+            f"{self.name:<28} n={len(ordered):<6} "
+            f"p50={pct(0.50):8.2f}{unit} p95={pct(0.95):8.2f}{unit} "
+            f"p99={pct(0.99):8.2f}{unit} max={ordered[-1] * scale:8.2f}{unit}"
+        )
+        if self.elapsed:
+            line += f" throughput={len(ordered) / self.elapsed:8.1f}/s"
+        if self.errors:
+            line += f" errors={dict(self.errors)}"
+        return line
+
+
+def create_hass(config_dir: str) -> HomeAssistant:
+    """Return a Home Assistant instance that is not started, configured in `config_dir`."""
+    try:
+        hass = HomeAssistant()
+    except TypeError:
+        # Releases from 2024.1 on take the configuration directory.
+        return HomeAssistant(config_dir)
+    hass.config.config_dir = config_dir
+    return hass
@@ -0,0 +1,360 @@
+"""Local stand-in for the LibreLinkUp API.
+
+Serves `/llu/auth/login`, `/llu/connections` and its per-patient `graph` and
+`logbook` with a configurable number of
+patients, latency, error rates and authentication failures, so that the API
+client and the coordinator can be exercised without Abbott's servers.
+
+Run it standalone with `python -m benchmarks.mock_server --patients 50` and
+point the integration (or `benchmarks.bench_api`) at the printed URL.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+import random
+import socket
+import time
+import uuid
+
+from aiohttp import web
+
+TOKEN_DURATION_SECONDS = 15552000
+GRAPH_HOURS = 12
+GRAPH_STEP_MINUTES = 15
+
+
+@dataclass
+class MockServerConfig:
+    """Behaviour of the mock server."""
+
+    patients: int = 1
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    unauthorized_rate: float = 0.0
+    forbidden_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_delay: float = 30.0
+    rate_limited_rate: float = 0.0
+    retry_after: int = 5
+    fail_logins: bool = False
+    compress: bool = False
+    invalid_password: str = "invalid"
+    seed: int | None = None
+
+
+def _patient_id(index: int) -> str:
+    """Return a stable patient id for the given index."""
+    return str(uuid.UUID(int=index + 1))
+
+
+def build_patient(index: int, now: datetime) -> dict:
+    """Build the connection payload of one patient as returned by LibreLinkUp."""
+    minute = int(now.timestamp() // 60)
+    return {
+        "patientId": _patient_id(index),
+        "firstName": f"Patient{index}",
+        "lastName": "Mock",
+        "targetLow": 70,
+        "targetHigh": 180,
+        "sensor": {
+            "pt": 4,
+            "sn": f"0M{index:08d}",
+            "a": int(
+                (
+                    now.replace(hour=0, minute=0, second=0, microsecond=0)
+                    - timedelta(days=index % 14)
+                ).timestamp()
+            ),
+        },
+        "glucoseMeasurement": {
+            "FactoryTimestamp": now.replace(second=0, microsecond=0).strftime(
+                "%m/%d/%Y %I:%M:%S %p"
+            ),
+            "ValueInMgPerDl": 60 + (minute * 7 + index * 13) % 160,
+            "TrendArrow": 1 + (minute + index) % 5,
+        },
+    }
+
+
+def build_graph(index: int, now: datetime) -> list[dict]:
+    """Build the `graphData` list of one patient, oldest reading first."""
+    end = now.replace(second=0, microsecond=0)
+    return [
+        build_patient(index, end - timedelta(minutes=minutes))["glucoseMeasurement"]
+        for minutes in range(GRAPH_HOURS * 60, 0, -GRAPH_STEP_MINUTES)
+    ]
+
+
+def build_logbook(index: int, now: datetime) -> list[dict]:
+    """Build the logbook of one patient: an alarm per graph reading out of range."""
+    return [
+        {
+            "FactoryTimestamp": reading["FactoryTimestamp"],
+            "type": 1,
+            "ValueInMgPerDl": reading["ValueInMgPerDl"],
+            "TrendArrow": reading["TrendArrow"],
+            "alarmType": 1 if reading["ValueInMgPerDl"] > 180 else 0,
+            "isHigh": reading["ValueInMgPerDl"] > 180,
+            "isLow": reading["ValueInMgPerDl"] < 70,
+        }
+        for reading in reversed(build_graph(index, now))
+        if not 70 <= reading["ValueInMgPerDl"] <= 180
+    ]
+
+
+def build_connections(count: int, now: datetime | None = None) -> list[dict]:
+    """Build the `/llu/connections` data list for `count` patients."""
+    now = now or datetime.now(UTC)
+    return [build_patient(index, now) for index in range(count)]
+
+
+class MockLibreLinkServer:
+    """aiohttp application mimicking the LibreLinkUp endpoints."""
+
+    def __init__(self, config: MockServerConfig | None = None) -> None:
+        """Initialize the mock server."""
+        self.config = config or MockServerConfig()
+        self.requests: Counter[str] = Counter()
+        self.responses: Counter[int] = Counter()
+        self._random = random.Random(self.config.seed)
+        self._tokens: set[str] = set()
+        self._runner: web.AppRunner | None = None
+        self._socket: socket.socket | None = None
+        # Time of the readings served, the current time when None.
+        self.now: datetime | None = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/llu/auth/login", self._handle_login)
+        self.app.router.add_get("/llu/connections", self._handle_connections)
+        self.app.router.add_get(
+            "/llu/connections/{patient_id}/graph", self._handle_graph
+        )
+        self.app.router.add_get(
+            "/llu/connections/{patient_id}/logbook", self._handle_logbook
+        )
+
+    @property
+    def url(self) -> str:
+        """Return the base url to use as `base_url` of the API client."""
+        host, port = self._socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Start serving on the given host and port (0 picks a free port)."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((host, port))
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, self._socket).start()
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> MockLibreLinkServer:
+        """Start the server as an async context manager."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Stop the server when leaving the context."""
+        await self.stop()
+
+    def _ticket(self, token: str) -> dict:
+        return {
+            "token": token,
+            "expires": int(time.time()) + TOKEN_DURATION_SECONDS,
+            "duration": TOKEN_DURATION_SECONDS * 1000,
+        }
+
+    async def _simulate(self, inject_failures: bool = True) -> web.Response | None:
+        """Apply latency and failure injection, return a failure response if any."""
+        config = self.config
+        delay = config.latency + self._random.uniform(0, config.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if not inject_failures:
+            return None
+
+        draw = self._random.random()
+        if draw < config.timeout_rate:
+            await asyncio.sleep(config.timeout_delay)
+            return web.Response(status=504)
+        draw -= config.timeout_rate
+        if draw < config.error_rate:
+            return web.Response(status=500)
+        draw -= config.error_rate
+        if draw < config.rate_limited_rate:
+            return web.Response(
+                status=429, headers={"Retry-After": str(config.retry_after)}
+            )
+        return None
+
+    def _respond(self, response: web.Response) -> web.Response:
+        self.responses[response.status] += 1
+        if self.config.compress and response.body is not None:
+            response.enable_compression()
+        return response
+
+    async def _handle_login(self, request: web.Request) -> web.Response:
+        self.requests["login"] += 1
+        if (failure := await self._simulate(self.config.fail_logins)) is not None:
+            return self._respond(failure)
+
+        body = await request.json()
+        if body.get("password") == self.config.invalid_password:
+            return self._respond(web.json_response({"status": 2}))
+
+        token = uuid.uuid4().hex
+        self._tokens.add(token)
+        return self._respond(
+            web.json_response(
+                {
+                    "status": 0,
+                    "data": {
+                        "user": {
+                            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, body["email"]))
+                        },
+                        "authTicket": self._ticket(token),
+                    },
+                }
+            )
+        )
+
+    async def _authorize(self, request: web.Request) -> web.Response | None:
+        """Apply failure injection and token check, return a failure response if any."""
+        if (failure := await self._simulate()) is not None:
+            return failure
+
+        config = self.config
+        draw = self._random.random()
+        if draw < config.unauthorized_rate:
+            return web.Response(status=401)
+        if draw < config.unauthorized_rate + config.forbidden_rate:
+            return web.Response(status=403)
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in self._tokens:
+            return web.Response(status=401)
+        return None
+
+    async def _handle_connections(self, request: web.Request) -> web.Response:
+        self.requests["connections"] += 1
+        if (failure := await self._authorize(request)) is not None:
+            return self._respond(failure)
+
+        config = self.config
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        return self._respond(
+            web.json_response(
+                {
+                    "status": 0,
+                    "data": build_connections(config.patients, self.now),
+                    "ticket": self._ticket(token),
+                }
+            )
+        )
+
+    async def _handle_graph(self, request: web.Request) -> web.Response:
+        self.requests["graph"] += 1
+        if (failure := await self._authorize(request)) is not None:
+            return self._respond(failure)
+
+        index = uuid.UUID(request.match_info["patient_id"]).int - 1
+        if not 0 <= index < self.config.patients:
+            return self._respond(web.Response(status=404))
+
+        now = self.now or datetime.now(UTC)
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        return self._respond(
+            web.json_response(
+                {
+                    "status": 0,
+                    "data": {
+                        "connection": build_patient(index, now),
+                        "graphData": build_graph(index, now),
+                    },
+                    "ticket": self._ticket(token),
+                }
+            )
+        )
+
+    async def _handle_logbook(self, request: web.Request) -> web.Response:
+        self.requests["logbook"] += 1
+        if (failure := await self._authorize(request)) is not None:
+            return self._respond(failure)
+
+        index = uuid.UUID(request.match_info["patient_id"]).int - 1
+        if not 0 <= index < self.config.patients:
+            return self._respond(web.Response(status=404))
+
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        return self._respond(
+            web.json_response(
+                {
+                    "status": 0,
+                    "data": build_logbook(index, self.now or datetime.now(UTC)),
+                    "ticket": self._ticket(token),
+                }
+            )
+        )
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--patients", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0)
+    parser.add_argument("--forbidden-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-delay", type=float, default=30.0, help="seconds")
+    parser.add_argument("--rate-limited-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=5, help="seconds")
+    parser.add_argument("--fail-logins", action="store_true")
+    parser.add_argument("--compress", action="store_true", help="gzip responses")
+    return parser.parse_args()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = MockLibreLinkServer(
+        MockServerConfig(
+            patients=args.patients,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            unauthorized_rate=args.unauthorized_rate,
+            forbidden_rate=args.forbidden_rate,
+            timeout_rate=args.timeout_rate,
+            timeout_delay=args.timeout_delay,
+            rate_limited_rate=args.rate_limited_rate,
+            retry_after=args.retry_after,
+            fail_logins=args.fail_logins,
+            compress=args.compress,
+        )
+    )
+    await server.start(args.host, args.port)
+    print(f"Mock LibreLinkUp API listening on {server.url}")  # noqa: T201
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(_parse_args()))
+    except KeyboardInterrupt:
+        pass
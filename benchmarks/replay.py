@@ -0,0 +1,92 @@
+"""Replay a recorded LibreLinkUp traffic through `LibreLinkAPI`.
+
+Recordings are written by the integration when the "Record the LibreView
+traffic" option is set (`<config>/librelink/<account>.jsonl.gz`) or by
+`benchmarks.bench_api --record DIR`. Every recorded call is issued again at its
+recorded time divided by `--speed` (0 replays as fast as possible) and served
+from the recording, so parsing regressions and performance can be checked
+offline on days of traffic.
+
+Usage: `python -m benchmarks.replay recording.jsonl.gz --speed 0`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import time
+
+from custom_components.librelink.api import AuthTicket, LibreLinkAPI, LibreLinkAPIError
+from custom_components.librelink.const import CONNECTION_URL, LOGIN_URL
+from custom_components.librelink.traffic import ReplaySession, read_recording
+
+
+async def replay(path: str, speed: float) -> None:
+    """Replay a recording and print a report."""
+    exchanges = list(read_recording(path))
+    if not exchanges:
+        print("Empty recording")  # noqa: T201
+        return
+    session = ReplaySession(exchanges, speed=speed)
+    api = LibreLinkAPI(base_url="http://replay", session=session)
+    # Recorded tokens are redacted, logging in again is served from the recording.
+    await api.async_authenticate(
+        "replay",
+        "replay",
+        ticket=AuthTicket(token="replay", expires=2**31 - 1, account_id="replay"),
+    )
+
+    calls: Counter[str] = Counter()
+    errors: Counter[str] = Counter()
+    patients = 0
+    first = exchanges[0]["time"]
+    start = time.perf_counter()
+    for exchange in exchanges:
+        if exchange.get("served"):
+            continue
+        if speed:
+            delay = (exchange["time"] - first) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        url = exchange["url"]
+        if url in (LOGIN_URL, CONNECTION_URL):
+            calls[url] += 1
+        else:
+            calls[url.rsplit("/", 1)[1]] += 1
+        try:
+            if url == LOGIN_URL:
+                await api.async_login("replay", "replay")
+            elif url == CONNECTION_URL:
+                patients += len(await api.async_get_data())
+            elif url.endswith("/logbook"):
+                await api.async_get_logbook(url.split("/")[3])
+            else:
+                await api.async_get_graph(url.split("/")[3])
+        except LibreLinkAPIError as e:
+            errors[type(e).__name__] += 1
+    elapsed = time.perf_counter() - start
+
+    print(  # noqa: T201
+        f"{len(exchanges)} exchanges over {exchanges[-1]['time'] - first:.0f}s "
+        f"replayed in {elapsed:.2f}s, {session.remaining} left unserved"
+    )
+    summary = f"calls={dict(calls)} errors={dict(errors)} patients={patients}"
+    print(summary)  # noqa: T201
+    for name, summary in api.metrics.summary.items():
+        print(f"{name:<32} {summary}")  # noqa: T201
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument(
+        "--speed", type=float, default=0.0, help="speed-up factor, 0 for no delay"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    asyncio.run(replay(args.path, args.speed))
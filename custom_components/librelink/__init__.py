@@ -2,16 +2,45 @@
 
 from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import asyncio
 
-from .api import LibreLinkAPI
-from .const import CONF_PATIENT_ID, DOMAIN, LOGGER
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME, Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.typing import ConfigType
+
+from .api import LibreLinkAPI, LibreLinkAPIConnectionError
+from .const import (
+    CONF_LOGBOOK_EVENTS,
+    CONF_PATIENT_ID,
+    CONF_RECORD_TRAFFIC,
+    CONF_STALE_DATA_MAX_AGE,
+    CONF_STATISTICS_WINDOWS,
+    DATA_ACCOUNT_LOCKS,
+    DATA_THROTTLES,
+    DEFAULT_STALE_DATA_MAX_AGE_MIN,
+    DEFAULT_STATISTICS_WINDOWS,
+    DOMAIN,
+    LOGGER,
+)
 from .coordinator import LibreLinkDataUpdateCoordinator
+from .scheduler import account_phase
+from .services import async_setup_services
+from .session import async_get_session
+from .store import LibreLinkStore
+from .throttle import HostThrottleRegistry
+from .traffic import TrafficRecorder
 
 PLATFORMS: list[Platform] = [Platform.BINARY_SENSOR, Platform.SENSOR]
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the services of the integration."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -23,46 +52,185 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry.data,
     )
 
+    patient_id = entry.data[CONF_PATIENT_ID]
+
+    coordinator = await _async_get_coordinator(hass, entry)
+    _attach_traffic_recorder(hass, entry, coordinator.api, coordinator.store)
+    coordinator.register_patient(
+        patient_id,
+        _statistics_windows(entry),
+        _stale_max_age(entry),
+        entry.options.get(CONF_LOGBOOK_EVENTS, False),
+    )
+
+    # Only tracked patients are fetched, poll again for a patient added to a running account.
+    if patient_id not in coordinator.data:
+        await coordinator.async_refresh()
+        if patient_id not in (coordinator.data or {}):
+            raise ConfigEntryNotReady(f"Patient {patient_id} data is not available")
+
+    # Then launch async_setup_entry for our declared entities in sensor.py and binary_sensor.py
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    setup_options = dict(entry.options)
+
+    async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Reload the entry when its options change, not on a data update."""
+        if entry.options != setup_options:
+            await hass.config_entries.async_reload(entry.entry_id)
+
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
+    return True
+
+
+async def _async_get_coordinator(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> LibreLinkDataUpdateCoordinator:
+    """Return the coordinator of the entry account, created once for all its entries."""
     username = entry.data[CONF_USERNAME]
     password = entry.data[CONF_PASSWORD]
-    base_url = entry.data[CONF_URL]
-    patient_id = entry.data[CONF_PATIENT_ID]
 
-    domain_data = hass.data.setdefault(DOMAIN, {})
+    # Entries of one account set up concurrently wait for the first one to create it.
+    locks = hass.data.setdefault(DATA_ACCOUNT_LOCKS, {})
+    async with locks.setdefault(username, asyncio.Lock()):
+        domain_data = hass.data.setdefault(DOMAIN, {})
+        if (coordinator := domain_data.get(username)) is not None:
+            return coordinator
 
-    if username not in domain_data:
         # Using the declared API for login based on patient credentials to retreive the bearer Token
         api = LibreLinkAPI(
-            base_url=base_url,
-            session=async_get_clientsession(hass),
+            base_url=entry.data[CONF_URL],
+            session=async_get_session(hass).session,
+            throttles=hass.data.setdefault(DATA_THROTTLES, HostThrottleRegistry()),
         )
 
-        # Then getting the token.
-        await api.async_login(username=username, password=password)
-
+        # The token and last known data persisted by a previous run are reused if any.
+        store = LibreLinkStore(hass, username)
+        await store.async_load()
+        api.ticket_callback = store.async_save_ticket
+
+        @callback
+        def _async_save_base_url(base_url: str) -> None:
+            """Persist the regional url an account login was redirected to."""
+            for other in _account_entries(hass, username):
+                hass.config_entries.async_update_entry(
+                    other, data={**other.data, CONF_URL: base_url}
+                )
+
+        api.base_url_callback = _async_save_base_url
+        _attach_traffic_recorder(hass, entry, api, store)
         coordinator = LibreLinkDataUpdateCoordinator(
-            hass=hass, api=api, patient_id=patient_id
+            hass=hass,
+            api=api,
+            patient_id=entry.data[CONF_PATIENT_ID],
+            store=store,
+            phase=account_phase(username),
         )
 
-        # First poll of the data to be ready for entities initialization
-        await coordinator.async_config_entry_first_refresh()
+        snapshot = store.snapshot
+        if snapshot is not None and entry.data[CONF_PATIENT_ID] in snapshot[0]:
+            # Create the entities from the last known data at once, logging in and
+            # polling are left to a background refresh.
+            api.set_credentials(username, password, store.ticket)
+            coordinator.async_restore(*snapshot)
+        else:
+            snapshot = None
+            try:
+                await api.async_authenticate(
+                    username=username, password=password, ticket=store.ticket
+                )
+            except LibreLinkAPIConnectionError as e:
+                raise ConfigEntryNotReady(e) from e
+
+        # Track the patients of every entry of the account from the first poll on,
+        # so the entries set up next find their data without polling again.
+        for other in _account_entries(hass, username):
+            if other.disabled_by is None:
+                coordinator.register_patient(
+                    other.data[CONF_PATIENT_ID],
+                    _statistics_windows(other),
+                    _stale_max_age(other),
+                    other.options.get(CONF_LOGBOOK_EVENTS, False),
+                )
+
+        if snapshot is None:
+            # First poll of the data to be ready for entities initialization
+            await coordinator.async_config_entry_first_refresh()
+        else:
+            entry.async_create_background_task(
+                hass, coordinator.async_refresh(), name=f"{DOMAIN} first refresh"
+            )
 
         domain_data[username] = coordinator
-    else:
-        coordinator: LibreLinkDataUpdateCoordinator = domain_data[username]
-        coordinator.register_patient(patient_id)
+        return coordinator
 
-    # Then launch async_setup_entry for our declared entities in sensor.py and binary_sensor.py
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    return True
+def _account_entries(hass: HomeAssistant, username: str) -> list[ConfigEntry]:
+    """Return the entries of an account."""
+    return [
+        entry
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.data[CONF_USERNAME] == username
+    ]
+
+
+def _attach_traffic_recorder(
+    hass: HomeAssistant, entry: ConfigEntry, api: LibreLinkAPI, store: LibreLinkStore
+) -> None:
+    """Record the traffic of the account if the entry options ask for it."""
+    if entry.options.get(CONF_RECORD_TRAFFIC, False) and api.recorder is None:
+        api.recorder = TrafficRecorder(
+            hass.config.path(DOMAIN, f"{store.key}.jsonl.gz")
+        )
+
+
+def _statistics_windows(entry: ConfigEntry) -> list[int]:
+    """Return the rolling statistics windows selected in the entry options, in seconds."""
+    return [
+        int(hours) * 3600
+        for hours in entry.options.get(
+            CONF_STATISTICS_WINDOWS, DEFAULT_STATISTICS_WINDOWS
+        )
+    ]
+
+
+def _stale_max_age(entry: ConfigEntry) -> int:
+    """Return how long the last data is kept available on poll failures, in seconds."""
+    return (
+        int(entry.options.get(CONF_STALE_DATA_MAX_AGE, DEFAULT_STALE_DATA_MAX_AGE_MIN))
+        * 60
+    )
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Handle removal of an entry."""
     if unloaded := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        coordinator: LibreLinkDataUpdateCoordinator = hass.data[DOMAIN][CONF_USERNAME]
+        username = entry.data[CONF_USERNAME]
+        coordinator: LibreLinkDataUpdateCoordinator = hass.data[DOMAIN][username]
         coordinator.unregister_patient(entry.data[CONF_PATIENT_ID])
-        if coordinator.tracked_patients == 0:
-            hass.data[DOMAIN].pop(CONF_USERNAME)
+        # Patients of entries never set up may still be tracked, only loaded ones count.
+        if not any(
+            other.entry_id != entry.entry_id
+            and other.state
+            in (ConfigEntryState.LOADED, ConfigEntryState.SETUP_IN_PROGRESS)
+            for other in _account_entries(hass, username)
+        ):
+            hass.data[DOMAIN].pop(username)
+            hass.data[DATA_ACCOUNT_LOCKS].pop(username, None)
+            await coordinator.async_shutdown()
+            # The store of a reloaded entry must not overwrite the new one later.
+            await coordinator.store.async_shutdown()
+            if coordinator.api.recorder is not None:
+                await coordinator.api.recorder.async_close()
     return unloaded
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget the persisted account state once its last entry is removed."""
+    username = entry.data[CONF_USERNAME]
+    if not any(
+        other.entry_id != entry.entry_id for other in _account_entries(hass, username)
+    ):
+        # An entry whose setup failed is never unloaded, its lock is left here.
+        hass.data.get(DATA_ACCOUNT_LOCKS, {}).pop(username, None)
+        await LibreLinkStore(hass, username).async_remove()
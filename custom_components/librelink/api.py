@@ -2,24 +2,74 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from collections.abc import Awaitable, Callable, Collection
+from dataclasses import asdict, dataclass
 from datetime import UTC, datetime, timedelta
+from functools import lru_cache, partial
 from hashlib import sha256
+import json
+import logging
+import random
 import socket
+import time
+from typing import Any
+from urllib.parse import urlsplit
 
 import aiohttp
 
 from .const import (
+    API_RETRY_BACKOFF_SECONDS,
+    API_RETRY_COUNT,
     API_TIME_OUT_SECONDS,
+    BASE_URL_LIST,
     CONNECTION_URL,
+    GRAPH_URL,
+    LOGBOOK_URL,
     LOGGER,
     LOGIN_URL,
     PRODUCT,
+    TOKEN_REFRESH_MARGIN_SECONDS,
     VERSION_APP,
 )
+from .metrics import PARSE, Metrics, latency_metric, payload_metric
+from .throttle import HostThrottleRegistry, parse_retry_after
+from .traffic import TrafficRecorder
+
+
+@lru_cache(maxsize=1024)
+def _parse_timestamp(value: str) -> datetime:
+    """Parse an API timestamp, successive polls mostly repeat the same ones."""
+    return datetime.strptime(value, "%m/%d/%Y %I:%M:%S %p").replace(tzinfo=UTC)
 
 
 @dataclass
+class AuthTicket:
+    """Authentication ticket returned by the API."""
+
+    token: str
+    expires: int
+    account_id: str
+
+    def expires_within(self, seconds: float) -> bool:
+        """Return True if the ticket expires in less than the given seconds."""
+        return self.expires - time.time() < seconds
+
+    def as_dict(self) -> dict:
+        """Return the ticket as a JSON serializable dict."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> AuthTicket:
+        """Create a ticket from a dict returned by `as_dict`."""
+        return cls(
+            token=data["token"],
+            expires=data["expires"],
+            account_id=data["account_id"],
+        )
+
+
+@dataclass(frozen=True, slots=True)
 class Target:
     """Target Glucose data."""
 
@@ -27,16 +77,59 @@ class Target:
     low: int
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Measurement:
     """Measurement data."""
 
     value: int
     timestamp: datetime
-    trend: int
+    trend: int | None
+
+    @classmethod
+    def from_api_response_data(cls, data):
+        """Create a Measurement object from a glucose item of the API response data."""
+        # Graph points do not carry a trend, only the latest measurement does.
+        return _measurement(
+            data["ValueInMgPerDl"], data["FactoryTimestamp"], data.get("TrendArrow")
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class LogbookEntry:
+    """Alarm or event of the logbook of a patient."""
+
+    timestamp: datetime
+    type: int
+    value: int | None
+    trend: int | None
+    alarm_type: int | None
+    is_high: bool
+    is_low: bool
 
+    @property
+    def id(self) -> str:
+        """Return the key identifying the entry, the API gives it no id."""
+        return f"{int(self.timestamp.timestamp())}-{self.type}-{self.alarm_type}"
 
-@dataclass
+    def as_dict(self) -> dict:
+        """Return the entry as a JSON serializable dict."""
+        return asdict(self) | {"timestamp": self.timestamp.isoformat()}
+
+    @classmethod
+    def from_api_response_data(cls, data):
+        """Create a LogbookEntry object from an item of the API response data."""
+        return cls(
+            timestamp=_parse_timestamp(data["FactoryTimestamp"]),
+            type=data["type"],
+            value=data.get("ValueInMgPerDl"),
+            trend=data.get("TrendArrow"),
+            alarm_type=data.get("alarmType"),
+            is_high=data.get("isHigh", False),
+            is_low=data.get("isLow", False),
+        )
+
+
+@dataclass(frozen=True, slots=True)
 class LibreLinkDevice:
     """LibreLink device data."""
 
@@ -49,7 +142,7 @@ class LibreLinkDevice:
         return self.application_timestamp + timedelta(days=14)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Patient:
     """Patient data."""
 
@@ -65,6 +158,53 @@ class Patient:
         """Return the full name of the patient."""
         return f"{self.first_name} {self.last_name}"
 
+    def as_dict(self) -> dict:
+        """Return the patient as a JSON serializable dict."""
+        application_timestamp = self.device.application_timestamp
+        return {
+            "id": self.id,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "measurement": {
+                "value": self.measurement.value,
+                "timestamp": self.measurement.timestamp.isoformat(),
+                "trend": self.measurement.trend,
+            },
+            "target": asdict(self.target),
+            "device": {
+                "serial_number": self.device.serial_number,
+                "application_timestamp": (
+                    application_timestamp.isoformat()
+                    if application_timestamp is not None
+                    else None
+                ),
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Patient:
+        """Create a patient from a dict returned by `as_dict`."""
+        application_timestamp = data["device"]["application_timestamp"]
+        return cls(
+            id=data["id"],
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            measurement=Measurement(
+                value=data["measurement"]["value"],
+                timestamp=datetime.fromisoformat(data["measurement"]["timestamp"]),
+                trend=data["measurement"]["trend"],
+            ),
+            target=Target(**data["target"]),
+            device=LibreLinkDevice(
+                serial_number=data["device"]["serial_number"],
+                application_timestamp=(
+                    datetime.fromisoformat(application_timestamp)
+                    if application_timestamp is not None
+                    else None
+                ),
+            ),
+        )
+
     @classmethod
     def from_api_response_data(cls, data):
         """Create a Patient object from the API response data."""
@@ -72,27 +212,45 @@ class Patient:
             id=data["patientId"],
             first_name=data["firstName"],
             last_name=data["lastName"],
-            measurement=Measurement(
-                value=data["glucoseMeasurement"]["ValueInMgPerDl"],
-                timestamp=datetime.strptime(
-                    data["glucoseMeasurement"]["FactoryTimestamp"],
-                    "%m/%d/%Y %I:%M:%S %p",
-                ).replace(tzinfo=UTC),
-                trend=data["glucoseMeasurement"]["TrendArrow"],
-            ),
-            target=Target(
-                high=data["targetHigh"],
-                low=data["targetLow"],
-            ),
-            device=LibreLinkDevice(
-                serial_number=f'{data["sensor"]["pt"]}{data['sensor']['sn']}',
-                application_timestamp=datetime.fromtimestamp(
-                    data["sensor"]["a"], tz=UTC
-                ),
+            measurement=Measurement.from_api_response_data(data["glucoseMeasurement"]),
+            target=_target(data["targetHigh"], data["targetLow"]),
+            device=_device(
+                data["sensor"]["pt"], data["sensor"]["sn"], data["sensor"]["a"]
             ),
         )
 
 
+# The frozen models below are shared by every poll returning the same values, a
+# poll only allocates the ones that changed. Caches hold a few per patient.
+@lru_cache(maxsize=4096)
+def _measurement(value: int, factory_timestamp: str, trend: int | None) -> Measurement:
+    return Measurement(
+        value=value, timestamp=_parse_timestamp(factory_timestamp), trend=trend
+    )
+
+
+@lru_cache(maxsize=256)
+def _target(high: int, low: int) -> Target:
+    return Target(high=high, low=low)
+
+
+@lru_cache(maxsize=4096)
+def _device(product_type: int, serial_number: str, activation: int) -> LibreLinkDevice:
+    return LibreLinkDevice(
+        serial_number=f"{product_type}{serial_number}",
+        application_timestamp=datetime.fromtimestamp(activation, tz=UTC),
+    )
+
+
+def region_base_url(region: str) -> str:
+    """Return the base url of the API for a region code returned by a login redirect."""
+    for base_url in BASE_URL_LIST.values():
+        host = urlsplit(base_url).netloc
+        if host.startswith(f"api-{region}.") or host == f"api.libreview.{region}":
+            return base_url
+    return f"https://api-{region}.libreview.io"
+
+
 class LibreLinkAPIError(Exception):
     """Base class for exceptions in this module."""
 
@@ -113,37 +271,184 @@ class LibreLinkAPIConnectionError(LibreLinkAPIError):
         super().__init__(message or "Connection error")
 
 
+class LibreLinkAPICircuitOpenError(LibreLinkAPIConnectionError):
+    """Exception raised when requests to a failing host are suspended."""
+
+    def __init__(self) -> None:
+        """Initialize the API error."""
+        super().__init__("Host failing, requests suspended")
+
+
+class LibreLinkAPIRateLimitError(LibreLinkAPIConnectionError):
+    """Exception raised when the API asks to slow down."""
+
+    def __init__(self, retry_after: float) -> None:
+        """Initialize the API error."""
+        super().__init__(f"Rate limited, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
 class LibreLinkAPI:
     """API class for communication with the LibreLink API."""
 
-    def __init__(self, base_url: str, session: aiohttp.ClientSession) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        session: aiohttp.ClientSession,
+        throttles: HostThrottleRegistry | None = None,
+    ) -> None:
         """Initialize the API client."""
-        self._token = None
-        self._account_id = None
+        self._ticket: AuthTicket | None = None
+        self._username: str | None = None
+        self._password: str | None = None
         self._session = session
+        self._throttles = throttles
         self.base_url = base_url
+        self.ticket_callback: Callable[[AuthTicket], None] | None = None
+        self.base_url_callback: Callable[[str], None] | None = None
+        self.metrics = Metrics()
+        self.recorder: TrafficRecorder | None = None
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._connections: list[dict] | None = None
+        # Number of calls served by a request already in flight.
+        self.coalesced = 0
 
-    async def async_get_data(self):
-        """Get data from the API."""
-        response = await self._call_api(url=CONNECTION_URL)
+    @property
+    def ticket(self) -> AuthTicket | None:
+        """Return the current authentication ticket."""
+        return self._ticket
+
+    def _set_ticket(self, ticket: AuthTicket) -> None:
+        self._ticket = ticket
+        if self.ticket_callback is not None:
+            self.ticket_callback(ticket)
+
+    async def async_get_data(
+        self, patient_ids: Collection[str] | None = None
+    ) -> list[Patient]:
+        """Get data from the API, only parsing the given patients if any."""
+        return self.parse_patients(await self.async_get_connections(), patient_ids)
+
+    async def async_get_connections(self) -> list[dict]:
+        """Get the unparsed connections of the account from the API."""
+        response = await self._async_single_flight(
+            CONNECTION_URL, lambda: self._call_api(url=CONNECTION_URL)
+        )
         LOGGER.debug("Return API Status:%s ", response["status"])
         # API status return 0 if everything goes well.
         if response["status"] != 0:
             raise LibreLinkAPIConnectionError()
 
-        patients = [
-            Patient.from_api_response_data(patient) for patient in response["data"]
+        # Kept unparsed, only needed when adding another patient of the account.
+        self._connections = response["data"]
+        self._update_ticket(response)
+        return response["data"]
+
+    def parse_patients(
+        self, connections: list[dict], patient_ids: Collection[str] | None = None
+    ) -> list[Patient]:
+        """Parse the connections of the given patients if any, of all otherwise."""
+        with self.metrics.timer(PARSE):
+            patients = [
+                Patient.from_api_response_data(patient)
+                for patient in connections
+                if patient_ids is None or patient["patientId"] in patient_ids
+            ]
+
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug(
+                "Number of patients : %s/%s and patient list %s",
+                len(patients),
+                len(connections),
+                patients,
+            )
+        return patients
+
+    @property
+    def cached_patients(self) -> list[Patient] | None:
+        """Return every patient of the last connections fetched, None before any."""
+        if self._connections is None:
+            return None
+        return [Patient.from_api_response_data(data) for data in self._connections]
+
+    async def async_get_graph(self, patient_id: str) -> list[Measurement]:
+        """Get the recent glucose history of a patient from the API."""
+        url = GRAPH_URL.format(patient_id=patient_id)
+        response = await self._async_single_flight(url, lambda: self._call_api(url=url))
+        LOGGER.debug("Return API Graph Status:%s ", response["status"])
+        if response["status"] != 0:
+            raise LibreLinkAPIConnectionError()
+
+        measurements = [
+            Measurement.from_api_response_data(item)
+            for item in response["data"]["graphData"]
         ]
+        LOGGER.debug(
+            "Number of graph measurements for patient %s : %s",
+            patient_id,
+            len(measurements),
+        )
+        self._update_ticket(response)
+
+        return measurements
 
+    async def async_get_logbook(self, patient_id: str) -> list[LogbookEntry]:
+        """Get the alarms and events logged for a patient from the API, oldest first."""
+        url = LOGBOOK_URL.format(patient_id=patient_id)
+        response = await self._async_single_flight(url, lambda: self._call_api(url=url))
+        LOGGER.debug("Return API Logbook Status:%s ", response["status"])
+        if response["status"] != 0:
+            raise LibreLinkAPIConnectionError()
+
+        entries = sorted(
+            (LogbookEntry.from_api_response_data(item) for item in response["data"]),
+            key=lambda entry: entry.timestamp,
+        )
         LOGGER.debug(
-            "Number of patients : %s and patient list %s", len(patients), patients
+            "Number of logbook entries for patient %s : %s", patient_id, len(entries)
         )
-        self._token = response["ticket"]["token"]
+        self._update_ticket(response)
+
+        return entries
+
+    def _update_ticket(self, response: dict) -> None:
+        """Keep the refreshed ticket returned along authenticated responses."""
+        if ticket := response.get("ticket"):
+            self._set_ticket(
+                AuthTicket(
+                    token=ticket["token"],
+                    expires=ticket["expires"],
+                    account_id=self._ticket.account_id,
+                )
+            )
 
-        return patients
+    async def async_authenticate(
+        self, username: str, password: str, ticket: AuthTicket | None = None
+    ) -> None:
+        """Reuse a previously persisted ticket, or log in if it is missing or expiring."""
+        self.set_credentials(username, password, ticket)
+        if self._ticket is None:
+            await self.async_login(username, password)
+
+    def set_credentials(
+        self, username: str, password: str, ticket: AuthTicket | None = None
+    ) -> None:
+        """Store the credentials used to log in when the first call needs it.
+
+        A persisted ticket is reused unless it is expiring.
+        """
+        self._username = username
+        self._password = password
+        if ticket is not None and not ticket.expires_within(
+            TOKEN_REFRESH_MARGIN_SECONDS
+        ):
+            LOGGER.debug("Reusing persisted authentication ticket")
+            self._ticket = ticket
 
     async def async_login(self, username: str, password: str) -> str:
         """Get token from the API."""
+        self._username = username
+        self._password = password
         response = await self._call_api(
             url=LOGIN_URL,
             data={"email": username, "password": password},
@@ -153,8 +458,56 @@ class LibreLinkAPI:
         if response["status"] == 2:
             raise LibreLinkAPIAuthenticationError()
 
-        self._token = response["data"]["authTicket"]["token"]
-        self._account_id = response["data"]["user"]["id"]
+        if response["data"].get("redirect"):
+            # The account lives in another region, log in again there and stay there.
+            base_url = region_base_url(response["data"]["region"])
+            if base_url == self.base_url:
+                raise LibreLinkAPIConnectionError("Redirect loop")
+            LOGGER.debug("Login redirected to region %s", response["data"]["region"])
+            previous, self.base_url = self.base_url, base_url
+            try:
+                await self.async_login(username, password)
+            except LibreLinkAPIError:
+                self.base_url = previous
+                raise
+            # Only a region the account logged in to is kept.
+            if self.base_url_callback is not None:
+                self.base_url_callback(self.base_url)
+            return
+
+        self._set_ticket(
+            AuthTicket(
+                token=response["data"]["authTicket"]["token"],
+                expires=response["data"]["authTicket"]["expires"],
+                account_id=response["data"]["user"]["id"],
+            )
+        )
+
+    async def _async_relogin(self) -> None:
+        """Log in again with the stored credentials."""
+        if self._username is None:
+            raise LibreLinkAPIAuthenticationError()
+        await self._async_single_flight(
+            LOGIN_URL, lambda: self.async_login(self._username, self._password)
+        )
+
+    async def _async_single_flight(
+        self, key: str, call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run a call once for every concurrent caller using the same key."""
+        if (task := self._in_flight.get(key)) is None:
+            task = self._in_flight[key] = asyncio.create_task(call())
+            task.add_done_callback(partial(self._single_flight_done, key))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def _single_flight_done(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Retrieved here in case every caller was cancelled meanwhile.
+            task.exception()
 
     async def _call_api(
         self,
@@ -162,33 +515,140 @@ class LibreLinkAPI:
         data: dict | None = None,
         authenticated: bool = True,
     ) -> any:
-        """Get information from the API."""
+        """Get information from the API, logging in again once if the token is rejected."""
+        with self.metrics.timer(latency_metric(url)):
+            if not authenticated:
+                return await self._request(url, data)
+
+            if self._ticket is None or self._ticket.expires_within(
+                TOKEN_REFRESH_MARGIN_SECONDS
+            ):
+                LOGGER.debug("Authentication ticket missing or expiring, logging in")
+                await self._async_relogin()
+            try:
+                return await self._request(url, data, self._ticket)
+            except LibreLinkAPIAuthenticationError:
+                LOGGER.debug("Authentication ticket rejected, logging in again")
+                await self._async_relogin()
+                return await self._request(url, data, self._ticket)
+
+    async def _request(
+        self,
+        url: str,
+        data: dict | None = None,
+        ticket: AuthTicket | None = None,
+    ) -> any:
+        """Send a single request to the API."""
         headers = {
             "product": PRODUCT,
             "version": VERSION_APP,
         }
-        if authenticated:
+        if ticket is not None:
             headers |= {
-                'Authorization': f'Bearer {self._token}',
-                'Account-Id': sha256(self._account_id.encode()).hexdigest()
+                "Authorization": f"Bearer {ticket.token}",
+                "Account-Id": sha256(ticket.account_id.encode()).hexdigest(),
             }
 
-        call_method = self._session.post if data else self._session.get
+        for attempt in range(API_RETRY_COUNT + 1):
+            try:
+                return await self._send_throttled(url, headers, data)
+            except (LibreLinkAPIRateLimitError, LibreLinkAPICircuitOpenError):
+                raise
+            except LibreLinkAPIConnectionError as e:
+                if attempt == API_RETRY_COUNT:
+                    raise
+                delay = random.uniform(0, API_RETRY_BACKOFF_SECONDS * 2**attempt)
+                LOGGER.debug("%s, retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+
+    async def _send_throttled(self, url: str, headers: dict, data: dict | None) -> any:
+        """Send a request through the throttle and circuit breaker of the host."""
+        if self._throttles is None:
+            return await self._send(url, headers, data)
+
+        throttle = self._throttles.get(self.base_url)
+        if not throttle.breaker.allow():
+            raise LibreLinkAPICircuitOpenError()
+        async with throttle.slot():
+            try:
+                response = await self._send(url, headers, data)
+            except LibreLinkAPIRateLimitError as e:
+                # The host answered, it only asks to slow down.
+                throttle.retry_after(e.retry_after)
+                throttle.breaker.record_success()
+                raise
+            except LibreLinkAPIConnectionError:
+                throttle.breaker.record_failure()
+                raise
+            except LibreLinkAPIError:
+                # Rejected credentials and undecodable bodies are answers too.
+                throttle.breaker.record_success()
+                raise
+            finally:
+                # A cancelled trial request must not keep the circuit open.
+                throttle.breaker.end_trial()
+            throttle.breaker.record_success()
+            return response
+
+    async def _send(self, url: str, headers: dict, data: dict | None) -> any:
+        method = "POST" if data else "GET"
+        start = time.monotonic()
         try:
-            response = await call_method(
-                url=self.base_url + url,
+            # Releasing the response returns its connection to the pool.
+            async with self._session.request(
+                method,
+                self.base_url + url,
                 headers=headers,
                 json=data,
                 timeout=aiohttp.ClientTimeout(total=API_TIME_OUT_SECONDS),
-            )
-            LOGGER.debug("response.status: %s", response.status)
-            if response.status in (401, 403):
-                raise LibreLinkAPIAuthenticationError()
-            response.raise_for_status()
-            return await response.json()
+            ) as response:
+                body = await response.read()
         except TimeoutError as e:
+            self._record(method, url, data, start, error="timeout")
             raise LibreLinkAPIConnectionError("Timeout Error") from e
         except (aiohttp.ClientError, socket.gaierror) as e:
+            self._record(method, url, data, start, error=repr(e))
             raise LibreLinkAPIConnectionError() from e
-        except Exception as e:
+        self._record(method, url, data, start, response, body)
+
+        LOGGER.debug("response.status: %s", response.status)
+        if response.status in (401, 403):
+            raise LibreLinkAPIAuthenticationError()
+        if response.status == 429 or (
+            response.status == 503 and "Retry-After" in response.headers
+        ):
+            raise LibreLinkAPIRateLimitError(
+                parse_retry_after(response.headers.get("Retry-After"))
+            )
+        if response.status >= 400:
+            raise LibreLinkAPIConnectionError(f"HTTP error {response.status}")
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
             raise LibreLinkAPIError() from e
+        self.metrics.record(payload_metric(url), len(body))
+        return payload
+
+    def _record(
+        self,
+        method: str,
+        url: str,
+        data: dict | None,
+        start: float,
+        response: aiohttp.ClientResponse | None = None,
+        body: bytes = b"",
+        error: str | None = None,
+    ) -> None:
+        """Hand an exchange to the traffic recorder, if any."""
+        if self.recorder is None:
+            return
+        self.recorder.record(
+            method,
+            url,
+            data,
+            time.monotonic() - start,
+            status=response.status if response is not None else None,
+            headers=response.headers if response is not None else None,
+            body=body,
+            error=error,
+        )
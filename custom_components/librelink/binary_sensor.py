@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from abc import abstractmethod
+
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
     BinarySensorEntity,
@@ -11,7 +13,15 @@ from homeassistant.const import CONF_USERNAME
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import CONF_PATIENT_ID, DOMAIN
+from .const import (
+    CONF_PATIENT_ID,
+    CONF_PREDICTION_HORIZON,
+    CONF_PREDICTION_HYSTERESIS,
+    DEFAULT_PREDICTION_HORIZON_MIN,
+    DEFAULT_PREDICTION_HYSTERESIS,
+    DOMAIN,
+    TREND_WINDOW_SECONDS,
+)
 from .coordinator import LibreLinkDataUpdateCoordinator
 from .sensor import LibreLinkSensorBase
 
@@ -28,10 +38,20 @@ async def async_setup_entry(
     ]
 
     pid = config_entry.data[CONF_PATIENT_ID]
+    minutes = int(
+        config_entry.options.get(
+            CONF_PREDICTION_HORIZON, DEFAULT_PREDICTION_HORIZON_MIN
+        )
+    )
+    hysteresis = config_entry.options.get(
+        CONF_PREDICTION_HYSTERESIS, DEFAULT_PREDICTION_HYSTERESIS
+    )
 
     sensors = [
         HighSensor(coordinator, pid),
         LowSensor(coordinator, pid),
+        PredictedHighSensor(coordinator, pid, minutes, hysteresis),
+        PredictedLowSensor(coordinator, pid, minutes, hysteresis),
     ]
     async_add_entities(sensors)
 
@@ -39,35 +59,99 @@ async def async_setup_entry(
 class LibreLinkBinarySensor(LibreLinkSensorBase, BinarySensorEntity):
     """LibreLink Binary Sensor class."""
 
+    _attr_device_class = BinarySensorDeviceClass.SAFETY
+    data_fields = frozenset({"measurement", "target"})
+
+    _state_value = False
+
     @property
-    def device_class(self) -> str:
-        """Return the class of this device."""
-        return BinarySensorDeviceClass.SAFETY
+    def is_on(self) -> bool:
+        """Return the state computed on the last update."""
+        return self._state_value
 
 
 class HighSensor(LibreLinkBinarySensor):
     """High Sensor class."""
 
-    @property
-    def name(self) -> str:
-        """Return the name of the binary_sensor."""
-        return "Is High"
+    _attr_name = "Is High"
 
-    @property
-    def is_on(self) -> bool:
-        """Return true if the binary_sensor is on."""
-        return self._data.measurement.value >= self._data.target.high
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        data = self._data
+        self._state_value = data.measurement.value >= data.target.high
 
 
 class LowSensor(LibreLinkBinarySensor):
     """Low Sensor class."""
 
-    @property
-    def name(self) -> str:
-        """Return the name of the binary_sensor."""
-        return "Is Low"
-
-    @property
-    def is_on(self) -> bool:
-        """Return true if the binary_sensor is on."""
-        return self._data.measurement.value <= self._data.target.low
+    _attr_name = "Is Low"
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        data = self._data
+        self._state_value = data.measurement.value <= data.target.low
+
+
+class PredictedSensor(LibreLinkBinarySensor):
+    """Early warning of a threshold the trend predicts to be crossed.
+
+    The sensor turns on when the value projected `minutes` ahead crosses the
+    threshold and back off only once it clears it by `hysteresis` mg/dL, so a
+    projection hovering around the threshold does not flap.
+    """
+
+    def __init__(
+        self,
+        coordinator: LibreLinkDataUpdateCoordinator,
+        pid: str,
+        minutes: int,
+        hysteresis: float,
+    ) -> None:
+        """Initialize the binary sensor class."""
+        super().__init__(coordinator, pid)
+        self.window = coordinator.histories[pid].add_window(TREND_WINDOW_SECONDS)
+        self.minutes = minutes
+        self.hysteresis = hysteresis
+
+    @abstractmethod
+    def _crossed(self, projection: float, margin: float) -> bool:
+        """Return True if the projection is beyond the threshold moved by `margin`."""
+
+    def _is_available(self) -> bool:
+        """Return if enough readings were kept to fit a trend."""
+        if self.window.slope is None:
+            # The warning starts over once a trend can be fitted again.
+            self._state_value = False
+            return False
+        return super()._is_available()
+
+    def _update_state(self) -> None:
+        """Evaluate the newest projection against the previous state."""
+        projection = self.window.projection(self.minutes * 60)
+        self._state_value = self._crossed(
+            projection, self.hysteresis if self._state_value else 0
+        )
+        self._state_attributes = {
+            "Horizon": self.minutes,
+            "Projected value": round(projection),
+        }
+
+
+class PredictedHighSensor(PredictedSensor):
+    """Predicted High Sensor class."""
+
+    _attr_name = "Predicted High"
+
+    def _crossed(self, projection: float, margin: float) -> bool:
+        """Return True if the projection reaches the high target lowered by `margin`."""
+        return projection >= self._data.target.high - margin
+
+
+class PredictedLowSensor(PredictedSensor):
+    """Predicted Low Sensor class."""
+
+    _attr_name = "Predicted Low"
+
+    def _crossed(self, projection: float, margin: float) -> bool:
+        """Return True if the projection reaches the low target raised by `margin`."""
+        return projection <= self._data.target.low + margin
@@ -11,8 +11,12 @@ from homeassistant.const import (
     CONF_URL,
     CONF_USERNAME,
 )
-from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.core import callback
 from homeassistant.helpers.selector import (
+    BooleanSelector,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
     SelectOptionDict,
     SelectSelector,
     SelectSelectorConfig,
@@ -28,20 +32,55 @@ from .api import (
     LibreLinkAPIConnectionError,
     LibreLinkAPIError,
 )
-from .const import BASE_URL_LIST, CONF_PATIENT_ID, DOMAIN, LOGGER
+from .const import (
+    BASE_URL_LIST,
+    CONF_GLUCOSE_PROFILE,
+    CONF_LOGBOOK_EVENTS,
+    CONF_MEASUREMENT_STATISTICS,
+    CONF_METRICS_SENSORS,
+    CONF_PATIENT_ID,
+    CONF_PREDICTION_HORIZON,
+    CONF_PREDICTION_HYSTERESIS,
+    CONF_RECORD_TRAFFIC,
+    CONF_STALE_DATA_MAX_AGE,
+    CONF_STATISTICS_WINDOWS,
+    DEFAULT_PREDICTION_HORIZON_MIN,
+    DEFAULT_PREDICTION_HYSTERESIS,
+    DEFAULT_STALE_DATA_MAX_AGE_MIN,
+    DEFAULT_STATISTICS_WINDOWS,
+    DOMAIN,
+    LOGGER,
+    STATISTICS_WINDOW_HOURS,
+)
+from .session import async_get_session
 from .units import UNITS_OF_MEASUREMENT
 
+# Account selector value used to log in with another account.
+NEW_ACCOUNT = "new_account"
+
 
 class LibreLinkFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for LibreLink."""
 
     VERSION = 1
+    _new_account = False
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> LibreLinkOptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return LibreLinkOptionsFlowHandler(config_entry)
 
     async def async_step_user(
         self,
         user_input: dict | None = None,
     ) -> config_entries.FlowResult:
         """Handle a flow initialized by the user."""
+        if user_input is None and not self._new_account and self.hass.data.get(DOMAIN):
+            return await self.async_step_account()
+
         _errors = {}
         if user_input is not None:
             try:
@@ -50,12 +89,13 @@ class LibreLinkFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 base_url = user_input[CONF_URL]
 
                 client = LibreLinkAPI(
-                    base_url=base_url, session=async_create_clientsession(self.hass)
+                    base_url=base_url, session=async_get_session(self.hass).session
                 )
                 await client.async_login(username, password)
 
                 self.patients = await client.async_get_data()
-                self.basic_info = user_input
+                # Keep the regional url the login may have been redirected to.
+                self.basic_info = user_input | {CONF_URL: client.base_url}
 
                 return await self.async_step_patient()
             except LibreLinkAPIAuthenticationError as e:
@@ -96,6 +136,61 @@ class LibreLinkFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             errors=_errors,
         )
 
+    async def async_step_account(self, user_input=None):
+        """Let the user pick an account already set up, or add another one."""
+        if user_input is not None:
+            username = user_input[CONF_USERNAME]
+            if username == NEW_ACCOUNT:
+                self._new_account = True
+                return await self.async_step_user()
+
+            # The running account is already logged in, reuse its last fetched patients.
+            coordinator = self.hass.data[DOMAIN][username]
+            configured = set()
+            for entry in self._async_current_entries():
+                if entry.data[CONF_USERNAME] == username:
+                    configured.add(entry.data[CONF_PATIENT_ID])
+                    self.basic_info = {
+                        CONF_USERNAME: username,
+                        CONF_PASSWORD: entry.data[CONF_PASSWORD],
+                        CONF_URL: coordinator.api.base_url,
+                    }
+            try:
+                patients = coordinator.api.cached_patients
+                if patients is None:
+                    patients = await coordinator.api.async_get_data()
+            except LibreLinkAPIError as e:
+                LOGGER.error(e)
+                return self.async_abort(reason="connection")
+
+            self.patients = [
+                patient for patient in patients if patient.id not in configured
+            ]
+            if not self.patients:
+                return self.async_abort(reason="no_patients")
+            return await self.async_step_patient()
+
+        return self.async_show_form(
+            step_id="account",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_USERNAME): SelectSelector(
+                        SelectSelectorConfig(
+                            options=[
+                                SelectOptionDict(value=username, label=username)
+                                for username in self.hass.data[DOMAIN]
+                            ]
+                            + [
+                                SelectOptionDict(
+                                    value=NEW_ACCOUNT, label="Another account"
+                                )
+                            ],
+                        )
+                    ),
+                }
+            ),
+        )
+
     async def async_step_patient(self, user_input=None):
         """Handle a flow to select specific patient."""
         if user_input is not None:
@@ -132,3 +227,99 @@ class LibreLinkFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 }
             ),
         )
+
+
+class LibreLinkOptionsFlowHandler(config_entries.OptionsFlow):
+    """Options flow for LibreLink."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options of a patient."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_STATISTICS_WINDOWS,
+                        default=options.get(
+                            CONF_STATISTICS_WINDOWS, DEFAULT_STATISTICS_WINDOWS
+                        ),
+                    ): SelectSelector(
+                        SelectSelectorConfig(
+                            options=[str(hours) for hours in STATISTICS_WINDOW_HOURS],
+                            multiple=True,
+                            mode=SelectSelectorMode.DROPDOWN,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_STALE_DATA_MAX_AGE,
+                        default=options.get(
+                            CONF_STALE_DATA_MAX_AGE, DEFAULT_STALE_DATA_MAX_AGE_MIN
+                        ),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=120,
+                            step=1,
+                            unit_of_measurement="min",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_PREDICTION_HORIZON,
+                        default=options.get(
+                            CONF_PREDICTION_HORIZON, DEFAULT_PREDICTION_HORIZON_MIN
+                        ),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=5,
+                            max=60,
+                            step=5,
+                            unit_of_measurement="min",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_PREDICTION_HYSTERESIS,
+                        default=options.get(
+                            CONF_PREDICTION_HYSTERESIS, DEFAULT_PREDICTION_HYSTERESIS
+                        ),
+                    ): NumberSelector(
+                        NumberSelectorConfig(
+                            min=0,
+                            max=50,
+                            step=1,
+                            unit_of_measurement="mg/dL",
+                            mode=NumberSelectorMode.BOX,
+                        )
+                    ),
+                    vol.Required(
+                        CONF_MEASUREMENT_STATISTICS,
+                        default=options.get(CONF_MEASUREMENT_STATISTICS, True),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        CONF_GLUCOSE_PROFILE,
+                        default=options.get(CONF_GLUCOSE_PROFILE, False),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        CONF_LOGBOOK_EVENTS,
+                        default=options.get(CONF_LOGBOOK_EVENTS, False),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        CONF_METRICS_SENSORS,
+                        default=options.get(CONF_METRICS_SENSORS, False),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        CONF_RECORD_TRAFFIC,
+                        default=options.get(CONF_RECORD_TRAFFIC, False),
+                    ): BooleanSelector(),
+                }
+            ),
+        )
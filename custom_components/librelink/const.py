@@ -11,6 +11,8 @@ VERSION: Final = "1.2.3"
 ATTRIBUTION: Final = "Data provided by https://libreview.com"
 LOGIN_URL: Final = "/llu/auth/login"
 CONNECTION_URL: Final = "/llu/connections"
+GRAPH_URL: Final = "/llu/connections/{patient_id}/graph"
+LOGBOOK_URL: Final = "/llu/connections/{patient_id}/logbook"
 BASE_URL_LIST: Final = {
     "Global": "https://api.libreview.io",
     "Arab Emirates": "https://api-ae.libreview.io",
@@ -44,6 +46,89 @@ GLUCOSE_TREND_MESSAGE: Final = {
 
 
 CONF_PATIENT_ID: Final = "patient_id"
+CONF_STATISTICS_WINDOWS: Final = "statistics_windows"
+CONF_STALE_DATA_MAX_AGE: Final = "stale_data_max_age"
+CONF_METRICS_SENSORS: Final = "metrics_sensors"
+CONF_RECORD_TRAFFIC: Final = "record_traffic"
+CONF_MEASUREMENT_STATISTICS: Final = "measurement_statistics"
+CONF_LOGBOOK_EVENTS: Final = "logbook_events"
+CONF_GLUCOSE_PROFILE: Final = "glucose_profile"
+
+STATISTICS_WINDOW_HOURS: Final = (1, 3, 6, 12, 24, 72, 168, 336)
+DEFAULT_STATISTICS_WINDOWS: Final = ["24"]
+DEFAULT_STALE_DATA_MAX_AGE_MIN: Final = 15
+CONF_PREDICTION_HORIZON: Final = "prediction_horizon"
+CONF_PREDICTION_HYSTERESIS: Final = "prediction_hysteresis"
+DEFAULT_PREDICTION_HORIZON_MIN: Final = 15
+DEFAULT_PREDICTION_HYSTERESIS: Final = 10
+
+# Rate of change fitted over the readings of the last minutes.
+TREND_WINDOW_SECONDS: Final = 15 * 60
+TREND_MIN_READINGS: Final = 3
+
+# Ambulatory glucose profile: percentiles of the readings of every time of day
+# bucket, in the local time zone, over the last days.
+AGP_DAYS: Final = 14
+AGP_BUCKET_MINUTES: Final = 15
+AGP_PERCENTILES: Final = (5, 25, 50, 75, 95)
+
+# Logbook polled at most once per interval, entries at most that old before the
+# newest one processed are checked against the ids of the last entries seen.
+LOGBOOK_INTERVAL_SECONDS: Final = 5 * 60
+LOGBOOK_LOOKBACK_SECONDS: Final = 24 * 60 * 60
+LOGBOOK_SEEN_IDS: Final = 256
+EVENT_LOGBOOK_ENTRY: Final = f"{DOMAIN}_logbook_entry"
+
+# Rows written at once by the history export.
+EXPORT_CHUNK_ROWS: Final = 10_000
+
+# Period of the long-term statistics published for every patient.
+LONG_TERM_STATISTICS_SECONDS: Final = 60 * 60
+# Hours are imported a while after their end, the last readings of an hour may
+# reach LibreLinkUp late.
+STATISTICS_IMPORT_DELAY_SECONDS: Final = 5 * 60
 
 REFRESH_RATE_MIN: Final = 1
+MEASUREMENT_INTERVAL_SECONDS: Final = 60
+POLL_MARGIN_SECONDS: Final = 5
+POLL_MIN_INTERVAL_SECONDS: Final = 10
+POLL_MAX_INTERVAL_SECONDS: Final = 10 * 60
+POLL_RETRY_INTERVAL_SECONDS: Final = 15
+POLL_RETRY_COUNT: Final = 3
+STALE_MEASUREMENT_SECONDS: Final = 15 * 60
+POLL_PHASE_SPREAD_SECONDS: Final = 10
+# Accounts following many patients parse every patient on every poll, but only
+# notify the entities of the patients out of or near their target range, the
+# other ones are hashed into shards notified in turn at a slower cadence.
+SHARDING_MIN_PATIENTS: Final = 20
+SHARD_STABLE_COUNT: Final = 5
+SHARD_STABLE_INTERVAL_SECONDS: Final = 5 * 60
+SHARD_NEAR_TARGET_MG_DL: Final = 20
 API_TIME_OUT_SECONDS: Final = 20
+TOKEN_REFRESH_MARGIN_SECONDS: Final = 24 * 60 * 60
+
+# Requests sent to one LibreView host by every account of the instance.
+THROTTLE_RATE_PER_SECOND: Final = 2.0
+THROTTLE_BURST: Final = 5
+THROTTLE_CONCURRENCY: Final = 4
+THROTTLE_DEFAULT_RETRY_AFTER_SECONDS: Final = 60
+
+API_RETRY_COUNT: Final = 2
+API_RETRY_BACKOFF_SECONDS: Final = 1.0
+BREAKER_FAILURE_THRESHOLD: Final = 5
+BREAKER_COOLDOWN_SECONDS: Final = 30
+BREAKER_MAX_COOLDOWN_SECONDS: Final = 10 * 60
+
+HTTP_CONNECTIONS_PER_HOST: Final = THROTTLE_CONCURRENCY
+HTTP_KEEPALIVE_SECONDS: Final = 2 * 60
+HTTP_DNS_CACHE_SECONDS: Final = 5 * 60
+
+METRICS_SAMPLE_SIZE: Final = 256
+
+DATA_ACCOUNT_LOCKS: Final = f"{DOMAIN}_account_locks"
+DATA_SESSION: Final = f"{DOMAIN}_session"
+DATA_THROTTLES: Final = f"{DOMAIN}_throttles"
+
+STORAGE_VERSION: Final = 1
+STORAGE_SAVE_DELAY_SECONDS: Final = 10
+SNAPSHOT_SAVE_INTERVAL_SECONDS: Final = 5 * 60
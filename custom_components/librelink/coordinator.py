@@ -2,27 +2,93 @@
 
 from __future__ import annotations
 
-from datetime import timedelta
+import asyncio
+from collections.abc import Iterable
+from datetime import datetime, timedelta
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
-from .api import LibreLinkAPI, Patient
-from .const import DOMAIN, LOGGER, REFRESH_RATE_MIN
+from .api import LibreLinkAPI, LibreLinkAPIConnectionError, LibreLinkAPIError, Patient
+from .const import (
+    DEFAULT_STALE_DATA_MAX_AGE_MIN,
+    DOMAIN,
+    LOGGER,
+    REFRESH_RATE_MIN,
+    SHARD_STABLE_COUNT,
+    SHARD_STABLE_INTERVAL_SECONDS,
+    SHARDING_MIN_PATIENTS,
+)
+from .history import GlucoseHistory
+from .logbook import LibreLinkLogbook
+from .metrics import UPDATE
+from .scheduler import PatientShard, PollScheduler, near_target, stable_shard
+from .statistics import LibreLinkHistoryBackfill, LibreLinkStatisticsWriter
+from .store import LibreLinkStore
+
+# Patient fields compared between polls to notify only the entities depending on them.
+PATIENT_FIELDS = ("first_name", "last_name", "measurement", "target", "device")
 
 
 class LibreLinkDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Patient]]):
-    """Class to manage fetching data from the API. single endpoint."""
+    """Class to manage fetching data from the API. single endpoint.
+
+    The connections of the account are fetched and every patient parsed once
+    per poll, by shard, so histories and statistics see every reading. Below
+    `SHARDING_MIN_PATIENTS` the listeners of every patient are notified on
+    every poll. Above, only the ones of patients out of or near their target
+    range are, the other patients are spread over stable shards notified in
+    turn once per `SHARD_STABLE_INTERVAL_SECONDS`. A shard whose parse fails
+    keeps its last data, the other ones are updated.
+    """
 
     def __init__(
         self,
         hass: HomeAssistant,
         api: LibreLinkAPI,
         patient_id: str,
+        store: LibreLinkStore,
+        phase: float = 0.0,
     ) -> None:
         """Initialize."""
         self.api: LibreLinkAPI = api
-        self._tracked_patients: set[str] = {patient_id}
+        self.store = store
+        self._tracked_patients: set[str] = set()
+        self.histories: dict[str, GlucoseHistory] = {}
+        # Maximum age in seconds of the data kept available for each patient on poll failures.
+        self.stale_max_ages: dict[str, int] = {}
+        # Patients whose logbook entries are fired as events.
+        self.logbook_patients: set[str] = set()
+        self.data_timestamp: datetime | None = None
+        self.serving_stale = False
+        # Fields changed by the last poll for each patient, None when everything must update.
+        self._changes: dict[str, set[str]] | None = None
+        self._notified_success: bool | None = None
+        self._scheduler = PollScheduler(phase)
+        self._backfill = LibreLinkHistoryBackfill(hass, api, store)
+        self._statistics = LibreLinkStatisticsWriter(hass, store)
+        self._logbook = LibreLinkLogbook(hass, api, store)
+        # Patients notified on every poll first, then the stable shards.
+        self._shards = [PatientShard("near_target")] + [
+            PatientShard(
+                f"stable_{index}",
+                SHARD_STABLE_INTERVAL_SECONDS,
+                (index + 1) / SHARD_STABLE_COUNT,
+            )
+            for index in range(SHARD_STABLE_COUNT)
+        ]
+        self._shard_of: dict[str, PatientShard] = {}
+        # When the data of each patient was last parsed, and the patients whose
+        # shard failed to parse on the last attempt.
+        self._parsed: dict[str, datetime] = {}
+        self._parse_failed: set[str] = set()
+        # Changed fields of the patients of stable shards not notified yet.
+        self._pending: dict[str, set[str]] = {}
+        # Listeners by patient, the ones without context under None.
+        self._patient_listeners: dict[
+            str | None, dict[CALLBACK_TYPE, CALLBACK_TYPE]
+        ] = {}
 
         super().__init__(
             hass=hass,
@@ -30,20 +96,279 @@ class LibreLinkDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Patient]]):
             name=DOMAIN,
             update_interval=timedelta(minutes=REFRESH_RATE_MIN),
         )
+        self.register_patient(patient_id)
 
-    def register_patient(self, patient_id: str) -> None:
-        """Register a new patient to track."""
+    def register_patient(
+        self,
+        patient_id: str,
+        statistics_windows: Iterable[int] = (),
+        stale_max_age: int = DEFAULT_STALE_DATA_MAX_AGE_MIN * 60,
+        logbook: bool = False,
+    ) -> None:
+        """Register a new patient to track.
+
+        Rolling statistics windows and the maximum age of the data kept
+        available on poll failures are given in seconds.
+        """
         self._tracked_patients.add(patient_id)
+        if patient_id not in self._shard_of:
+            self._move(patient_id, self._shards[0])
+        self.stale_max_ages[patient_id] = stale_max_age
+        if logbook:
+            self.logbook_patients.add(patient_id)
+        history = self.histories.setdefault(patient_id, GlucoseHistory())
+        for seconds in statistics_windows:
+            history.add_window(seconds)
+        if self.data and (patient := self.data.get(patient_id)) is not None:
+            history.append(patient.measurement, patient.target)
+
+    @callback
+    def async_restore(self, data: dict[str, Patient], timestamp: datetime) -> None:
+        """Serve persisted patient data until the first successful poll."""
+        self.data = data
+        self.data_timestamp = timestamp
+        self.serving_stale = True
+        self._parsed = dict.fromkeys(data, timestamp)
+        for patient_id, history in self.histories.items():
+            if (patient := data.get(patient_id)) is not None:
+                history.append(patient.measurement, patient.target)
 
     def unregister_patient(self, patient_id: str) -> None:
         """Unregister a patient to track."""
         self._tracked_patients.remove(patient_id)
+        self.histories.pop(patient_id, None)
+        self.stale_max_ages.pop(patient_id, None)
+        self._statistics.forget(patient_id)
+        self.logbook_patients.discard(patient_id)
+        self._logbook.forget(patient_id)
+        self._shard_of.pop(patient_id).patients.discard(patient_id)
+        self._parsed.pop(patient_id, None)
+        self._parse_failed.discard(patient_id)
+        self._pending.pop(patient_id, None)
+        if len(self._tracked_patients) < SHARDING_MIN_PATIENTS:
+            for other in self._tracked_patients:
+                self._move(other, self._shards[0])
+
+    def _move(self, patient_id: str, shard: PatientShard) -> None:
+        """Move a patient to a shard."""
+        if (previous := self._shard_of.get(patient_id)) is shard:
+            return
+        if previous is not None:
+            previous.patients.discard(patient_id)
+        shard.patients.add(patient_id)
+        self._shard_of[patient_id] = shard
+
+    def _shard(self, patient: Patient) -> PatientShard:
+        """Return the shard of a patient after its last reading."""
+        if len(self._tracked_patients) < SHARDING_MIN_PATIENTS or near_target(patient):
+            return self._shards[0]
+        return self._shards[1 + stable_shard(patient.id)]
+
+    @property
+    def shards(self) -> dict[str, int]:
+        """Return the number of patients of every shard."""
+        return {shard.name: len(shard.patients) for shard in self._shards}
 
     @property
     def tracked_patients(self) -> int:
         """Return the number of tracked patients."""
         return len(self._tracked_patients)
 
+    @property
+    def data_age(self) -> timedelta | None:
+        """Return the time elapsed since the data was last fetched."""
+        if self.data_timestamp is None:
+            return None
+        return dt_util.utcnow() - self.data_timestamp
+
+    def patient_available(self, patient_id: str) -> bool:
+        """Return False if the data of a patient is stale beyond its maximum age."""
+        if not self.serving_stale and patient_id not in self._parse_failed:
+            return True
+        if (parsed := self._parsed.get(patient_id)) is None:
+            return False
+        return (dt_util.utcnow() - parsed).total_seconds() <= self.stale_max_ages.get(
+            patient_id, 0
+        )
+
+    def changed_fields(self, patient_id: str) -> set[str] | None:
+        """Return the fields of a patient changed by the last poll, None if unknown."""
+        if self._changes is None:
+            return None
+        return self._changes.get(patient_id, set())
+
+    @callback
+    def async_add_listener(
+        self, update_callback: CALLBACK_TYPE, context: str | None = None
+    ) -> CALLBACK_TYPE:
+        """Listen for data updates, the listeners of a patient indexed together."""
+        remove = super().async_add_listener(update_callback, context)
+        listeners = self._patient_listeners.setdefault(context, {})
+        listeners[remove] = update_callback
+
+        @callback
+        def remove_listener() -> None:
+            remove()
+            listeners.pop(remove)
+
+        return remove_listener
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners of the patients whose data changed."""
+        if self._changes is None or self._notified_success != self.last_update_success:
+            self._notified_success = self.last_update_success
+            super().async_update_listeners()
+            return
+
+        for context in (None, *self._changes):
+            if listeners := self._patient_listeners.get(context):
+                for update_callback in list(listeners.values()):
+                    update_callback()
+
+    @callback
+    def async_set_updated_data(self, data: dict[str, Patient]) -> None:
+        """Replace the data outside of a poll, notifying every listener."""
+        self._changes = None
+        super().async_set_updated_data(data)
+
+    def _diff(self, data: dict[str, Patient]) -> dict[str, set[str]] | None:
+        """Return the changed fields of every patient compared to the previous poll."""
+        if self.data is None:
+            return None
+
+        changes = {}
+        for pid, patient in data.items():
+            if (previous := self.data.get(pid)) is None:
+                changes[pid] = set(PATIENT_FIELDS)
+            elif fields := {
+                field
+                for field in PATIENT_FIELDS
+                # Unchanged sub-objects are shared between polls.
+                if (value := getattr(patient, field)) is not getattr(previous, field)
+                and value != getattr(previous, field)
+            }:
+                changes[pid] = fields
+        return changes
+
     async def _async_update_data(self):
         """Update data via library."""
-        return {patient.id: patient for patient in await self.api.async_get_data()}
+        with self.api.metrics.timer(UPDATE):
+            return await self._async_fetch_data()
+
+    async def _async_fetch_data(self) -> dict[str, Patient]:
+        """Fetch the tracked patients, serving the last data on transient failures."""
+        try:
+            connections = await self.api.async_get_connections()
+        except LibreLinkAPIConnectionError as e:
+            self.update_interval = self._scheduler.failure_interval()
+            if self.data is None or self.data_age.total_seconds() > max(
+                self.stale_max_ages.values(), default=0
+            ):
+                raise UpdateFailed(e) from e
+            # Keep serving the last data while it is recent enough, the entities
+            # of the patients whose data grew too old become unavailable.
+            LOGGER.debug("%s, serving data fetched %s ago", e, self.data_age)
+            self.serving_stale = True
+            self._changes = None
+            return self.data
+        except LibreLinkAPIError as e:
+            self.update_interval = self._scheduler.failure_interval()
+            raise UpdateFailed(e) from e
+
+        now = dt_util.utcnow()
+        first = self.data is None
+        recovered = self.serving_stale or not self.last_update_success
+        data = dict(self.data or {})
+        fresh: list[Patient] = []
+        failed = set(self._parse_failed)
+        # Every shard is parsed on every poll, only the notifications of the
+        # stable shards wait for their turn.
+        for index, shard in enumerate(self._shards):
+            if not shard.patients:
+                continue
+            if index:
+                # Let the event loop run between the shards of a large account.
+                await asyncio.sleep(0)
+            try:
+                patients = self.api.parse_patients(connections, shard.patients)
+            except (KeyError, TypeError, ValueError) as e:
+                LOGGER.warning(
+                    "Unable to parse the patients of shard %s: %r", shard.name, e
+                )
+                self._parse_failed |= shard.patients
+                continue
+            self._parse_failed -= shard.patients
+            for pid in shard.patients:
+                data.pop(pid, None)
+            for patient in patients:
+                data[patient.id] = patient
+                self._parsed[patient.id] = now
+            fresh += patients
+
+        self.serving_stale = False
+        self.data_timestamp = now
+        self.store.async_save_snapshot(data, self.data_timestamp)
+        changes = (
+            None
+            if recovered
+            else self._diff({patient.id: patient for patient in fresh})
+        )
+        if first or recovered:
+            self._statistics.reset()
+        for patient in fresh:
+            if self.histories[patient.id].append(patient.measurement, patient.target):
+                self._statistics.add(patient)
+            self._move(patient.id, self._shard(patient))
+        # Entities made unavailable by stale data must all be written again.
+        self._changes = None if changes is None else self._notified_changes(changes)
+        if changes is None:
+            self._pending.clear()
+        else:
+            # The availability of the patients whose shard failed or recovered changes.
+            for pid in failed | self._parse_failed:
+                self._changes[pid] = set(PATIENT_FIELDS)
+        incomplete = self._statistics.flush(self.data_timestamp)
+
+        # After a restart or a connection loss, import the readings missed meanwhile.
+        if first or recovered or incomplete:
+            self.hass.async_create_background_task(
+                self._backfill.async_backfill(
+                    fresh
+                    if first or recovered
+                    else [patient for patient in fresh if patient.id in incomplete]
+                ),
+                name=f"{DOMAIN} history backfill",
+            )
+
+        self._logbook.async_poll(
+            [patient for patient in fresh if patient.id in self.logbook_patients]
+        )
+
+        # Plan the next poll right after the next expected reading of a tracked patient.
+        self.update_interval = self._scheduler.next_interval(fresh, dt_util.utcnow())
+        LOGGER.debug(
+            "Next poll in %s (upload lag %.0fs, %s polls without new reading, "
+            "%s patients with notifications pending)",
+            self.update_interval,
+            self._scheduler.lag,
+            self._scheduler.misses,
+            len(self._pending),
+        )
+        return data
+
+    def _notified_changes(self, changes: dict[str, set[str]]) -> dict[str, set[str]]:
+        """Return the changes to notify now, holding back the ones of shards not due."""
+        for pid, fields in changes.items():
+            self._pending.setdefault(pid, set()).update(fields)
+
+        now = dt_util.utcnow()
+        notified = {}
+        for shard in self._shards:
+            if not shard.patients or not shard.is_due(now):
+                continue
+            shard.notified(now)
+            for pid in shard.patients:
+                if (fields := self._pending.pop(pid, None)) is not None:
+                    notified[pid] = fields
+        return notified
@@ -0,0 +1,40 @@
+"""Diagnostics support for LibreLink."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_THROTTLES, DOMAIN
+from .coordinator import LibreLinkDataUpdateCoordinator
+from .session import async_get_session
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: LibreLinkDataUpdateCoordinator = hass.data[DOMAIN][
+        entry.data[CONF_USERNAME]
+    ]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "base_url": coordinator.api.base_url,
+        "poll_interval": str(coordinator.update_interval),
+        "data_age": str(coordinator.data_age),
+        "serving_stale": coordinator.serving_stale,
+        "shards": coordinator.shards,
+        "metrics": coordinator.api.metrics.summary,
+        "coalesced_requests": coordinator.api.coalesced,
+        "throttles": hass.data[DATA_THROTTLES].stats,
+        "connections": {
+            host: stats.as_dict()
+            for host, stats in async_get_session(hass).stats.items()
+        },
+    }
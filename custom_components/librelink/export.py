@@ -0,0 +1,146 @@
+"""Export the glucose history of a patient to a file."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+import csv
+from datetime import UTC, datetime
+from itertools import chain, islice
+from pathlib import Path
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .api import LibreLinkAPIError
+from .const import EXPORT_CHUNK_ROWS, LOGGER
+from .coordinator import LibreLinkDataUpdateCoordinator
+
+CSV = "csv"
+PARQUET = "parquet"
+EXPORT_FORMATS = (CSV, PARQUET)
+COLUMNS = ("timestamp", "value_mg_dl", "source")
+
+
+async def async_export_history(
+    hass: HomeAssistant,
+    coordinator: LibreLinkDataUpdateCoordinator,
+    patient_id: str,
+    start: datetime,
+    end: datetime,
+    export_format: str,
+    path: Path,
+) -> dict:
+    """Write the readings of a patient between `start` and `end` to `path`.
+
+    Readings come from the history kept in memory and, before its oldest
+    one, from the graph endpoint. The event loop only copies the compact
+    history arrays, the rows are written in chunks from the executor.
+    """
+    start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+    timestamps, values = coordinator.histories[patient_id].arrays()
+    first_local = timestamps[0] if timestamps else end_ts
+
+    graph: list[tuple[int, int]] = []
+    if start_ts < first_local:
+        try:
+            measurements = await coordinator.api.async_get_graph(patient_id)
+        except LibreLinkAPIError as e:
+            LOGGER.warning("Unable to fetch the graph of patient %s: %s", patient_id, e)
+        else:
+            graph = [
+                (timestamp, measurement.value)
+                for measurement in measurements
+                if start_ts
+                <= (timestamp := int(measurement.timestamp.timestamp()))
+                < min(first_local, end_ts)
+            ]
+
+    return await hass.async_add_executor_job(
+        _write, path, export_format, graph, timestamps, values, start_ts, end_ts
+    )
+
+
+def _rows(
+    graph: list[tuple[int, int]],
+    timestamps: array,
+    values: array,
+    start: int,
+    end: int,
+) -> Iterator[tuple[int, int, str]]:
+    """Return an iterator over the rows of the export, oldest first."""
+    first, last = bisect_left(timestamps, start), bisect_left(timestamps, end)
+    return chain(
+        ((timestamp, value, "graph") for timestamp, value in graph),
+        ((timestamps[index], values[index], "local") for index in range(first, last)),
+    )
+
+
+def _isoformat(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, UTC).isoformat()
+
+
+@contextmanager
+def _csv_writer(path: Path) -> Iterator[Callable[[list[tuple]], None]]:
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        yield lambda chunk: writer.writerows(
+            (_isoformat(timestamp), value, source) for timestamp, value, source in chunk
+        )
+
+
+@contextmanager
+def _parquet_writer(path: Path) -> Iterator[Callable[[list[tuple]], None]]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise HomeAssistantError("The Parquet export needs pyarrow") from e
+
+    schema = pa.schema(
+        [
+            ("timestamp", pa.timestamp("s", tz="UTC")),
+            ("value_mg_dl", pa.uint16()),
+            ("source", pa.string()),
+        ]
+    )
+    with pq.ParquetWriter(path, schema) as writer:
+        # One row group per chunk.
+        yield lambda chunk: writer.write_table(
+            pa.Table.from_arrays(
+                [pa.array(column) for column in zip(*chunk)], schema=schema
+            )
+        )
+
+
+def _write(
+    path: Path,
+    export_format: str,
+    graph: list[tuple[int, int]],
+    timestamps: array,
+    values: array,
+    start: int,
+    end: int,
+) -> dict:
+    """Write the rows in chunks, return a summary of the export."""
+    rows = _rows(graph, timestamps, values, start, end)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    count, first, last = 0, None, None
+    opener = _parquet_writer if export_format == PARQUET else _csv_writer
+    with opener(path) as write:
+        while chunk := list(islice(rows, EXPORT_CHUNK_ROWS)):
+            write(chunk)
+            count += len(chunk)
+            first = first or chunk[0][0]
+            last = chunk[-1][0]
+
+    return {
+        "path": str(path),
+        "rows": count,
+        "first": _isoformat(first) if first else None,
+        "last": _isoformat(last) if last else None,
+    }
@@ -0,0 +1,390 @@
+"""Compact per-patient glucose history with rolling statistics."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime
+import math
+
+from homeassistant.util import dt as dt_util
+
+from .api import Measurement, Target
+from .const import (
+    AGP_BUCKET_MINUTES,
+    AGP_PERCENTILES,
+    MEASUREMENT_INTERVAL_SECONDS,
+    TREND_MIN_READINGS,
+)
+
+# Range classification of a reading against the patient target when it was taken.
+BELOW_RANGE = -1
+IN_RANGE = 0
+ABOVE_RANGE = 1
+
+
+def classify(value: int, target: Target) -> int:
+    """Return the range classification of a reading against a target."""
+    if value < target.low:
+        return BELOW_RANGE
+    if value > target.high:
+        return ABOVE_RANGE
+    return IN_RANGE
+
+
+@dataclass
+class WindowStatistics:
+    """Statistics of the readings of a rolling window."""
+
+    count: int
+    mean: float
+    standard_deviation: float
+    coefficient_of_variation: float
+    glucose_management_indicator: float
+    time_below_range: float
+    time_in_range: float
+    time_above_range: float
+    # Least squares slope of the readings, in mg/dL per minute.
+    rate_of_change: float | None
+
+
+class RollingWindow:
+    """Running sums over the readings of the last `seconds`, updated in O(1).
+
+    Besides the value sums, the window keeps the sums needed by a least squares
+    fit of the value against the time, so its slope and a projection are
+    available without revisiting the readings. Times are counted from `origin`
+    to keep the sums small.
+    """
+
+    def __init__(self, seconds: int) -> None:
+        """Initialize the window."""
+        self.seconds = seconds
+        # Index (in the history append order) of the oldest reading of the window.
+        self.first = 0
+        self.count = 0
+        self.sum = 0
+        self.sum_of_squares = 0
+        self.ranges = {BELOW_RANGE: 0, IN_RANGE: 0, ABOVE_RANGE: 0}
+        self.origin: int | None = None
+        self.sum_of_times = 0
+        self.sum_of_squared_times = 0
+        self.sum_of_products = 0
+        self.last_timestamp: int | None = None
+
+    def add(self, timestamp: int, value: int, classification: int) -> None:
+        """Account for a reading entering the window."""
+        if self.origin is None:
+            self.origin = timestamp
+        elapsed = timestamp - self.origin
+        self.count += 1
+        self.sum += value
+        self.sum_of_squares += value * value
+        self.ranges[classification] += 1
+        self.sum_of_times += elapsed
+        self.sum_of_squared_times += elapsed * elapsed
+        self.sum_of_products += elapsed * value
+        self.last_timestamp = timestamp
+
+    def remove(self, timestamp: int, value: int, classification: int) -> None:
+        """Account for a reading leaving the window."""
+        elapsed = timestamp - self.origin
+        self.first += 1
+        self.count -= 1
+        self.sum -= value
+        self.sum_of_squares -= value * value
+        self.ranges[classification] -= 1
+        self.sum_of_times -= elapsed
+        self.sum_of_squared_times -= elapsed * elapsed
+        self.sum_of_products -= elapsed * value
+        if not self.count:
+            self.origin = None
+            self.last_timestamp = None
+
+    @property
+    def slope(self) -> float | None:
+        """Return the least squares slope of the readings in mg/dL per second."""
+        if self.count < TREND_MIN_READINGS:
+            return None
+        # Integer sums keep the fit exact however long the window has been running.
+        spread = self.count * self.sum_of_squared_times - self.sum_of_times**2
+        if not spread:
+            return None
+        return (
+            self.count * self.sum_of_products - self.sum_of_times * self.sum
+        ) / spread
+
+    def projection(self, seconds: float) -> float | None:
+        """Return the value the fit predicts `seconds` after the newest reading."""
+        if (slope := self.slope) is None:
+            return None
+        mean_time = self.sum_of_times / self.count
+        elapsed = self.last_timestamp - self.origin + seconds
+        return self.sum / self.count + slope * (elapsed - mean_time)
+
+    @property
+    def statistics(self) -> WindowStatistics | None:
+        """Return the statistics of the window, None if it holds no reading."""
+        if not self.count:
+            return None
+        mean = self.sum / self.count
+        deviation = math.sqrt(max(self.sum_of_squares / self.count - mean * mean, 0))
+        return WindowStatistics(
+            count=self.count,
+            mean=mean,
+            standard_deviation=deviation,
+            coefficient_of_variation=100 * deviation / mean if mean else 0.0,
+            # Bergenstal et al., Diabetes Care 2018: GMI (%) = 3.31 + 0.02392 x mean (mg/dL)
+            glucose_management_indicator=3.31 + 0.02392 * mean,
+            time_below_range=100 * self.ranges[BELOW_RANGE] / self.count,
+            time_in_range=100 * self.ranges[IN_RANGE] / self.count,
+            time_above_range=100 * self.ranges[ABOVE_RANGE] / self.count,
+            rate_of_change=slope * 60 if (slope := self.slope) is not None else None,
+        )
+
+
+def percentile(values: array, rank: float) -> float:
+    """Return a percentile of sorted values, interpolated between the closest ones."""
+    position = (len(values) - 1) * rank / 100
+    lower = int(position)
+    if lower == position:
+        return values[lower]
+    return values[lower] + (values[lower + 1] - values[lower]) * (position - lower)
+
+
+class AmbulatoryGlucoseProfile(RollingWindow):
+    """Rolling window also keeping the readings of every time of day sorted.
+
+    The day is split in buckets of local time, each keeping the values of its
+    readings in a sorted typed array: a reading enters or leaves with a bisect
+    and a memmove, and a percentile is an index lookup. Percentiles are cached
+    and only computed again for the buckets changed since.
+    """
+
+    def __init__(self, seconds: int) -> None:
+        """Initialize the profile."""
+        super().__init__(seconds)
+        # Fixed once, readings must leave the bucket they entered.
+        self.time_zone = dt_util.DEFAULT_TIME_ZONE
+        count = 24 * 60 // AGP_BUCKET_MINUTES
+        self.buckets = [array("H") for _ in range(count)]
+        self._percentiles: list[tuple[float, ...] | None] = [None] * count
+        self._changed: set[int] = set()
+
+    def bucket(self, timestamp: int) -> int:
+        """Return the time of day bucket of a reading."""
+        local = datetime.fromtimestamp(timestamp, self.time_zone)
+        return (local.hour * 60 + local.minute) // AGP_BUCKET_MINUTES
+
+    def add(self, timestamp: int, value: int, classification: int) -> None:
+        """Account for a reading entering the profile."""
+        super().add(timestamp, value, classification)
+        bucket = self.bucket(timestamp)
+        insort(self.buckets[bucket], value)
+        self._changed.add(bucket)
+
+    def remove(self, timestamp: int, value: int, classification: int) -> None:
+        """Account for a reading leaving the profile."""
+        super().remove(timestamp, value, classification)
+        bucket = self.bucket(timestamp)
+        values = self.buckets[bucket]
+        del values[bisect_left(values, value)]
+        self._changed.add(bucket)
+
+    @property
+    def percentiles(self) -> list[tuple[float, ...] | None]:
+        """Return the percentiles of every bucket, None for the empty ones."""
+        for bucket in self._changed:
+            values = self.buckets[bucket]
+            self._percentiles[bucket] = (
+                tuple(percentile(values, rank) for rank in AGP_PERCENTILES)
+                if values
+                else None
+            )
+        self._changed.clear()
+        return self._percentiles
+
+    @property
+    def sensor_active(self) -> float:
+        """Return the percentage of the expected readings the profile holds."""
+        expected = self.seconds / MEASUREMENT_INTERVAL_SECONDS
+        return min(100.0, 100 * self.count / expected)
+
+    def profile(self) -> list[dict]:
+        """Return the percentiles of the buckets holding readings, by time of day."""
+        profile = []
+        for bucket, percentiles in enumerate(self.percentiles):
+            if percentiles is None:
+                continue
+            minutes = bucket * AGP_BUCKET_MINUTES
+            profile.append(
+                {
+                    "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+                    "readings": len(self.buckets[bucket]),
+                }
+                | {
+                    f"p{rank}": round(value, 1)
+                    for rank, value in zip(AGP_PERCENTILES, percentiles)
+                }
+            )
+        return profile
+
+    def as_dict(self) -> dict | None:
+        """Return the profile and the time in ranges, None if it holds no reading."""
+        if (statistics := self.statistics) is None:
+            return None
+        return {
+            "days": self.seconds // 86400,
+            "readings": statistics.count,
+            "sensor_active": self.sensor_active,
+            "mean": statistics.mean,
+            "glucose_management_indicator": statistics.glucose_management_indicator,
+            "coefficient_of_variation": statistics.coefficient_of_variation,
+            "time_below_range": statistics.time_below_range,
+            "time_in_range": statistics.time_in_range,
+            "time_above_range": statistics.time_above_range,
+            "profile": self.profile(),
+        }
+
+
+class GlucoseHistory:
+    """Ring buffer of the readings of one patient, stored in typed arrays.
+
+    The buffer is sized for the widest registered window at the sensor
+    measurement cadence and doubles when readings come closer together, as
+    backfilled ones: a reading is only overwritten once out of every window.
+    Every window keeps its running sums up to date as readings are appended
+    and expire.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty history."""
+        self._timestamps = array("I")
+        self._values = array("H")
+        self._ranges = array("b")
+        # Number of readings ever appended, the newest one has index `_total - 1`.
+        self._total = 0
+        self.windows: dict[tuple[type[RollingWindow], int], RollingWindow] = {}
+
+    @property
+    def capacity(self) -> int:
+        """Return the maximum number of readings kept."""
+        return len(self._values)
+
+    def __len__(self) -> int:
+        """Return the number of readings kept."""
+        return min(self._total, self.capacity)
+
+    @property
+    def last_timestamp(self) -> int | None:
+        """Return the POSIX timestamp of the newest reading."""
+        if not self._total:
+            return None
+        return self._timestamps[(self._total - 1) % self.capacity]
+
+    def add_window(
+        self, seconds: int, window_class: type[RollingWindow] = RollingWindow
+    ) -> RollingWindow:
+        """Register a rolling window, growing the buffer if needed."""
+        if (window := self.windows.get((window_class, seconds))) is not None:
+            return window
+
+        self._grow(seconds // MEASUREMENT_INTERVAL_SECONDS + 1)
+        window = self.windows[window_class, seconds] = window_class(seconds)
+        # Readings already kept are accounted for, the window then expires the old ones.
+        window.first = self._total - len(self)
+        for index in range(window.first, self._total):
+            slot = index % self.capacity
+            window.add(self._timestamps[slot], self._values[slot], self._ranges[slot])
+        if self._total:
+            self._expire(window, self.last_timestamp)
+        return window
+
+    def append(self, measurement: Measurement, target: Target) -> bool:
+        """Append a reading, return False if it is not newer than the last one."""
+        timestamp = int(measurement.timestamp.timestamp())
+        if not self.capacity or (self._total and timestamp <= self.last_timestamp):
+            return False
+
+        classification = classify(measurement.value, target)
+        if self._total >= self.capacity:
+            widest = max(window.seconds for window in self.windows.values())
+            if self._timestamps[self._total % self.capacity] > timestamp - widest:
+                # The oldest reading is still in a window, make room instead.
+                self._grow(2 * self.capacity)
+        index = self._total
+        slot = index % self.capacity
+        if index >= self.capacity:
+            # The overwritten reading must leave the windows still holding it.
+            overwritten = index - self.capacity
+            for window in self.windows.values():
+                if window.first == overwritten:
+                    window.remove(
+                        self._timestamps[slot], self._values[slot], self._ranges[slot]
+                    )
+
+        self._timestamps[slot] = timestamp
+        self._values[slot] = measurement.value
+        self._ranges[slot] = classification
+        self._total += 1
+
+        for window in self.windows.values():
+            window.add(timestamp, measurement.value, classification)
+            self._expire(window, timestamp)
+        return True
+
+    def readings(self, since: datetime | None = None) -> list[tuple[int, int]]:
+        """Return the kept (POSIX timestamp, mg/dL value) pairs, oldest first."""
+        start = since.timestamp() if since is not None else 0
+        return [
+            (self._timestamps[slot], self._values[slot])
+            for slot in (
+                index % self.capacity
+                for index in range(self._total - len(self), self._total)
+            )
+            if self._timestamps[slot] >= start
+        ]
+
+    def arrays(self) -> tuple[array, array]:
+        """Return copies of the kept timestamps and mg/dL values, oldest first."""
+        if self._total <= self.capacity:
+            return self._timestamps[: self._total], self._values[: self._total]
+        split = self._total % self.capacity
+        return (
+            self._timestamps[split:] + self._timestamps[:split],
+            self._values[split:] + self._values[:split],
+        )
+
+    def _expire(self, window: RollingWindow, now: int) -> None:
+        """Remove the readings that fell out of the window."""
+        oldest = now - window.seconds
+        while window.count:
+            slot = window.first % self.capacity
+            if self._timestamps[slot] > oldest:
+                break
+            window.remove(
+                self._timestamps[slot], self._values[slot], self._ranges[slot]
+            )
+
+    def _grow(self, capacity: int) -> None:
+        """Reallocate the arrays to hold `capacity` readings, keeping the order."""
+        if capacity <= self.capacity:
+            return
+        kept = len(self)
+        order = [
+            index % self.capacity for index in range(self._total - kept, self._total)
+        ]
+        timestamps = array("I", (self._timestamps[slot] for slot in order))
+        values = array("H", (self._values[slot] for slot in order))
+        ranges = array("b", (self._ranges[slot] for slot in order))
+        padding = capacity - kept
+        timestamps.extend([0] * padding)
+        values.extend([0] * padding)
+        ranges.extend([0] * padding)
+        self._timestamps, self._values, self._ranges = timestamps, values, ranges
+
+        # Readings are now stored from slot 0, renumber them accordingly.
+        for window in self.windows.values():
+            window.first -= self._total - kept
+        self._total = kept
@@ -0,0 +1,144 @@
+"""Alarms and events of the LibreLink logbook, fired as Home Assistant events."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+
+from .api import LibreLinkAPI, LibreLinkAPIError, LogbookEntry, Patient
+from .const import (
+    DOMAIN,
+    EVENT_LOGBOOK_ENTRY,
+    LOGBOOK_INTERVAL_SECONDS,
+    LOGBOOK_LOOKBACK_SECONDS,
+    LOGBOOK_SEEN_IDS,
+    LOGGER,
+)
+from .store import LibreLinkStore
+
+
+class SeenIndex:
+    """Ids of the last entries seen, the oldest forgotten beyond `size`."""
+
+    def __init__(self, ids: Iterable[str] = (), size: int = LOGBOOK_SEEN_IDS) -> None:
+        """Initialize the index."""
+        self._order: deque[str] = deque(ids, maxlen=size)
+        self._ids = set(self._order)
+
+    def __contains__(self, entry_id: str) -> bool:
+        """Return True if the id was seen."""
+        return entry_id in self._ids
+
+    def add(self, entry_id: str) -> None:
+        """Remember an id, forgetting the oldest one when full."""
+        if len(self._order) == self._order.maxlen:
+            self._ids.discard(self._order[0])
+        self._order.append(entry_id)
+        self._ids.add(entry_id)
+
+    def as_list(self) -> list[str]:
+        """Return the ids, oldest first."""
+        return list(self._order)
+
+
+class LibreLinkLogbook:
+    """Fire an event for every new entry of the logbook of the patients.
+
+    The logbook is polled at most once per interval. Entries older than the
+    newest one processed minus a lookback are skipped at once, the recent
+    ones are checked against the ids of the last entries seen, so late
+    uploads are caught and nothing fires twice. The first poll of a patient
+    only records its logbook, the past entries do not fire.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, api: LibreLinkAPI, store: LibreLinkStore
+    ) -> None:
+        """Initialize the logbook."""
+        self.hass = hass
+        self.api = api
+        self.store = store
+        self._cursors: dict[str, datetime] = {}
+        self._seen: dict[str, SeenIndex] = {}
+        self._last_poll: float | None = None
+        self._polling: asyncio.Task | None = None
+
+    @callback
+    def async_poll(self, patients: list[Patient]) -> None:
+        """Fetch the logbook of the patients in the background, if due."""
+        now = time.monotonic()
+        if not patients or (self._polling is not None and not self._polling.done()):
+            return
+        if self._last_poll is not None and now - self._last_poll < (
+            LOGBOOK_INTERVAL_SECONDS
+        ):
+            return
+        self._last_poll = now
+        self._polling = self.hass.async_create_background_task(
+            self._async_poll(patients), name=f"{DOMAIN} logbook"
+        )
+
+    def forget(self, patient_id: str) -> None:
+        """Drop the index of a patient no longer tracked."""
+        self._cursors.pop(patient_id, None)
+        self._seen.pop(patient_id, None)
+
+    async def _async_poll(self, patients: list[Patient]) -> None:
+        for patient in patients:
+            try:
+                entries = await self.api.async_get_logbook(patient.id)
+            except LibreLinkAPIError as e:
+                LOGGER.warning(
+                    "Unable to fetch the logbook of patient %s: %s", patient.id, e
+                )
+                continue
+            self._process(patient, entries)
+
+    def _process(self, patient: Patient, entries: list[LogbookEntry]) -> None:
+        if patient.id not in self._seen and (
+            persisted := self.store.logbook_cursor(patient.id)
+        ):
+            self._cursors[patient.id] = persisted[0]
+            self._seen[patient.id] = SeenIndex(persisted[1])
+
+        seen = self._seen.setdefault(patient.id, SeenIndex())
+        cursor = self._cursors.get(patient.id)
+        since = cursor - timedelta(seconds=LOGBOOK_LOOKBACK_SECONDS) if cursor else None
+        new = [
+            entry
+            for entry in entries
+            if (since is None or entry.timestamp >= since) and entry.id not in seen
+        ]
+        if not new:
+            if cursor is None:
+                # An empty logbook still marks the first poll of the patient.
+                self._cursors[patient.id] = dt_util.utcnow()
+                self.store.async_set_logbook_cursor(
+                    patient.id, self._cursors[patient.id], []
+                )
+            return
+
+        for entry in new:
+            seen.add(entry.id)
+            # Past entries only fill the index on the first poll of a patient.
+            if cursor is not None:
+                self.hass.bus.async_fire(
+                    EVENT_LOGBOOK_ENTRY,
+                    {"patient_id": patient.id, "patient": patient.name}
+                    | entry.as_dict(),
+                )
+        LOGGER.debug(
+            "%s new logbook entries for patient %s%s",
+            len(new),
+            patient.id,
+            "" if cursor is not None else ", first poll not fired",
+        )
+        newest = max(new[-1].timestamp, cursor) if cursor else new[-1].timestamp
+        self._cursors[patient.id] = newest
+        self.store.async_set_logbook_cursor(patient.id, newest, seen.as_list())
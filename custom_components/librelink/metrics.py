@@ -0,0 +1,101 @@
+"""Lightweight timing and size metrics of the request and update hot path."""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+import re
+import time
+
+from .const import METRICS_SAMPLE_SIZE
+
+# Path segments identifying a patient, folded so the metrics are kept per endpoint.
+_PATIENT_ID_SEGMENT = re.compile(r"/[0-9a-fA-F-]{32,36}(?=/|$)")
+
+# Metric names.
+UPDATE = "update"
+PARSE = "parse"
+
+
+def latency_metric(url: str) -> str:
+    """Return the name of the latency metric of an endpoint, in ms."""
+    return f"latency {_PATIENT_ID_SEGMENT.sub('/{patient_id}', url)}"
+
+
+def payload_metric(url: str) -> str:
+    """Return the name of the payload size metric of an endpoint, in bytes."""
+    return f"payload {_PATIENT_ID_SEGMENT.sub('/{patient_id}', url)}"
+
+
+class RollingHistogram:
+    """Last `size` samples of a metric and their percentiles."""
+
+    def __init__(self, size: int = METRICS_SAMPLE_SIZE) -> None:
+        """Initialize the histogram."""
+        self._samples: deque[float] = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Record a sample, evicting the oldest one if full."""
+        self._samples.append(value)
+        self.count += 1
+
+    @property
+    def last(self) -> float | None:
+        """Return the newest sample."""
+        return self._samples[-1] if self._samples else None
+
+    def percentiles(self, *ranks: float) -> list[float | None]:
+        """Return the nearest-rank percentiles of the kept samples."""
+        if not self._samples:
+            return [None] * len(ranks)
+        ordered = sorted(self._samples)
+        return [
+            ordered[min(len(ordered) - 1, int(rank / 100 * len(ordered)))]
+            for rank in ranks
+        ]
+
+    @property
+    def summary(self) -> dict[str, float | None]:
+        """Return the sample count, the newest sample and the p50/p95/p99/max."""
+        p50, p95, p99, p100 = self.percentiles(50, 95, 99, 100)
+        return {
+            "count": self.count,
+            "last": self.last,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "max": p100,
+        }
+
+
+class Metrics:
+    """Rolling histograms of the metrics of one account, by name."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.histograms: dict[str, RollingHistogram] = {}
+
+    def record(self, name: str, value: float) -> None:
+        """Record a sample of a metric."""
+        if (histogram := self.histograms.get(name)) is None:
+            histogram = self.histograms[name] = RollingHistogram()
+        histogram.add(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Record the duration of the block in ms, whether it succeeds or not."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    @property
+    def summary(self) -> dict[str, dict[str, float | None]]:
+        """Return the summary of every metric."""
+        return {
+            name: histogram.summary
+            for name, histogram in sorted(self.histograms.items())
+        }
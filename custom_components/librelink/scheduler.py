@@ -0,0 +1,189 @@
+"""Poll scheduling aligned on the measurement cadence of the sensors."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from hashlib import sha256
+
+from .api import Patient
+from .const import (
+    MEASUREMENT_INTERVAL_SECONDS,
+    POLL_MARGIN_SECONDS,
+    POLL_MAX_INTERVAL_SECONDS,
+    POLL_MIN_INTERVAL_SECONDS,
+    POLL_PHASE_SPREAD_SECONDS,
+    POLL_RETRY_COUNT,
+    POLL_RETRY_INTERVAL_SECONDS,
+    SHARD_NEAR_TARGET_MG_DL,
+    SHARD_STABLE_COUNT,
+    STALE_MEASUREMENT_SECONDS,
+)
+
+# Weight of a new upload delay observation when it is above the current estimate.
+LAG_SMOOTHING = 0.2
+
+
+def _digest(value: str) -> int:
+    return int.from_bytes(sha256(value.lower().encode()).digest()[:4])
+
+
+def account_phase(username: str) -> float:
+    """Return a stable per-account poll offset so accounts do not poll in lockstep."""
+    return _digest(username) / 0xFFFFFFFF * POLL_PHASE_SPREAD_SECONDS
+
+
+def stable_shard(patient_id: str) -> int:
+    """Return the stable shard of a patient, the same on every run."""
+    return _digest(patient_id) % SHARD_STABLE_COUNT
+
+
+def near_target(patient: Patient) -> bool:
+    """Return True if the glucose of a patient is out of or close to its target range."""
+    value = patient.measurement.value
+    return (
+        value <= patient.target.low + SHARD_NEAR_TARGET_MG_DL
+        or value >= patient.target.high - SHARD_NEAR_TARGET_MG_DL
+    )
+
+
+class PatientShard:
+    """Patients of an account parsed and notified together.
+
+    The shard without interval is notified on every poll, at the cadence of
+    the `PollScheduler`, the other ones once per interval, on their own.
+    """
+
+    __slots__ = ("name", "interval", "offset", "patients", "due")
+
+    def __init__(
+        self, name: str, interval: int | None = None, offset: float = 1.0
+    ) -> None:
+        """Initialize the shard, first notified a fraction `offset` of an interval."""
+        self.name = name
+        self.interval = interval
+        # Staggers the first notifications so the shards do not come due together.
+        self.offset = offset
+        self.patients: set[str] = set()
+        # None when due at the next poll.
+        self.due: datetime | None = None
+
+    def is_due(self, now: datetime) -> bool:
+        """Return True if the shard must be notified by a poll at `now`."""
+        return self.due is None or self.due <= now + timedelta(
+            seconds=POLL_MIN_INTERVAL_SECONDS
+        )
+
+    def notified(self, now: datetime) -> None:
+        """Plan the next notification."""
+        if self.interval is None:
+            return
+        interval = timedelta(seconds=self.interval)
+        if self.due is None:
+            self.due = now + interval * self.offset
+        elif (due := self.due + interval) > now:
+            self.due = due
+        else:
+            self.due = now + interval
+
+
+class PollScheduler:
+    """Predict when the next measurement will be available upstream.
+
+    Sensors produce one reading per `MEASUREMENT_INTERVAL_SECONDS`, which
+    reaches LibreView with some upload delay. The next poll is planned just
+    after the predicted arrival of the next reading, retried a few times on a
+    short interval if it is late, then backed off exponentially while no new
+    reading shows up, the data is stale or every sensor has expired. Failed
+    polls are retried with an exponential backoff. Every delay is shifted by
+    the account `phase`.
+    """
+
+    def __init__(self, phase: float = 0.0) -> None:
+        """Initialize the scheduler."""
+        self.phase = phase
+        self._timestamps: dict[str, datetime] = {}
+        self._misses = 0
+        self._failures = 0
+        self.lag = 0.0
+
+    @property
+    def misses(self) -> int:
+        """Return the number of consecutive polls without a new reading."""
+        return self._misses
+
+    def next_interval(self, patients: Iterable[Patient], now: datetime) -> timedelta:
+        """Record the polled patients and return the delay until the next poll."""
+        self._failures = 0
+        patients = list(patients)
+        if not patients:
+            return timedelta(seconds=MEASUREMENT_INTERVAL_SECONDS)
+
+        fresh = False
+        for patient in patients:
+            timestamp = patient.measurement.timestamp
+            if self._timestamps.get(patient.id) != timestamp:
+                self._timestamps[patient.id] = timestamp
+                fresh = True
+                self._observe_lag((now - timestamp).total_seconds())
+
+        newest = max(patient.measurement.timestamp for patient in patients)
+        stale = (now - newest).total_seconds() > STALE_MEASUREMENT_SECONDS
+
+        if fresh and not stale:
+            self._misses = 0
+            delay = self._arrival_delay(patients, now)
+        else:
+            self._misses += 1
+            if stale or all(_sensor_expired(patient, now) for patient in patients):
+                delay = POLL_MAX_INTERVAL_SECONDS
+            elif self._misses <= POLL_RETRY_COUNT:
+                delay = POLL_RETRY_INTERVAL_SECONDS
+            else:
+                delay = MEASUREMENT_INTERVAL_SECONDS * 2 ** (
+                    self._misses - POLL_RETRY_COUNT
+                )
+
+        return self._interval(delay)
+
+    def _arrival_delay(self, patients: list[Patient], now: datetime) -> float:
+        """Return the delay until the earliest predicted arrival of a next reading.
+
+        Patients whose next reading is already late, as a disconnected sensor,
+        do not count: the next poll waits for the ones still uploading.
+        """
+        wait = timedelta(
+            seconds=MEASUREMENT_INTERVAL_SECONDS + self.lag + POLL_MARGIN_SECONDS
+        )
+        arrivals = [self._timestamps[patient.id] + wait for patient in patients]
+        upcoming = [arrival for arrival in arrivals if arrival > now]
+        return ((min(upcoming) if upcoming else max(arrivals)) - now).total_seconds()
+
+    def failure_interval(self) -> timedelta:
+        """Record a failed poll and return the delay until the next attempt."""
+        self._failures += 1
+        return self._interval(POLL_RETRY_INTERVAL_SECONDS * 2 ** (self._failures - 1))
+
+    def _interval(self, delay: float) -> timedelta:
+        """Shift a delay by the account phase and clamp it to the allowed range."""
+        return timedelta(
+            seconds=min(
+                max(delay + self.phase, POLL_MIN_INTERVAL_SECONDS),
+                POLL_MAX_INTERVAL_SECONDS,
+            )
+        )
+
+    def _observe_lag(self, lag: float) -> None:
+        """Track the upload delay, following decreases immediately."""
+        lag = min(max(lag, 0.0), MEASUREMENT_INTERVAL_SECONDS)
+        if lag < self.lag or not self.lag:
+            self.lag = lag
+        else:
+            self.lag += LAG_SMOOTHING * (lag - self.lag)
+
+
+def _sensor_expired(patient: Patient, now: datetime) -> bool:
+    """Return True if the sensor of the patient is past its expiration."""
+    if patient.device.application_timestamp is None:
+        return False
+    return patient.device.expiration_timestamp < now
@@ -2,29 +2,54 @@
 
 from __future__ import annotations
 
+from abc import abstractmethod
+from datetime import datetime
+
 from homeassistant.components.sensor import (
+    DOMAIN as SENSOR_DOMAIN,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_UNIT_OF_MEASUREMENT, CONF_USERNAME
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    CONF_UNIT_OF_MEASUREMENT,
+    CONF_USERNAME,
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .api import LibreLinkDevice, Measurement
 from .const import (
+    AGP_DAYS,
     ATTRIBUTION,
+    CONF_GLUCOSE_PROFILE,
+    CONF_MEASUREMENT_STATISTICS,
+    CONF_METRICS_SENSORS,
     CONF_PATIENT_ID,
+    CONF_PREDICTION_HORIZON,
+    CONF_STATISTICS_WINDOWS,
+    CONNECTION_URL,
+    DEFAULT_PREDICTION_HORIZON_MIN,
+    DEFAULT_STATISTICS_WINDOWS,
     DOMAIN,
     GLUCOSE_TREND_ICON,
     GLUCOSE_TREND_MESSAGE,
     GLUCOSE_VALUE_ICON,
     NAME,
+    TREND_WINDOW_SECONDS,
     VERSION,
 )
-from .coordinator import LibreLinkDataUpdateCoordinator
+from .coordinator import PATIENT_FIELDS, LibreLinkDataUpdateCoordinator
+from .history import AmbulatoryGlucoseProfile, RollingWindow, WindowStatistics
+from .metrics import UPDATE, latency_metric, payload_metric
 from .units import UNITS_OF_MEASUREMENT, UnitOfMeasurement
 
 
@@ -46,189 +71,541 @@ async def async_setup_entry(
     # using an index as we need to keep the coordinator in the @property to get updates from coordinator
     # we create an array of entities then create entities.
 
+    recorded = config_entry.options.get(CONF_MEASUREMENT_STATISTICS, True)
+    measurement = MeasurementSensor(coordinator, pid, unit, recorded)
+    _async_set_recorded(hass, measurement, recorded)
+
     sensors = [
-        MeasurementSensor(coordinator, pid, unit),
+        measurement,
         TrendSensor(coordinator, pid),
         ApplicationTimestampSensor(coordinator, pid),
         ExpirationTimestampSensor(coordinator, pid),
         LastMeasurementTimestampSensor(coordinator, pid),
+        DataAgeSensor(coordinator, pid),
+        RateOfChangeSensor(coordinator, pid, unit),
+        ProjectedGlucoseSensor(
+            coordinator,
+            pid,
+            unit,
+            int(
+                config_entry.options.get(
+                    CONF_PREDICTION_HORIZON, DEFAULT_PREDICTION_HORIZON_MIN
+                )
+            ),
+        ),
     ]
 
+    for hours in config_entry.options.get(
+        CONF_STATISTICS_WINDOWS, DEFAULT_STATISTICS_WINDOWS
+    ):
+        sensors += [
+            MeanGlucoseSensor(coordinator, pid, int(hours), unit),
+            StandardDeviationSensor(coordinator, pid, int(hours), unit),
+            CoefficientOfVariationSensor(coordinator, pid, int(hours)),
+            GlucoseManagementIndicatorSensor(coordinator, pid, int(hours)),
+            TimeInRangeSensor(coordinator, pid, int(hours)),
+        ]
+
+    if config_entry.options.get(CONF_GLUCOSE_PROFILE, False):
+        sensors.append(GlucoseProfileSensor(coordinator, pid))
+
+    if config_entry.options.get(CONF_METRICS_SENSORS, False):
+        sensors += [
+            MetricSensor(
+                coordinator, pid, "Update Duration", UPDATE, UnitOfTime.MILLISECONDS
+            ),
+            MetricSensor(
+                coordinator,
+                pid,
+                "API Latency",
+                latency_metric(CONNECTION_URL),
+                UnitOfTime.MILLISECONDS,
+            ),
+            MetricSensor(
+                coordinator,
+                pid,
+                "API Payload Size",
+                payload_metric(CONNECTION_URL),
+                UnitOfInformation.BYTES,
+            ),
+        ]
+
     async_add_entities(sensors)
 
 
+@callback
+def _async_set_recorded(
+    hass: HomeAssistant, entity: SensorEntity, recorded: bool
+) -> None:
+    """Disable an entity so its states are not recorded, or enable it back."""
+    registry = er.async_get(hass)
+    entity_id = registry.async_get_entity_id(SENSOR_DOMAIN, DOMAIN, entity.unique_id)
+    if entity_id is None:
+        # Registered from its enabled by default flag.
+        return
+    disabled_by = registry.async_get(entity_id).disabled_by
+    if not recorded and disabled_by is None:
+        registry.async_update_entity(
+            entity_id, disabled_by=er.RegistryEntryDisabler.INTEGRATION
+        )
+    elif recorded and disabled_by is er.RegistryEntryDisabler.INTEGRATION:
+        registry.async_update_entity(entity_id, disabled_by=None)
+
+
 class LibreLinkSensorBase(CoordinatorEntity[LibreLinkDataUpdateCoordinator]):
-    """LibreLink Sensor base class."""
+    """LibreLink Sensor base class.
+
+    Static properties are `_attr_*` values set once. The availability, state
+    and attributes are computed once per coordinator update in `_update_cache`
+    and served as is until the next one, and the state is only written when
+    one of them changed.
+    """
+
+    _attr_attribution = ATTRIBUTION
+    _attr_has_entity_name = True
+
+    _state_available = False
+    _state_value = None
+    _state_attributes: dict | None = None
+    _published: tuple | None = None
+
+    # Patient fields the state and attributes depend on.
+    data_fields: frozenset[str] = frozenset(PATIENT_FIELDS)
 
     def __init__(self, coordinator: LibreLinkDataUpdateCoordinator, pid: str) -> None:
         """Initialize the device class."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=pid)
 
         self.id = pid
-
-    @property
-    def device_info(self):
-        """Return the device info of the sensor."""
-        return DeviceInfo(
-            identifiers={(DOMAIN, self._data.id)},
+        self._attr_unique_id = f"{pid} {self.name}".replace(" ", "_").lower()
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, pid)},
             name=self._data.name,
             model=VERSION,
             manufacturer=NAME,
         )
 
+    async def async_added_to_hass(self) -> None:
+        """Compute the state before it is first written."""
+        await super().async_added_to_hass()
+        self._update_cache()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if a field it depends on and the state changed."""
+        changes = self.coordinator.changed_fields(self.id)
+        if changes is not None and not changes & self.data_fields:
+            return
+        if self._update_cache():
+            super()._handle_coordinator_update()
+
+    @callback
+    def _update_cache(self) -> bool:
+        """Compute the cached state, return True if it changed."""
+        available = self._state_available = self._is_available()
+        if available:
+            self._update_state()
+        published = (available, self._state_value, self._state_attributes)
+        if published == self._published:
+            return False
+        self._published = published
+        return True
+
+    def _is_available(self) -> bool:
+        """Return if the patient data is recent enough to be shown."""
+        return (
+            self.coordinator.last_update_success
+            and self.coordinator.patient_available(self.id)
+        )
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+
     @property
-    def attribution(self):
-        """Return the attribution for this entity."""
-        return ATTRIBUTION
+    def available(self) -> bool:
+        """Return the availability computed on the last update."""
+        return self._state_available
 
     @property
-    def has_entity_name(self):
-        """Return if the entity has a name."""
-        return True
+    def extra_state_attributes(self) -> dict | None:
+        """Return the state attributes computed on the last update."""
+        return self._state_attributes
 
     @property
     def _data(self):
         return self.coordinator.data[self.id]
 
-    @property
-    def unique_id(self):
-        """Return the unique id of the sensor."""
-        return f"{self._data.id} {self.name}".replace(" ", "_").lower()
-
 
 class LibreLinkSensor(LibreLinkSensorBase, SensorEntity):
     """LibreLink Sensor class."""
 
+    _attr_icon = GLUCOSE_VALUE_ICON
+
     @property
-    def icon(self):
-        """Return the icon for the frontend."""
-        return GLUCOSE_VALUE_ICON
+    def native_value(self):
+        """Return the state computed on the last update."""
+        return self._state_value
 
 
 class TrendSensor(LibreLinkSensor):
     """Glucose Trend Sensor class."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Trend"
+    _attr_name = "Trend"
+    data_fields = frozenset({"measurement"})
+    _state_icon = GLUCOSE_VALUE_ICON
 
-    @property
-    def native_value(self):
-        """Return the native value of the sensor."""
-        return GLUCOSE_TREND_MESSAGE[self._data.measurement.trend]
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        measurement = self._data.measurement
+        self._state_value = self._value_of(measurement)
+        self._state_icon = GLUCOSE_TREND_ICON[measurement.trend]
+
+    def _value_of(self, measurement: Measurement):
+        return GLUCOSE_TREND_MESSAGE[measurement.trend]
 
     @property
     def icon(self):
-        """Return the icon for the frontend."""
-        return GLUCOSE_TREND_ICON[self._data.measurement.trend]
+        """Return the icon of the trend computed on the last update."""
+        return self._state_icon
 
 
 class MeasurementSensor(TrendSensor, LibreLinkSensor):
     """Glucose Measurement Sensor class."""
 
+    _attr_name = "Measurement"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
     def __init__(
         self,
         coordinator: LibreLinkDataUpdateCoordinator,
         pid: str,
         unit: UnitOfMeasurement,
+        recorded: bool = True,
     ) -> None:
         """Initialize the sensor class."""
         super().__init__(coordinator, pid)
         self.unit = unit
+        self._attr_suggested_display_precision = unit.suggested_display_precision
+        self._attr_native_unit_of_measurement = unit.unit_of_measurement
+        # The hourly glucose statistics are published by the integration either way.
+        if not recorded:
+            self._attr_state_class = None
+            self._attr_entity_registry_enabled_default = False
 
-    @property
-    def state_class(self):
-        """Return the state class of the sensor."""
-        return SensorStateClass.MEASUREMENT
+    def _value_of(self, measurement: Measurement):
+        return self.unit.from_mg_per_dl(measurement.value)
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Measurement"
 
-    @property
-    def native_value(self):
-        """Return the native value of the sensor."""
-        return self.unit.from_mg_per_dl(self._data.measurement.value)
+class RateOfChangeSensor(LibreLinkSensor):
+    """Glucose rate of change fitted over the last readings."""
 
-    @property
-    def suggested_display_precision(self):
-        """Return the suggested precision of the sensor."""
-        return self.unit.suggested_display_precision
+    _attr_name = "Rate Of Change"
+    _attr_icon = "mdi:chart-line-variant"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    data_fields = frozenset({"measurement"})
 
-    @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement of the sensor."""
-        return self.unit.unit_of_measurement
+    def __init__(
+        self,
+        coordinator: LibreLinkDataUpdateCoordinator,
+        pid: str,
+        unit: UnitOfMeasurement,
+    ) -> None:
+        """Initialize the sensor class."""
+        super().__init__(coordinator, pid)
+        self.window = coordinator.histories[pid].add_window(TREND_WINDOW_SECONDS)
+        self.unit = unit
+        self._attr_suggested_display_precision = unit.suggested_display_precision + 1
+        self._attr_native_unit_of_measurement = f"{unit.unit_of_measurement}/min"
+
+    def _is_available(self) -> bool:
+        """Return if enough readings were kept to fit a trend."""
+        return super()._is_available() and self.window.slope is not None
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        self._state_value = self.unit.from_mg_per_dl(self.window.slope * 60)
+
+
+class ProjectedGlucoseSensor(RateOfChangeSensor):
+    """Glucose value the trend predicts `minutes` ahead."""
+
+    _attr_name = "Projected Glucose"
+    _attr_icon = "mdi:crystal-ball"
+
+    def __init__(
+        self,
+        coordinator: LibreLinkDataUpdateCoordinator,
+        pid: str,
+        unit: UnitOfMeasurement,
+        minutes: int,
+    ) -> None:
+        """Initialize the sensor class."""
+        super().__init__(coordinator, pid, unit)
+        self.minutes = minutes
+        self._attr_suggested_display_precision = unit.suggested_display_precision
+        self._attr_native_unit_of_measurement = unit.unit_of_measurement
+        self._state_attributes = {"Horizon": minutes}
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        projection = self.window.projection(self.minutes * 60)
+        self._state_value = self.unit.from_mg_per_dl(max(projection, 0))
 
 
 class TimestampSensor(LibreLinkSensor):
     """Timestamp Sensor class."""
 
-    @property
-    def device_class(self):
-        """Return the device class of the sensor."""
-        return SensorDeviceClass.TIMESTAMP
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
 
 
 class ApplicationTimestampSensor(TimestampSensor):
     """Sensor Days Sensor class."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Application Timestamp"
+    _attr_name = "Application Timestamp"
+    data_fields = frozenset({"first_name", "last_name", "device"})
 
-    @property
-    def available(self):
+    def _is_available(self) -> bool:
         """Return if the sensor data are available."""
-        return self._data.device.application_timestamp is not None
-
-    @property
-    def native_value(self):
-        """Return the native value of the sensor."""
-        return self._data.device.application_timestamp
+        return (
+            super()._is_available()
+            and self._data.device.application_timestamp is not None
+        )
 
-    @property
-    def extra_state_attributes(self):
-        """Return the state attributes of the librelink sensor."""
-        attrs = {
-            "Patient ID": self._data.id,
-            "Patient": self._data.name,
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        data = self._data
+        self._state_value = self._timestamp(data.device)
+        self._state_attributes = {
+            "Patient ID": data.id,
+            "Patient": data.name,
+            "Serial number": data.device.serial_number,
+            "Activation date": data.device.application_timestamp,
         }
-        if self.available:
-            attrs |= {
-                "Serial number": self._data.device.serial_number,
-                "Activation date": self._data.device.application_timestamp,
-            }
 
-        return attrs
+    @staticmethod
+    def _timestamp(device: LibreLinkDevice) -> datetime:
+        return device.application_timestamp
 
 
 class ExpirationTimestampSensor(ApplicationTimestampSensor):
     """Sensor Days Sensor class."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Expiration Timestamp"
+    _attr_name = "Expiration Timestamp"
 
-    @property
-    def native_value(self):
-        """Return the native value of the sensor."""
-        return self._data.device.expiration_timestamp
+    @staticmethod
+    def _timestamp(device: LibreLinkDevice) -> datetime:
+        return device.expiration_timestamp
 
 
 class LastMeasurementTimestampSensor(TimestampSensor):
     """Sensor Delay Sensor class."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "Last Measurement Timestamp"
+    _attr_name = "Last Measurement Timestamp"
+    data_fields = frozenset({"measurement"})
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        self._state_value = self._data.measurement.timestamp
+
+
+class PollSensor(LibreLinkSensor):
+    """Diagnostic Sensor updated on every poll, even when no patient data changed."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator: LibreLinkDataUpdateCoordinator, pid: str) -> None:
+        """Initialize the sensor class."""
+        super().__init__(coordinator, pid)
+        self.coordinator_context = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state on every poll, if it changed."""
+        if self._update_cache():
+            self.async_write_ha_state()
+
+
+class DataAgeSensor(PollSensor):
+    """Age of the data served while LibreView cannot be reached."""
+
+    _attr_name = "Data Age"
+    _attr_icon = "mdi:timer-sand"
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.SECONDS
+
+    def _is_available(self) -> bool:
+        """Return if data was fetched at least once."""
+        return self.coordinator.data_age is not None
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        self._state_value = round(self.coordinator.data_age.total_seconds())
+
+
+class MetricSensor(PollSensor):
+    """95th percentile of a hot path metric of the account."""
+
+    _attr_icon = "mdi:speedometer"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_suggested_display_precision = 0
+
+    def __init__(
+        self,
+        coordinator: LibreLinkDataUpdateCoordinator,
+        pid: str,
+        label: str,
+        metric: str,
+        unit: str,
+    ) -> None:
+        """Initialize the sensor class."""
+        self._attr_name = label
+        super().__init__(coordinator, pid)
+        self.metric = metric
+        self._attr_native_unit_of_measurement = unit
 
     @property
-    def native_value(self):
-        """Return the native value of the sensor."""
-        return self._data.measurement.timestamp
+    def _histogram(self):
+        return self.coordinator.api.metrics.histograms.get(self.metric)
+
+    def _is_available(self) -> bool:
+        """Return if the metric was recorded at least once."""
+        return self._histogram is not None
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        summary = self._histogram.summary
+        self._state_value = summary["p95"]
+        self._state_attributes = summary
+
+
+class WindowStatisticsSensor(LibreLinkSensor):
+    """Rolling window statistics Sensor base class."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    data_fields = frozenset({"measurement"})
+    label: str
+    window_class: type[RollingWindow] = RollingWindow
+    # Sensors of a window of fixed length are not named after it.
+    fixed_window = False
+
+    def __init__(
+        self, coordinator: LibreLinkDataUpdateCoordinator, pid: str, hours: int
+    ) -> None:
+        """Initialize the sensor class."""
+        self._attr_name = self.label if self.fixed_window else f"{self.label} {hours}h"
+        super().__init__(coordinator, pid)
+        self.window = coordinator.histories[pid].add_window(
+            hours * 3600, self.window_class
+        )
+        self.hours = hours
+
+    def _is_available(self) -> bool:
+        """Return if the window holds readings."""
+        return super()._is_available() and self.window.count > 0
+
+    def _update_state(self) -> None:
+        """Compute the cached state and attributes of an available entity."""
+        statistics = self.window.statistics
+        self._state_value = self._value(statistics)
+        self._state_attributes = self._attributes(statistics)
+
+    @abstractmethod
+    def _value(self, statistics: WindowStatistics) -> float:
+        """Return the state of the sensor from the statistics of its window."""
+
+    def _attributes(self, statistics: WindowStatistics) -> dict:
+        return {"Readings": statistics.count}
+
+
+class GlucoseWindowStatisticsSensor(WindowStatisticsSensor):
+    """Rolling window statistics Sensor in the glucose unit."""
+
+    def __init__(
+        self,
+        coordinator: LibreLinkDataUpdateCoordinator,
+        pid: str,
+        hours: int,
+        unit: UnitOfMeasurement,
+    ) -> None:
+        """Initialize the sensor class."""
+        super().__init__(coordinator, pid, hours)
+        self.unit = unit
+        self._attr_suggested_display_precision = unit.suggested_display_precision
+        self._attr_native_unit_of_measurement = unit.unit_of_measurement
+
+
+class MeanGlucoseSensor(GlucoseWindowStatisticsSensor):
+    """Mean Glucose Sensor class."""
+
+    label = "Mean Glucose"
+
+    def _value(self, statistics: WindowStatistics) -> float:
+        return self.unit.from_mg_per_dl(statistics.mean)
+
+
+class StandardDeviationSensor(GlucoseWindowStatisticsSensor):
+    """Glucose Standard Deviation Sensor class."""
+
+    label = "Standard Deviation"
+
+    def _value(self, statistics: WindowStatistics) -> float:
+        return self.unit.from_mg_per_dl(statistics.standard_deviation)
+
+
+class PercentageWindowStatisticsSensor(WindowStatisticsSensor):
+    """Rolling window statistics Sensor in percent."""
+
+    _attr_suggested_display_precision = 1
+    _attr_native_unit_of_measurement = PERCENTAGE
+
+
+class CoefficientOfVariationSensor(PercentageWindowStatisticsSensor):
+    """Glucose Coefficient of Variation Sensor class."""
+
+    label = "Coefficient Of Variation"
+
+    def _value(self, statistics: WindowStatistics) -> float:
+        return statistics.coefficient_of_variation
+
+
+class GlucoseManagementIndicatorSensor(PercentageWindowStatisticsSensor):
+    """Glucose Management Indicator Sensor class."""
+
+    label = "GMI"
+
+    def _value(self, statistics: WindowStatistics) -> float:
+        return statistics.glucose_management_indicator
+
+
+class TimeInRangeSensor(PercentageWindowStatisticsSensor):
+    """Time In Range Sensor class."""
+
+    label = "Time In Range"
+
+    def _value(self, statistics: WindowStatistics) -> float:
+        return statistics.time_in_range
+
+    def _attributes(self, statistics: WindowStatistics) -> dict:
+        return super()._attributes(statistics) | {
+            "Time below range": statistics.time_below_range,
+            "Time above range": statistics.time_above_range,
+        }
+
+
+class GlucoseProfileSensor(TimeInRangeSensor):
+    """Ambulatory glucose profile Sensor class, its state is the time in range."""
+
+    label = "Glucose Profile"
+    window_class = AmbulatoryGlucoseProfile
+    fixed_window = True
+
+    def __init__(self, coordinator: LibreLinkDataUpdateCoordinator, pid: str) -> None:
+        """Initialize the sensor class."""
+        super().__init__(coordinator, pid, AGP_DAYS * 24)
+
+    def _attributes(self, statistics: WindowStatistics) -> dict:
+        # The percentiles of every bucket are only returned by the glucose_profile
+        # service, too large for the attributes written to the recorder.
+        return super()._attributes(statistics) | {
+            "Sensor active": self.window.sensor_active,
+        }
@@ -0,0 +1,116 @@
+"""Services of the LibreLink integration."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_USERNAME
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import AGP_DAYS, CONF_PATIENT_ID, DOMAIN
+from .coordinator import LibreLinkDataUpdateCoordinator
+from .export import CSV, EXPORT_FORMATS, async_export_history
+from .history import AmbulatoryGlucoseProfile
+
+SERVICE_EXPORT_HISTORY = "export_history"
+SERVICE_GLUCOSE_PROFILE = "glucose_profile"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+
+EXPORT_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_FORMAT, default=CSV): vol.In(EXPORT_FORMATS),
+        vol.Optional(ATTR_FILENAME): cv.string,
+    }
+)
+GLUCOSE_PROFILE_SCHEMA = vol.Schema({vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string})
+
+
+def _patient(
+    hass: HomeAssistant, entry_id: str
+) -> tuple[LibreLinkDataUpdateCoordinator, str]:
+    """Return the coordinator and the patient id of a loaded entry."""
+    entry = hass.config_entries.async_get_entry(entry_id)
+    if entry is None or entry.domain != DOMAIN:
+        raise HomeAssistantError(f"Unknown LibreLink entry {entry_id}")
+    if entry.state is not ConfigEntryState.LOADED:
+        raise HomeAssistantError(f"Entry {entry.title} is not loaded")
+    return hass.data[DOMAIN][entry.data[CONF_USERNAME]], entry.data[CONF_PATIENT_ID]
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def _async_export_history(call: ServiceCall) -> ServiceResponse:
+        """Export the glucose history of a patient to the config directory."""
+        coordinator, patient_id = _patient(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+        start = dt_util.as_utc(call.data[ATTR_START])
+        end = dt_util.as_utc(call.data.get(ATTR_END) or dt_util.utcnow())
+        if start >= end:
+            raise HomeAssistantError("The export must start before its end")
+
+        export_format = call.data[ATTR_FORMAT]
+        filename = call.data.get(
+            ATTR_FILENAME,
+            f"{patient_id}_{start:%Y%m%d%H%M}_{end:%Y%m%d%H%M}.{export_format}",
+        )
+        if Path(filename).name != filename:
+            raise HomeAssistantError(f"Invalid file name {filename}")
+
+        return await async_export_history(
+            hass,
+            coordinator,
+            patient_id,
+            start,
+            end,
+            export_format,
+            Path(hass.config.path(DOMAIN, "exports", filename)),
+        )
+
+    async def _async_glucose_profile(call: ServiceCall) -> ServiceResponse:
+        """Return the ambulatory glucose profile of a patient."""
+        coordinator, patient_id = _patient(hass, call.data[ATTR_CONFIG_ENTRY_ID])
+        profile = coordinator.histories[patient_id].windows.get(
+            (AmbulatoryGlucoseProfile, AGP_DAYS * 86400)
+        )
+        if profile is None:
+            raise HomeAssistantError(
+                "The glucose profile option of the patient is not enabled"
+            )
+        if (report := profile.as_dict()) is None:
+            raise HomeAssistantError("The glucose profile holds no reading yet")
+        return report
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_HISTORY,
+        _async_export_history,
+        schema=EXPORT_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GLUCOSE_PROFILE,
+        _async_glucose_profile,
+        schema=GLUCOSE_PROFILE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,138 @@
+"""Pooled HTTP session shared by every request sent to LibreView."""
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.util.ssl import client_context
+
+from .const import (
+    DATA_SESSION,
+    HTTP_CONNECTIONS_PER_HOST,
+    HTTP_DNS_CACHE_SECONDS,
+    HTTP_KEEPALIVE_SECONDS,
+)
+
+
+@dataclass
+class HostConnectionStats:
+    """Connection figures of one LibreView host."""
+
+    requests: int = 0
+    # Connections opened, each one costing a DNS lookup unless cached and a TLS handshake.
+    handshakes: int = 0
+    reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+    encodings: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Return the share of requests sent on an already open connection."""
+        connections = self.handshakes + self.reused
+        return self.reused / connections if connections else 0.0
+
+    def as_dict(self) -> dict:
+        """Return the figures as a dict."""
+        return asdict(self) | {
+            "encodings": dict(self.encodings),
+            "reuse_ratio": self.reuse_ratio,
+        }
+
+
+class LibreLinkSession:
+    """aiohttp session with a connection pool tuned for polling LibreView.
+
+    Connections are kept alive between polls and pooled per host, so every
+    region the accounts are redirected to gets its own pool, DNS answers are
+    cached and aiohttp negotiates gzip (and brotli when available) for the
+    JSON payloads. Connection reuse is tracked per host.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the session."""
+        self.stats: dict[str, HostConnectionStats] = {}
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_connection_create_end.append(self._on_connection_create_end)
+        trace.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_cache_miss)
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=HTTP_CONNECTIONS_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                use_dns_cache=True,
+                ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+                ssl=client_context(),
+            ),
+            trace_configs=[trace],
+        )
+
+    async def async_close(self) -> None:
+        """Close the pooled connections."""
+        await self.session.close()
+
+    def _host(self, host: str | None) -> HostConnectionStats:
+        if (stats := self.stats.get(host)) is None:
+            stats = self.stats[host] = HostConnectionStats()
+        return stats
+
+    async def _on_request_start(
+        self, session, context: SimpleNamespace, params: aiohttp.TraceRequestStartParams
+    ) -> None:
+        context.host = params.url.host
+        self._host(context.host).requests += 1
+
+    async def _on_request_end(
+        self, session, context: SimpleNamespace, params: aiohttp.TraceRequestEndParams
+    ) -> None:
+        encoding = params.response.headers.get(aiohttp.hdrs.CONTENT_ENCODING)
+        self._host(context.host).encodings[encoding or "identity"] += 1
+
+    async def _on_connection_create_end(
+        self, session, context: SimpleNamespace, params
+    ) -> None:
+        self._host(context.host).handshakes += 1
+
+    async def _on_connection_reuseconn(
+        self, session, context: SimpleNamespace, params
+    ) -> None:
+        self._host(context.host).reused += 1
+
+    async def _on_dns_cache_hit(
+        self, session, context: SimpleNamespace, params: aiohttp.TraceDnsCacheHitParams
+    ) -> None:
+        self._host(params.host).dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(
+        self,
+        session,
+        context: SimpleNamespace,
+        params: aiohttp.TraceDnsCacheMissParams,
+    ) -> None:
+        self._host(params.host).dns_cache_misses += 1
+
+
+@callback
+def async_get_session(hass: HomeAssistant) -> LibreLinkSession:
+    """Return the session shared by the config flow and every account."""
+    if (session := hass.data.get(DATA_SESSION)) is not None:
+        return session
+
+    session = hass.data[DATA_SESSION] = LibreLinkSession()
+
+    async def _async_close(event: Event) -> None:
+        await session.async_close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return session
@@ -0,0 +1,271 @@
+"""Long-term glucose statistics for LibreLink."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import PERCENTAGE
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .api import LibreLinkAPI, LibreLinkAPIError, Measurement, Patient, Target
+from .const import (
+    DOMAIN,
+    LOGGER,
+    LONG_TERM_STATISTICS_SECONDS,
+    STATISTICS_IMPORT_DELAY_SECONDS,
+)
+from .history import ABOVE_RANGE, BELOW_RANGE, IN_RANGE, classify
+from .store import LibreLinkStore
+
+# Statistics published for every patient: name suffix and unit, by kind.
+GLUCOSE = "glucose"
+STATISTICS = {
+    GLUCOSE: ("glucose", "mg/dL"),
+    "time_below_range": ("time below range", PERCENTAGE),
+    "time_in_range": ("time in range", PERCENTAGE),
+    "time_above_range": ("time above range", PERCENTAGE),
+}
+RANGE_KINDS = {
+    BELOW_RANGE: "time_below_range",
+    IN_RANGE: "time_in_range",
+    ABOVE_RANGE: "time_above_range",
+}
+
+
+def statistic_id(patient_id: str, kind: str = GLUCOSE) -> str:
+    """Return the external statistic id of a kind of statistics of a patient."""
+    return f"{DOMAIN}:{kind}_{patient_id.replace('-', '_').lower()}"
+
+
+def _metadata(patient_id: str, name: str, kind: str) -> StatisticMetaData:
+    suffix, unit = STATISTICS[kind]
+    return StatisticMetaData(
+        has_mean=True,
+        has_sum=False,
+        name=f"{name} {suffix}",
+        source=DOMAIN,
+        statistic_id=statistic_id(patient_id, kind),
+        unit_of_measurement=unit,
+    )
+
+
+class GlucoseBucket:
+    """Readings of a patient aggregated over one statistics period."""
+
+    __slots__ = ("start", "complete", "count", "total", "minimum", "maximum", "ranges")
+
+    def __init__(self, start: int, complete: bool = True) -> None:
+        """Initialize the bucket starting at a POSIX timestamp."""
+        self.start = start
+        # False when readings of the period may be missing, after a reconnection.
+        self.complete = complete
+        self.count = 0
+        self.total = 0
+        self.minimum = 0
+        self.maximum = 0
+        self.ranges = {BELOW_RANGE: 0, IN_RANGE: 0, ABOVE_RANGE: 0}
+
+    def add(self, value: int, classification: int) -> None:
+        """Account for a reading of the period."""
+        if not self.count or value < self.minimum:
+            self.minimum = value
+        if not self.count or value > self.maximum:
+            self.maximum = value
+        self.count += 1
+        self.total += value
+        self.ranges[classification] += 1
+
+    def statistics(self) -> dict[str, StatisticData]:
+        """Return the statistics of the period, by kind."""
+        start = dt_util.utc_from_timestamp(self.start)
+        statistics = {
+            GLUCOSE: StatisticData(
+                start=start,
+                mean=self.total / self.count,
+                min=self.minimum,
+                max=self.maximum,
+            )
+        }
+        for classification, kind in RANGE_KINDS.items():
+            statistics[kind] = StatisticData(
+                start=start, mean=100 * self.ranges[classification] / self.count
+            )
+        return statistics
+
+
+def aggregate(
+    measurements: Iterable[Measurement], target: Target, seconds: int
+) -> list[GlucoseBucket]:
+    """Aggregate measurements into buckets of `seconds`, oldest first."""
+    buckets: dict[int, GlucoseBucket] = {}
+    for measurement in measurements:
+        timestamp = int(measurement.timestamp.timestamp())
+        start = timestamp - timestamp % seconds
+        if (bucket := buckets.get(start)) is None:
+            bucket = buckets[start] = GlucoseBucket(start)
+        bucket.add(measurement.value, classify(measurement.value, target))
+    return [buckets[start] for start in sorted(buckets)]
+
+
+def _statistics_by_kind(
+    buckets: Iterable[GlucoseBucket],
+) -> dict[str, list[StatisticData]]:
+    by_kind: dict[str, list[StatisticData]] = {kind: [] for kind in STATISTICS}
+    for bucket in buckets:
+        for kind, statistic in bucket.statistics().items():
+            by_kind[kind].append(statistic)
+    return by_kind
+
+
+def import_statistics(
+    hass: HomeAssistant,
+    patient_id: str,
+    name: str,
+    buckets: list[GlucoseBucket],
+) -> None:
+    """Import the hourly statistics of buckets of a patient."""
+    for kind, statistics in _statistics_by_kind(buckets).items():
+        async_add_external_statistics(
+            hass, _metadata(patient_id, name, kind), statistics
+        )
+
+
+def imported_hour(now: datetime) -> datetime:
+    """Return the start of the first hour not to be imported yet at `now`."""
+    delayed = now - timedelta(seconds=STATISTICS_IMPORT_DELAY_SECONDS)
+    return delayed.replace(minute=0, second=0, microsecond=0)
+
+
+class LibreLinkStatisticsWriter:
+    """Publish the glucose statistics of the patients as their readings arrive.
+
+    Readings are aggregated on arrival into the open hourly bucket of their
+    patient, a bucket closes when a reading of a later hour arrives and is
+    imported a while after the end of its hour. Buckets opened after a
+    reconnection may miss readings: their hours are left to the backfill.
+    """
+
+    def __init__(self, hass: HomeAssistant, store: LibreLinkStore) -> None:
+        """Initialize the writer."""
+        self.hass = hass
+        self.store = store
+        self._names: dict[str, str] = {}
+        self._open: dict[str, GlucoseBucket] = {}
+        self._closed: list[tuple[str, GlucoseBucket]] = []
+
+    def add(self, patient: Patient) -> None:
+        """Account for the new reading of a patient."""
+        self._names[patient.id] = patient.name
+        value = patient.measurement.value
+        classification = classify(value, patient.target)
+        timestamp = int(patient.measurement.timestamp.timestamp())
+        start = timestamp - timestamp % LONG_TERM_STATISTICS_SECONDS
+        bucket = self._open.get(patient.id)
+        if bucket is None or bucket.start != start:
+            if bucket is not None:
+                self._closed.append((patient.id, bucket))
+            # Only a bucket following another one saw every reading of its period.
+            bucket = self._open[patient.id] = GlucoseBucket(start, bucket is not None)
+        bucket.add(value, classification)
+
+    def reset(self) -> None:
+        """Drop the open buckets, readings may have been missed meanwhile."""
+        self._open.clear()
+
+    def forget(self, patient_id: str) -> None:
+        """Drop the buckets of a patient no longer tracked."""
+        self._names.pop(patient_id, None)
+        self._open.pop(patient_id, None)
+        self._closed = [item for item in self._closed if item[0] != patient_id]
+
+    def flush(self, now: datetime) -> set[str]:
+        """Import the closed buckets, return the patients with incomplete hours."""
+        if "recorder" not in self.hass.config.components:
+            self._closed.clear()
+            return set()
+
+        ready = imported_hour(now).timestamp()
+        due = [(pid, bucket) for pid, bucket in self._closed if bucket.start < ready]
+        self._closed = [
+            (pid, bucket) for pid, bucket in self._closed if bucket.start >= ready
+        ]
+
+        incomplete = set()
+        for pid, buckets in _by_patient(due).items():
+            if complete := [bucket for bucket in buckets if bucket.complete]:
+                import_statistics(self.hass, pid, self._names[pid], complete)
+                end = dt_util.utc_from_timestamp(
+                    complete[-1].start + LONG_TERM_STATISTICS_SECONDS
+                )
+                cursor = self.store.backfill_cursor(pid)
+                if cursor is None or cursor < end:
+                    self.store.async_set_backfill_cursor(pid, end)
+            if len(complete) < len(buckets):
+                incomplete.add(pid)
+        return incomplete
+
+
+def _by_patient(
+    items: Iterable[tuple[str, GlucoseBucket]],
+) -> dict[str, list[GlucoseBucket]]:
+    by_patient: dict[str, list[GlucoseBucket]] = {}
+    for pid, bucket in items:
+        by_patient.setdefault(pid, []).append(bucket)
+    return by_patient
+
+
+class LibreLinkHistoryBackfill:
+    """Import the glucose history missed while Home Assistant was not polling.
+
+    The graph endpoint only returns the last hours of readings, it is fetched
+    once per reconnection and only when at least one complete hour is missing
+    since the last import. Complete hours are imported in a single batch, once
+    the recorder compiled them.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, api: LibreLinkAPI, store: LibreLinkStore
+    ) -> None:
+        """Initialize the backfill."""
+        self.hass = hass
+        self.api = api
+        self.store = store
+
+    async def async_backfill(self, patients: Iterable[Patient]) -> None:
+        """Import the missing complete hours of every given patient."""
+        if "recorder" not in self.hass.config.components:
+            return
+        for patient in patients:
+            try:
+                await self._async_backfill_patient(patient)
+            except LibreLinkAPIError as e:
+                LOGGER.warning(
+                    "Unable to backfill the history of patient %s: %s", patient.id, e
+                )
+
+    async def _async_backfill_patient(self, patient: Patient) -> None:
+        current_hour = imported_hour(dt_util.utcnow())
+        cursor = self.store.backfill_cursor(patient.id)
+        if cursor is not None and cursor >= current_hour:
+            return
+
+        measurements = [
+            measurement
+            for measurement in await self.api.async_get_graph(patient.id)
+            if measurement.timestamp < current_hour
+            and (cursor is None or measurement.timestamp >= cursor)
+        ]
+        if buckets := aggregate(
+            measurements, patient.target, LONG_TERM_STATISTICS_SECONDS
+        ):
+            LOGGER.debug(
+                "Importing %s hours of history for patient %s",
+                len(buckets),
+                patient.id,
+            )
+            import_statistics(self.hass, patient.id, patient.name, buckets)
+        self.store.async_set_backfill_cursor(patient.id, current_hour)
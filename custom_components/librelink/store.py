@@ -0,0 +1,165 @@
+"""Persisted per-account state for LibreLink."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from hashlib import sha256
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import AuthTicket, Patient
+from .const import (
+    DOMAIN,
+    SNAPSHOT_SAVE_INTERVAL_SECONDS,
+    STORAGE_SAVE_DELAY_SECONDS,
+    STORAGE_VERSION,
+)
+
+
+def _storage_key(username: str) -> str:
+    """Return the storage key of an account without exposing the username."""
+    return f"{DOMAIN}.{sha256(username.lower().encode()).hexdigest()[:16]}"
+
+
+class LibreLinkStore:
+    """State of one LibreLink account kept across Home Assistant restarts."""
+
+    def __init__(self, hass: HomeAssistant, username: str) -> None:
+        """Initialize the store."""
+        self._hass = hass
+        self._store: Store[dict] = Store(hass, STORAGE_VERSION, _storage_key(username))
+        self._data: dict = {}
+        self._unsub_snapshot_save: CALLBACK_TYPE | None = None
+        self._unsub_stop: CALLBACK_TYPE | None = None
+        # True while changes of the state wait to be written.
+        self._unsaved = False
+
+    @property
+    def key(self) -> str:
+        """Return the storage key of the account."""
+        return self._store.key
+
+    async def async_load(self) -> None:
+        """Load the persisted state."""
+        self._data = await self._store.async_load() or {}
+        self._unsub_stop = self._hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_stop
+        )
+
+    async def async_shutdown(self) -> None:
+        """Write the pending state at once, the store is no longer used."""
+        self._async_cancel()
+        if self._unsaved:
+            self._unsaved = False
+            await self._store.async_save(self._data)
+
+    async def async_remove(self) -> None:
+        """Remove the persisted state."""
+        self._async_cancel()
+        self._data = {}
+        self._unsaved = False
+        await self._store.async_remove()
+
+    async def _async_stop(self, _event: Event) -> None:
+        self._unsub_stop = None
+        await self.async_shutdown()
+
+    @callback
+    def _async_cancel(self) -> None:
+        """Cancel the snapshot write planned and the stop listener."""
+        if self._unsub_snapshot_save is not None:
+            self._unsub_snapshot_save()
+            self._unsub_snapshot_save = None
+        if self._unsub_stop is not None:
+            self._unsub_stop()
+            self._unsub_stop = None
+
+    @property
+    def ticket(self) -> AuthTicket | None:
+        """Return the persisted authentication ticket."""
+        if (ticket := self._data.get("ticket")) is None:
+            return None
+        return AuthTicket.from_dict(ticket)
+
+    @callback
+    def async_save_ticket(self, ticket: AuthTicket) -> None:
+        """Persist the authentication ticket when its token changed."""
+        if (stored := self.ticket) is not None and stored.token == ticket.token:
+            return
+        self._data["ticket"] = ticket.as_dict()
+        self._async_delay_save()
+
+    def backfill_cursor(self, patient_id: str) -> datetime | None:
+        """Return the end of the history already imported for a patient."""
+        if (cursor := self._data.get("backfill", {}).get(patient_id)) is None:
+            return None
+        return dt_util.parse_datetime(cursor)
+
+    @callback
+    def async_set_backfill_cursor(self, patient_id: str, cursor: datetime) -> None:
+        """Persist the end of the history imported for a patient."""
+        self._data.setdefault("backfill", {})[patient_id] = cursor.isoformat()
+        self._async_delay_save()
+
+    def logbook_cursor(self, patient_id: str) -> tuple[datetime, list[str]] | None:
+        """Return the newest logbook entry time processed and the ids last seen."""
+        if (cursor := self._data.get("logbook", {}).get(patient_id)) is None:
+            return None
+        return dt_util.parse_datetime(cursor["timestamp"]), cursor["seen"]
+
+    @callback
+    def async_set_logbook_cursor(
+        self, patient_id: str, timestamp: datetime, seen: list[str]
+    ) -> None:
+        """Persist the newest logbook entry time processed and the ids last seen."""
+        self._data.setdefault("logbook", {})[patient_id] = {
+            "timestamp": timestamp.isoformat(),
+            "seen": seen,
+        }
+        self._async_delay_save()
+
+    @property
+    def snapshot(self) -> tuple[dict[str, Patient], datetime] | None:
+        """Return the last known patient data and when it was fetched."""
+        if (snapshot := self._data.get("snapshot")) is None:
+            return None
+        return (
+            {
+                patient["id"]: Patient.from_dict(patient)
+                for patient in snapshot["patients"]
+            },
+            dt_util.parse_datetime(snapshot["timestamp"]),
+        )
+
+    @callback
+    def async_save_snapshot(
+        self, data: dict[str, Patient], timestamp: datetime
+    ) -> None:
+        """Keep the last known patient data, written at most once per interval."""
+        self._unsaved = True
+        self._data["snapshot"] = {
+            "timestamp": timestamp.isoformat(),
+            "patients": [patient.as_dict() for patient in data.values()],
+        }
+        if self._unsub_snapshot_save is None:
+            self._unsub_snapshot_save = async_call_later(
+                self._hass, SNAPSHOT_SAVE_INTERVAL_SECONDS, self._async_write_snapshot
+            )
+
+    @callback
+    def _async_write_snapshot(self, _now: datetime) -> None:
+        self._unsub_snapshot_save = None
+        self._async_delay_save()
+
+    @callback
+    def _async_delay_save(self) -> None:
+        self._unsaved = True
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY_SECONDS)
+
+    def _data_to_save(self) -> dict:
+        self._unsaved = False
+        return self._data
@@ -0,0 +1,209 @@
+"""Request throttling shared by every account polling the same LibreView host."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+import time
+from urllib.parse import urlsplit
+
+from .const import (
+    BREAKER_COOLDOWN_SECONDS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_COOLDOWN_SECONDS,
+    THROTTLE_BURST,
+    THROTTLE_CONCURRENCY,
+    THROTTLE_DEFAULT_RETRY_AFTER_SECONDS,
+    THROTTLE_RATE_PER_SECOND,
+)
+
+
+def parse_retry_after(value: str | None) -> float:
+    """Return the delay in seconds requested by a `Retry-After` header."""
+    if not value:
+        return THROTTLE_DEFAULT_RETRY_AFTER_SECONDS
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return THROTTLE_DEFAULT_RETRY_AFTER_SECONDS
+
+
+class CircuitBreaker:
+    """Stop sending requests to a host after consecutive connection failures.
+
+    After `threshold` failures in a row the circuit opens for `cooldown`
+    seconds, then lets a single trial request through. A failed trial opens it
+    again for twice as long, up to `max_cooldown`. Any answer closes it.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN_SECONDS,
+    ) -> None:
+        """Initialize the circuit breaker."""
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.trips = 0
+        self._cooldown = cooldown
+        self._opened_until = 0.0
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """Return closed, open or half_open."""
+        if self.failures < self.threshold:
+            return "closed"
+        if self._trial or time.monotonic() >= self._opened_until:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent to the host."""
+        if self.failures < self.threshold:
+            return True
+        if self._trial or time.monotonic() < self._opened_until:
+            return False
+        self._trial = True
+        return True
+
+    def record_success(self) -> None:
+        """Close the circuit after the host answered."""
+        self.failures = 0
+        self._trial = False
+        self._cooldown = self.base_cooldown
+
+    def end_trial(self) -> None:
+        """Let another trial through after one ended without a verdict."""
+        self._trial = False
+
+    def record_failure(self) -> None:
+        """Account for a connection failure, opening the circuit if needed."""
+        self.failures += 1
+        if self._trial:
+            self._trial = False
+            self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+        elif self.failures != self.threshold:
+            return
+        self.trips += 1
+        self._opened_until = time.monotonic() + self._cooldown
+
+
+class HostThrottle:
+    """Token bucket plus concurrency cap for the requests sent to one host.
+
+    Requests wait for a token, refilled at `rate` per second up to `burst`,
+    and for one of `concurrency` slots. A `Retry-After` received from the host
+    holds every request back until it elapses.
+    """
+
+    def __init__(
+        self,
+        rate: float = THROTTLE_RATE_PER_SECOND,
+        burst: int = THROTTLE_BURST,
+        concurrency: int = THROTTLE_CONCURRENCY,
+    ) -> None:
+        """Initialize the throttle."""
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.breaker = CircuitBreaker()
+
+        self.queue_depth = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait until a request may be sent to the host."""
+        start = time.monotonic()
+        self.queue_depth += 1
+        try:
+            await self._async_take_token()
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        wait = time.monotonic() - start
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def retry_after(self, seconds: float) -> None:
+        """Hold every request back for the given delay requested by the host."""
+        self.rate_limited += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    @property
+    def stats(self) -> dict[str, float | str]:
+        """Return the queue and wait time figures of the throttle."""
+        return {
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "mean_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+            "blocked_for": max(self._blocked_until - time.monotonic(), 0.0),
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+        }
+
+    async def _async_take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._refilled) * self.rate
+            )
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class HostThrottleRegistry:
+    """One `HostThrottle` per LibreView host."""
+
+    def __init__(
+        self,
+        rate: float = THROTTLE_RATE_PER_SECOND,
+        burst: int = THROTTLE_BURST,
+        concurrency: int = THROTTLE_CONCURRENCY,
+    ) -> None:
+        """Initialize the registry, with the settings of every throttle."""
+        self._throttles: dict[str, HostThrottle] = {}
+        self._settings = (rate, burst, concurrency)
+
+    def get(self, base_url: str) -> HostThrottle:
+        """Return the throttle of the host of the given url."""
+        host = urlsplit(base_url).netloc
+        if (throttle := self._throttles.get(host)) is None:
+            throttle = self._throttles[host] = HostThrottle(*self._settings)
+        return throttle
+
+    @property
+    def stats(self) -> dict[str, dict[str, float | str]]:
+        """Return the figures of every host."""
+        return {host: throttle.stats for host, throttle in self._throttles.items()}
@@ -0,0 +1,199 @@
+"""Record the API traffic of an account and replay it offline."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator
+import gzip
+import json
+from pathlib import Path
+import time
+from typing import Any
+from urllib.parse import urlsplit
+import zlib
+
+import aiohttp
+from multidict import CIMultiDict
+
+REDACTED = "**REDACTED**"
+# Keys whose values are replaced in the recordings, wherever they appear.
+TO_REDACT = {"email", "password", "token"}
+# Response headers kept in the recordings.
+RECORDED_HEADERS = ("Content-Type", "Retry-After")
+
+
+def redact(data: Any) -> Any:
+    """Return a copy of a JSON value with the credentials and tokens replaced."""
+    if isinstance(data, dict):
+        return {
+            key: REDACTED if key in TO_REDACT else redact(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [redact(value) for value in data]
+    return data
+
+
+class TrafficRecorder:
+    """Append the exchanges of an account to a gzip compressed JSONL file.
+
+    Every line holds one request and its response or error, with credentials
+    and tokens redacted. Lines are written in the executor, in order, and each
+    batch is its own gzip member so a recording cut short stays readable.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize the recorder."""
+        self.path = Path(path)
+        self._pending: list[str] = []
+        self._flushing: asyncio.Task | None = None
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        data: dict | None,
+        elapsed: float,
+        status: int | None = None,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+        error: str | None = None,
+    ) -> None:
+        """Queue an exchange for writing."""
+        line = {
+            "time": time.time(),
+            "method": method,
+            "url": url,
+            "request": redact(data),
+            "elapsed": round(elapsed, 4),
+        }
+        if error is not None:
+            line["error"] = error
+        else:
+            line["status"] = status
+            line["headers"] = {
+                header: headers[header]
+                for header in RECORDED_HEADERS
+                if header in headers
+            }
+            try:
+                line["response"] = redact(json.loads(body))
+            except ValueError:
+                line["text"] = body.decode(errors="replace")
+        self._pending.append(json.dumps(line, separators=(",", ":")))
+
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.get_running_loop().create_task(self._async_flush())
+
+    async def async_close(self) -> None:
+        """Wait until every queued exchange is written."""
+        if self._flushing is not None:
+            await self._flushing
+
+    async def _async_flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            lines, self._pending = self._pending, []
+            await loop.run_in_executor(None, self._write, lines)
+
+    def _write(self, lines: list[str]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+def read_recording(path: str | Path) -> Iterator[dict]:
+    """Yield the exchanges of a recording, ignoring a truncated end."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error, ValueError):
+            return
+
+
+class ReplayResponse:
+    """Recorded response served by `ReplaySession`."""
+
+    def __init__(self, exchange: dict, speed: float) -> None:
+        """Initialize the response."""
+        self._exchange = exchange
+        self._speed = speed
+        self.status: int = exchange.get("status", 0)
+        self.headers = CIMultiDict(exchange.get("headers", {}))
+
+    async def __aenter__(self) -> ReplayResponse:
+        """Wait the recorded latency, then raise the recorded error if any."""
+        if self._speed:
+            await asyncio.sleep(self._exchange["elapsed"] / self._speed)
+        if (error := self._exchange.get("error")) == "timeout":
+            raise TimeoutError
+        if error is not None:
+            raise aiohttp.ClientConnectionError(error)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Release the response."""
+
+    async def read(self) -> bytes:
+        """Return the recorded body, with ticket expirations moved to the present."""
+        if "response" in self._exchange:
+            offset = int(time.time() - self._exchange["time"])
+            return json.dumps(
+                _shift_expires(self._exchange["response"], offset)
+            ).encode()
+        return self._exchange.get("text", "").encode()
+
+
+def _shift_expires(data: Any, offset: int) -> Any:
+    """Return a copy of a JSON value with its `expires` timestamps shifted."""
+    if isinstance(data, dict):
+        return {
+            key: (
+                value + offset
+                if key == "expires" and isinstance(value, int)
+                else _shift_expires(value, offset)
+            )
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [_shift_expires(value, offset) for value in data]
+    return data
+
+
+class ReplaySession:
+    """Stand-in for `aiohttp.ClientSession` serving recorded exchanges.
+
+    Requests get the recorded responses of the same method and path in their
+    recorded order, after the recorded latency divided by `speed` (0 replies
+    at once), and are marked as served. A request with no recording left fails
+    as a connection error.
+    """
+
+    def __init__(self, exchanges: Iterable[dict], speed: float = 1.0) -> None:
+        """Initialize the session."""
+        self.speed = speed
+        self._exchanges: dict[tuple[str, str], deque[dict]] = defaultdict(deque)
+        for exchange in exchanges:
+            self._exchanges[exchange["method"], exchange["url"]].append(exchange)
+
+    @property
+    def remaining(self) -> int:
+        """Return the number of recorded exchanges not served yet."""
+        return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+    def request(self, method: str, url: str, **kwargs) -> ReplayResponse:
+        """Return the next recorded response of the request."""
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        if not (exchanges := self._exchanges.get((method, path))):
+            exchange = {"error": f"No recording left for {method} {path}"}
+            return ReplayResponse(exchange | {"elapsed": 0}, self.speed)
+        exchange = exchanges.popleft()
+        exchange["served"] = True
+        return ReplayResponse(exchange, self.speed)
+
+    async def close(self) -> None:
+        """Close the session."""
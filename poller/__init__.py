@@ -0,0 +1,51 @@
+"""Headless LibreLinkUp poller, built on the API client of the integration.
+
+The package of the integration imports Home Assistant, its API client and the
+modules the client depends on do not. Unless the integration is already
+imported, it is stood for by a bare package so they import alone, without
+Home Assistant installed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from importlib.machinery import ModuleSpec
+from pathlib import Path
+import sys
+
+INTEGRATION = "custom_components.librelink"
+
+
+def _load_integration_package() -> None:
+    if INTEGRATION in sys.modules:
+        return
+    spec = ModuleSpec(INTEGRATION, None, is_package=True)
+    spec.submodule_search_locations = [
+        str(Path(__file__).parent.parent / "custom_components" / "librelink")
+    ]
+    sys.modules[INTEGRATION] = importlib.util.module_from_spec(spec)
+
+
+_load_integration_package()
+
+from .daemon import (  # noqa: E402
+    Account,
+    MqttSink,
+    NdjsonSink,
+    Poller,
+    PollerError,
+    PollerStats,
+    partition,
+    reading,
+)
+
+__all__ = [
+    "Account",
+    "MqttSink",
+    "NdjsonSink",
+    "Poller",
+    "PollerError",
+    "PollerStats",
+    "partition",
+    "reading",
+]
@@ -0,0 +1,134 @@
+"""Poll LibreLinkUp accounts and emit their readings as NDJSON or over MQTT.
+
+Accounts are read from a JSON file holding a list of objects with a
+`username`, a `password` and optionally the `url` of their LibreView region.
+Readings go to stdout, one JSON object per line, or to an MQTT broker with
+`--mqtt-host`. Several processes or nodes split the same accounts file with
+`--partition INDEX/COUNT`. Throughput figures are logged to stderr.
+
+Usage: `python -m poller accounts.json --partition 0/4`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+from pathlib import Path
+
+from custom_components.librelink.const import (
+    THROTTLE_BURST,
+    THROTTLE_CONCURRENCY,
+    THROTTLE_RATE_PER_SECOND,
+)
+from custom_components.librelink.throttle import HostThrottleRegistry
+
+from .daemon import (
+    LOGGER,
+    Account,
+    MqttSink,
+    NdjsonSink,
+    Poller,
+    PollerError,
+    partition,
+)
+
+
+def _load_accounts(path: str) -> list[Account]:
+    try:
+        return [
+            Account.from_dict(data)
+            for data in json.loads(Path(path).read_text(encoding="utf-8"))
+        ]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise PollerError(f"Invalid accounts file {path}: {e!r}") from e
+
+
+def _partition(value: str) -> tuple[int, int]:
+    index, _, count = value.partition("/")
+    if not (index.isdigit() and count.isdigit() and int(index) < int(count)):
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, as 0/4")
+    return int(index), int(count)
+
+
+async def _report(poller: Poller, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        LOGGER.info("%s", poller.stats.as_dict())
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Poll the accounts until interrupted, or `--polls` times."""
+    accounts = _load_accounts(args.accounts)
+    if args.partition is not None:
+        accounts = partition(accounts, *args.partition)
+    sink = (
+        MqttSink(
+            args.mqtt_host,
+            args.mqtt_port,
+            args.mqtt_topic,
+            args.mqtt_username,
+            args.mqtt_password,
+        )
+        if args.mqtt_host
+        else NdjsonSink()
+    )
+    poller = Poller(
+        accounts,
+        sink,
+        throttles=HostThrottleRegistry(args.rate, args.burst, args.concurrency),
+        interval=args.interval,
+        polls=args.polls,
+    )
+
+    LOGGER.info("Polling %s accounts", len(accounts))
+    async with sink:
+        report = asyncio.create_task(_report(poller, args.stats_interval))
+        try:
+            await poller.async_run()
+        finally:
+            report.cancel()
+            LOGGER.info("%s", poller.stats.as_dict())
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("accounts", help="JSON file listing the accounts")
+    parser.add_argument(
+        "--partition", type=_partition, help="INDEX/COUNT of the accounts to poll"
+    )
+    parser.add_argument("--mqtt-host", help="publish to this broker, not stdout")
+    parser.add_argument("--mqtt-port", type=int, default=1883)
+    parser.add_argument("--mqtt-topic", default="librelink")
+    parser.add_argument("--mqtt-username")
+    parser.add_argument("--mqtt-password")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=THROTTLE_RATE_PER_SECOND,
+        help="requests per second to one LibreView host",
+    )
+    parser.add_argument("--burst", type=int, default=THROTTLE_BURST)
+    parser.add_argument("--concurrency", type=int, default=THROTTLE_CONCURRENCY)
+    parser.add_argument(
+        "--interval", type=float, help="fixed seconds between polls of an account"
+    )
+    parser.add_argument("--polls", type=int, help="stop after that many polls")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="seconds")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = _parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if arguments.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        try:
+            asyncio.run(run(arguments))
+        except PollerError as e:
+            raise SystemExit(str(e)) from e
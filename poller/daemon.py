@@ -0,0 +1,284 @@
+"""Poll many LibreLinkUp accounts on one event loop, without Home Assistant."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from hashlib import sha256
+import json
+import logging
+import sys
+import time
+from typing import TextIO
+
+import aiohttp
+
+from custom_components.librelink.api import (
+    LibreLinkAPI,
+    LibreLinkAPIAuthenticationError,
+    LibreLinkAPIError,
+    Patient,
+)
+from custom_components.librelink.const import (
+    BASE_URL_LIST,
+    HTTP_CONNECTIONS_PER_HOST,
+    HTTP_DNS_CACHE_SECONDS,
+    HTTP_KEEPALIVE_SECONDS,
+    MEASUREMENT_INTERVAL_SECONDS,
+)
+from custom_components.librelink.scheduler import PollScheduler, account_phase
+from custom_components.librelink.throttle import HostThrottleRegistry
+
+LOGGER = logging.getLogger(__package__)
+
+
+class PollerError(Exception):
+    """Exception raised when the poller cannot start."""
+
+
+@dataclass(frozen=True, slots=True)
+class Account:
+    """Credentials of a LibreLinkUp account."""
+
+    username: str
+    password: str = field(repr=False)
+    base_url: str = BASE_URL_LIST["Global"]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Account:
+        """Create an account from a dict with a username, a password and an url."""
+        return cls(
+            username=data["username"],
+            password=data["password"],
+            base_url=data.get("url", BASE_URL_LIST["Global"]),
+        )
+
+
+def partition(accounts: Iterable[Account], index: int, count: int) -> list[Account]:
+    """Return the accounts of one of `count` stable partitions, for one process."""
+    return [
+        account
+        for account in accounts
+        if int.from_bytes(sha256(account.username.lower().encode()).digest()[:4])
+        % count
+        == index
+    ]
+
+
+def reading(patient: Patient) -> dict:
+    """Return the last reading of a patient as a JSON serializable dict."""
+    return {
+        "patient_id": patient.id,
+        "patient": patient.name,
+        "timestamp": patient.measurement.timestamp.isoformat(),
+        "value_mg_dl": patient.measurement.value,
+        "trend": patient.measurement.trend,
+        "target_low": patient.target.low,
+        "target_high": patient.target.high,
+    }
+
+
+class ReadingSink:
+    """Destination of the readings, used as an async context manager."""
+
+    async def __aenter__(self) -> ReadingSink:
+        """Open the sink."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Close the sink."""
+
+    async def async_publish(self, readings: list[dict]) -> None:
+        """Publish the new readings of a poll."""
+        raise NotImplementedError
+
+
+class NdjsonSink(ReadingSink):
+    """Write the readings as newline-delimited JSON, one write per poll."""
+
+    def __init__(self, stream: TextIO = sys.stdout) -> None:
+        """Initialize the sink."""
+        self.stream = stream
+
+    async def async_publish(self, readings: list[dict]) -> None:
+        """Write the new readings of a poll."""
+        self.stream.write(
+            "".join(
+                json.dumps(reading, separators=(",", ":")) + "\n"
+                for reading in readings
+            )
+        )
+        self.stream.flush()
+
+
+class MqttSink(ReadingSink):
+    """Publish the readings to an MQTT broker, retained, one topic per patient."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 1883,
+        topic: str = "librelink",
+        username: str | None = None,
+        password: str | None = None,
+    ) -> None:
+        """Initialize the sink."""
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.username = username
+        self.password = password
+        self._client = None
+
+    async def __aenter__(self) -> MqttSink:
+        """Connect to the broker."""
+        try:
+            import aiomqtt
+        except ImportError as e:
+            raise PollerError("The MQTT output needs aiomqtt") from e
+
+        self._client = aiomqtt.Client(
+            self.host, self.port, username=self.username, password=self.password
+        )
+        await self._client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Disconnect from the broker."""
+        await self._client.__aexit__(*exc_info)
+
+    async def async_publish(self, readings: list[dict]) -> None:
+        """Publish the new readings of a poll."""
+        for reading in readings:
+            await self._client.publish(
+                f"{self.topic}/{reading['patient_id']}",
+                json.dumps(reading, separators=(",", ":")),
+                retain=True,
+            )
+
+
+@dataclass(slots=True)
+class PollerStats:
+    """Throughput of the poller since it started."""
+
+    accounts: int = 0
+    polls: int = 0
+    readings: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.monotonic)
+    cpu_started: float = field(default_factory=time.process_time)
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the figures, with the accounts a core can poll at the sensor cadence."""
+        elapsed = time.monotonic() - self.started
+        cpu = time.process_time() - self.cpu_started
+        return {
+            "accounts": self.accounts,
+            "polls": self.polls,
+            "readings": self.readings,
+            "errors": self.errors,
+            "elapsed": round(elapsed, 1),
+            "cpu": round(cpu, 3),
+            "polls_per_second": round(self.polls / elapsed, 2) if elapsed else 0.0,
+            # Every account polls about once per measurement interval.
+            "accounts_per_core": (
+                round(self.polls / cpu * MEASUREMENT_INTERVAL_SECONDS) if cpu else 0
+            ),
+        }
+
+
+class Poller:
+    """Poll accounts concurrently and publish the new reading of every patient.
+
+    Accounts share one pooled aiohttp session and one throttle per LibreView
+    host, and each polls on its own `PollScheduler`, shifted by its account
+    phase, as the integration does. A fixed `interval` in seconds replaces the
+    scheduler, `polls` stops every account after that many polls. An account
+    whose credentials are rejected stops, the other ones go on.
+    """
+
+    def __init__(
+        self,
+        accounts: Iterable[Account],
+        sink: ReadingSink,
+        throttles: HostThrottleRegistry | None = None,
+        interval: float | None = None,
+        polls: int | None = None,
+    ) -> None:
+        """Initialize the poller."""
+        self.accounts = list(accounts)
+        self.sink = sink
+        self.throttles = throttles or HostThrottleRegistry()
+        self.interval = interval
+        self.polls = polls
+        self.stats = PollerStats(accounts=len(self.accounts))
+
+    async def async_run(self) -> None:
+        """Poll every account until cancelled, or `polls` times."""
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=HTTP_CONNECTIONS_PER_HOST,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                use_dns_cache=True,
+                ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            )
+        )
+        async with session, asyncio.TaskGroup() as group:
+            for account in self.accounts:
+                group.create_task(self._async_poll_account(session, account))
+
+    async def _async_poll_account(
+        self, session: aiohttp.ClientSession, account: Account
+    ) -> None:
+        api = LibreLinkAPI(
+            base_url=account.base_url, session=session, throttles=self.throttles
+        )
+        # Logged in by the first poll.
+        api.set_credentials(account.username, account.password)
+        scheduler = PollScheduler(account_phase(account.username))
+        timestamps: dict[str, datetime] = {}
+
+        polls = 0
+        while self.polls is None or polls < self.polls:
+            polls += 1
+            self.stats.polls += 1
+            try:
+                patients = await api.async_get_data()
+            except LibreLinkAPIAuthenticationError:
+                self.stats.errors += 1
+                LOGGER.error(
+                    "Credentials of %s rejected, stop polling", account.username
+                )
+                return
+            except LibreLinkAPIError as e:
+                self.stats.errors += 1
+                LOGGER.warning("Unable to poll %s: %s", account.username, e)
+                delay = scheduler.failure_interval()
+            except (KeyError, TypeError, ValueError) as e:
+                # A malformed payload must not stop the polls of the other accounts.
+                self.stats.errors += 1
+                LOGGER.warning(
+                    "Unable to parse the patients of %s: %r", account.username, e
+                )
+                delay = scheduler.failure_interval()
+            else:
+                new = [
+                    patient
+                    for patient in patients
+                    if timestamps.get(patient.id) != patient.measurement.timestamp
+                ]
+                for patient in new:
+                    timestamps[patient.id] = patient.measurement.timestamp
+                if new:
+                    self.stats.readings += len(new)
+                    await self.sink.async_publish([reading(patient) for patient in new])
+                delay = scheduler.next_interval(patients, datetime.now(UTC))
+
+            if self.polls is None or polls < self.polls:
+                await asyncio.sleep(
+                    self.interval
+                    if self.interval is not None
+                    else delay.total_seconds()
+                )
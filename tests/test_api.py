@@ -0,0 +1,52 @@
+"""Tests of the parsing of the API responses."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from benchmarks.mock_server import build_connections
+from custom_components.librelink.api import LibreLinkAPI, Measurement
+
+NOW = datetime(2024, 1, 1, 13, 5, tzinfo=UTC)
+
+
+def _parser() -> LibreLinkAPI:
+    # Parsing sends no request, the session is never opened.
+    return LibreLinkAPI(base_url="http://localhost", session=None)
+
+
+def test_only_tracked_patients_are_parsed() -> None:
+    """Connections of untracked patients are skipped."""
+    connections = build_connections(5, NOW)
+    tracked = {connections[1]["patientId"], connections[3]["patientId"]}
+
+    patients = _parser().parse_patients(connections, tracked)
+    assert {patient.id for patient in patients} == tracked
+    assert len(_parser().parse_patients(connections)) == 5
+
+
+def test_timestamps_are_parsed_as_utc() -> None:
+    """API timestamps use a 12 hour clock and are UTC."""
+    (patient,) = _parser().parse_patients(build_connections(1, NOW))
+    assert patient.measurement.timestamp == NOW
+
+
+def test_unchanged_readings_are_shared() -> None:
+    """A poll repeating a reading reuses the objects parsed the first time."""
+    api = _parser()
+    (first,) = api.parse_patients(build_connections(1, NOW))
+    (repeated,) = api.parse_patients(build_connections(1, NOW))
+    (later,) = api.parse_patients(build_connections(1, NOW + timedelta(minutes=1)))
+
+    assert repeated.measurement is first.measurement
+    assert repeated.target is first.target
+    assert repeated.device is first.device
+    assert later.measurement is not first.measurement
+    assert later.measurement.timestamp == NOW + timedelta(minutes=1)
+
+
+def test_graph_points_have_no_trend() -> None:
+    """Graph points miss the trend arrow of the latest measurement."""
+    item = build_connections(1, NOW)[0]["glucoseMeasurement"]
+    del item["TrendArrow"]
+    assert Measurement.from_api_response_data(item).trend is None
@@ -0,0 +1,102 @@
+"""Tests of the persisted authentication ticket and the re-login on 401."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from benchmarks.mock_server import MockLibreLinkServer, MockServerConfig
+from custom_components.librelink.api import (
+    AuthTicket,
+    LibreLinkAPI,
+    LibreLinkAPIAuthenticationError,
+)
+from custom_components.librelink.const import TOKEN_REFRESH_MARGIN_SECONDS
+
+
+async def _async_run(config: MockServerConfig, test) -> MockLibreLinkServer:
+    async with MockLibreLinkServer(
+        config
+    ) as server, aiohttp.ClientSession() as session:
+        await test(lambda: LibreLinkAPI(base_url=server.url, session=session))
+    return server
+
+
+def test_persisted_ticket_is_reused() -> None:
+    """A ticket persisted by a previous run saves the login."""
+    saved: list[dict] = []
+
+    async def test(create_api) -> None:
+        api = create_api()
+        api.ticket_callback = lambda ticket: saved.append(ticket.as_dict())
+        await api.async_login("a@b", "x")
+
+        api = create_api()
+        await api.async_authenticate("a@b", "x", AuthTicket.from_dict(saved[-1]))
+        assert await api.async_get_data()
+
+    server = asyncio.run(_async_run(MockServerConfig(), test))
+    assert server.requests["login"] == 1
+
+
+def test_expiring_ticket_is_refreshed_first() -> None:
+    """A ticket about to expire is replaced before the request is sent."""
+
+    async def test(create_api) -> None:
+        api = create_api()
+        await api.async_login("a@b", "x")
+        ticket = api.ticket
+        expiring = AuthTicket(
+            token=ticket.token,
+            expires=int(time.time() + TOKEN_REFRESH_MARGIN_SECONDS / 2),
+            account_id=ticket.account_id,
+        )
+
+        api = create_api()
+        api.set_credentials("a@b", "x", expiring)
+        assert api.ticket is None
+        assert await api.async_get_data()
+        assert api.ticket.token != ticket.token
+
+    server = asyncio.run(_async_run(MockServerConfig(), test))
+    assert server.requests["login"] == 2
+    assert server.responses[401] == 0
+
+
+def test_rejected_ticket_logs_in_again() -> None:
+    """A ticket rejected by the host is renewed and the request sent again."""
+    saved: list[AuthTicket] = []
+
+    async def test(create_api) -> None:
+        api = create_api()
+        api.ticket_callback = saved.append
+        stale = AuthTicket(
+            token="revoked",
+            expires=int(time.time() + TOKEN_REFRESH_MARGIN_SECONDS * 2),
+            account_id="id",
+        )
+        await api.async_authenticate("a@b", "x", stale)
+        assert api.ticket is stale
+        assert await api.async_get_data()
+        assert saved[-1].token != "revoked"
+
+    server = asyncio.run(_async_run(MockServerConfig(), test))
+    assert server.requests["login"] == 1
+    assert server.responses[401] == 1
+
+
+def test_relogin_happens_once() -> None:
+    """A request rejected again after logging in fails instead of looping."""
+
+    async def test(create_api) -> None:
+        api = create_api()
+        api.set_credentials("a@b", "x")
+        with pytest.raises(LibreLinkAPIAuthenticationError):
+            await api.async_get_data()
+
+    server = asyncio.run(_async_run(MockServerConfig(unauthorized_rate=1.0), test))
+    assert server.requests["login"] == 2
+    assert server.requests["connections"] == 2
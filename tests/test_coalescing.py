@@ -0,0 +1,68 @@
+"""Tests of the coalescing of concurrent identical API requests."""
+
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+import pytest
+
+from benchmarks.mock_server import MockLibreLinkServer, MockServerConfig, _patient_id
+from custom_components.librelink.api import LibreLinkAPI
+
+
+async def _async_run(config: MockServerConfig, test) -> MockLibreLinkServer:
+    async with MockLibreLinkServer(
+        config
+    ) as server, aiohttp.ClientSession() as session:
+        api = LibreLinkAPI(base_url=server.url, session=session)
+        api.set_credentials("a@b", "x")
+        await test(api)
+    return server
+
+
+def test_concurrent_polls_share_one_request() -> None:
+    """Concurrent polls of an account send a single request."""
+
+    async def test(api: LibreLinkAPI) -> None:
+        results = await asyncio.gather(*(api.async_get_data() for _ in range(5)))
+        assert all(result == results[0] for result in results)
+        assert api.coalesced == 4
+
+        # A later poll is sent again.
+        await api.async_get_data()
+        assert api.coalesced == 4
+
+    server = asyncio.run(_async_run(MockServerConfig(patients=2, latency=0.1), test))
+    assert server.requests["connections"] == 2
+    assert server.requests["login"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_others() -> None:
+    """The request goes on for the callers still waiting for it."""
+
+    async def test(api: LibreLinkAPI) -> None:
+        cancelled = asyncio.ensure_future(api.async_get_data())
+        waiting = asyncio.ensure_future(api.async_get_data())
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert await waiting
+
+    server = asyncio.run(_async_run(MockServerConfig(latency=0.1), test))
+    assert server.requests["connections"] == 1
+
+
+def test_different_requests_are_not_coalesced() -> None:
+    """Requests of different patients are sent on their own, after a single login."""
+
+    async def test(api: LibreLinkAPI) -> None:
+        await asyncio.gather(
+            api.async_get_graph(_patient_id(0)), api.async_get_graph(_patient_id(1))
+        )
+        assert api.coalesced == 1
+
+    server = asyncio.run(_async_run(MockServerConfig(patients=2, latency=0.1), test))
+    assert server.requests["graph"] == 2
+    assert server.requests["login"] == 1
@@ -0,0 +1,148 @@
+"""Tests of the listener notification of the coordinator."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import aiohttp
+from homeassistant.util import dt as dt_util
+import pytest
+
+from benchmarks.common import create_hass
+from benchmarks.mock_server import MockLibreLinkServer, MockServerConfig, _patient_id
+from custom_components.librelink.api import LibreLinkAPI
+from custom_components.librelink.const import (
+    SHARD_STABLE_INTERVAL_SECONDS,
+    SHARDING_MIN_PATIENTS,
+)
+from custom_components.librelink.coordinator import LibreLinkDataUpdateCoordinator
+from custom_components.librelink.scheduler import near_target
+from custom_components.librelink.store import LibreLinkStore
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+USERNAME = "account@example.com"
+
+
+class _Listeners:
+    """Listeners of every patient and of the account, counting their calls."""
+
+    def __init__(self, coordinator: LibreLinkDataUpdateCoordinator) -> None:
+        self.coordinator = coordinator
+        self.calls: Counter[str | None] = Counter()
+        self.changes: dict[str, set[str] | None] = {}
+        for pid in [None, *coordinator.data]:
+            coordinator.async_add_listener(self._listener(pid), pid)
+
+    def _listener(self, pid: str | None) -> Callable[[], None]:
+        def update() -> None:
+            self.calls[pid] += 1
+            if pid is not None:
+                self.changes[pid] = self.coordinator.changed_fields(pid)
+
+        return update
+
+    def notified(self) -> set[str]:
+        """Return the patients notified since the last call."""
+        notified = {pid for pid in self.calls if pid is not None}
+        assert self.calls[None] == 1
+        self.calls.clear()
+        return notified
+
+
+async def _async_run(
+    tmp_path: Path,
+    patients: int,
+    test: Callable[
+        [LibreLinkDataUpdateCoordinator, MockLibreLinkServer], Awaitable[None]
+    ],
+) -> None:
+    """Run a test on a coordinator tracking every patient of the mock server."""
+    hass = create_hass(str(tmp_path))
+    async with MockLibreLinkServer(
+        MockServerConfig(patients=patients)
+    ) as server, aiohttp.ClientSession() as session:
+        server.now = START
+        api = LibreLinkAPI(base_url=server.url, session=session)
+        await api.async_login(USERNAME, "password")
+        store = LibreLinkStore(hass, USERNAME)
+        coordinator = LibreLinkDataUpdateCoordinator(
+            hass=hass, api=api, patient_id=_patient_id(0), store=store
+        )
+        for index in range(1, patients):
+            coordinator.register_patient(_patient_id(index))
+        try:
+            await test(coordinator, server)
+        finally:
+            await coordinator.async_shutdown()
+            await store.async_shutdown()
+
+
+def test_only_changed_patients_are_notified(tmp_path: Path) -> None:
+    """A poll notifies the listeners of the patients whose data changed."""
+
+    async def test(coordinator, server) -> None:
+        await coordinator.async_refresh()
+        listeners = _Listeners(coordinator)
+        pids = set(coordinator.data)
+
+        # Nothing new upstream: only the listeners of the account are called.
+        await coordinator.async_refresh()
+        assert listeners.notified() == set()
+        assert coordinator.changed_fields(_patient_id(0)) == set()
+
+        # New readings: only the measurement changed.
+        server.now += timedelta(minutes=1)
+        await coordinator.async_refresh()
+        assert listeners.notified() == pids
+        assert all(changes == {"measurement"} for changes in listeners.changes.values())
+
+    asyncio.run(_async_run(tmp_path, 3, test))
+
+
+def test_pushed_data_notifies_everyone(tmp_path: Path) -> None:
+    """Data set outside of a poll updates every listener."""
+
+    async def test(coordinator, server) -> None:
+        await coordinator.async_refresh()
+        listeners = _Listeners(coordinator)
+
+        coordinator.async_set_updated_data(dict(coordinator.data))
+        assert listeners.notified() == set(coordinator.data)
+        assert all(changes is None for changes in listeners.changes.values())
+
+    asyncio.run(_async_run(tmp_path, 3, test))
+
+
+def test_stable_patients_are_notified_in_turn(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Patients of large accounts far from their target wait for their shard."""
+    server_now = [START]
+    monkeypatch.setattr(dt_util, "utcnow", lambda: server_now[0])
+
+    async def test(coordinator, server) -> None:
+        await coordinator.async_refresh()
+        # The second poll notifies every shard a first time, planning the next ones.
+        await coordinator.async_refresh()
+        listeners = _Listeners(coordinator)
+        pids = set(coordinator.data)
+
+        notified = []
+        for _ in range(SHARD_STABLE_INTERVAL_SECONDS // 60 + 1):
+            server.now = server_now[0] = server.now + timedelta(minutes=1)
+            await coordinator.async_refresh()
+            notified.append(listeners.notified())
+            near = {pid for pid, data in coordinator.data.items() if near_target(data)}
+            assert near <= notified[-1] < pids
+            assert all(
+                listeners.changes[pid] == {"measurement"} for pid in notified[-1]
+            )
+
+        assert set().union(*notified) == pids
+        assert sum(coordinator.shards.values()) == len(pids)
+
+    asyncio.run(_async_run(tmp_path, SHARDING_MIN_PATIENTS + 5, test))
@@ -0,0 +1,146 @@
+"""Tests of the per-patient glucose ring buffer and its rolling windows."""
+
+from __future__ import annotations
+
+from array import array
+from datetime import UTC, datetime, timedelta
+import statistics
+
+import pytest
+
+from custom_components.librelink.api import Measurement, Target
+from custom_components.librelink.const import AGP_BUCKET_MINUTES, AGP_PERCENTILES
+from custom_components.librelink.history import (
+    AmbulatoryGlucoseProfile,
+    GlucoseHistory,
+    percentile,
+)
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+TARGET = Target(high=180, low=70)
+
+
+def _append(history: GlucoseHistory, seconds: int, value: int) -> bool:
+    return history.append(
+        Measurement(value=value, timestamp=START + timedelta(seconds=seconds), trend=3),
+        TARGET,
+    )
+
+
+def test_window_keeps_the_last_readings() -> None:
+    """A window only accounts for the readings of its last seconds."""
+    history = GlucoseHistory()
+    window = history.add_window(600)
+    for minute in range(30):
+        _append(history, minute * 60, 100 + minute)
+
+    # Readings of minutes 20 to 29, the one of minute 19 is exactly 600s old.
+    assert window.count == 10
+    assert window.sum == sum(range(120, 130))
+    assert window.statistics.mean == pytest.approx(124.5)
+
+
+def test_window_ranges() -> None:
+    """Readings are classified against the target range."""
+    history = GlucoseHistory()
+    window = history.add_window(3600)
+    for minute, value in enumerate((60, 100, 150, 200)):
+        _append(history, minute * 60, value)
+
+    statistics = window.statistics
+    assert statistics.time_below_range == 25
+    assert statistics.time_in_range == 50
+    assert statistics.time_above_range == 25
+
+
+def test_window_slope() -> None:
+    """The fitted slope and projection follow a linear trend."""
+    history = GlucoseHistory()
+    window = history.add_window(900)
+    assert window.slope is None
+    for minute in range(15):
+        _append(history, minute * 60, 100 + 2 * minute)
+
+    assert window.slope * 60 == pytest.approx(2)
+    assert window.statistics.rate_of_change == pytest.approx(2)
+    assert window.projection(600) == pytest.approx(100 + 2 * 14 + 20)
+
+
+def test_older_reading_is_ignored() -> None:
+    """A reading not newer than the last one is not appended."""
+    history = GlucoseHistory()
+    window = history.add_window(600)
+    assert _append(history, 60, 100)
+    assert not _append(history, 60, 110)
+    assert not _append(history, 0, 120)
+    assert window.count == 1
+
+
+def test_dense_readings_stay_in_window() -> None:
+    """Readings closer together than the measurement interval are all kept."""
+    history = GlucoseHistory()
+    window = history.add_window(3600)
+    for index in range(200):
+        _append(history, index * 20, 100)
+
+    # Readings of the last hour, one every 20 seconds.
+    assert window.count == 180
+    assert len(history.readings()) >= window.count
+
+
+def test_window_added_later_takes_kept_readings() -> None:
+    """A window registered after readings were appended accounts for them."""
+    history = GlucoseHistory()
+    history.add_window(3600)
+    for minute in range(30):
+        _append(history, minute * 60, 100)
+
+    window = history.add_window(600)
+    assert window.count == 10
+    assert history.add_window(600) is window
+
+
+def test_percentile_interpolates() -> None:
+    """Percentiles interpolate between the closest sorted values."""
+    values = array("H", [10, 20, 30, 40])
+    assert percentile(values, 0) == 10
+    assert percentile(values, 50) == 25
+    assert percentile(values, 100) == 40
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    assert percentile(values, 5) == pytest.approx(quantiles[4])
+
+
+def test_profile_percentiles_by_time_of_day() -> None:
+    """Readings of every day are ranked with the ones of the same time of day."""
+    history = GlucoseHistory()
+    profile = history.add_window(3 * 86400, AmbulatoryGlucoseProfile)
+    values: dict[int, list[int]] = {}
+    for minute in range(3 * 24 * 60):
+        value = 70 + (minute * 37) % 150
+        _append(history, minute * 60, value)
+        bucket = minute % (24 * 60) // AGP_BUCKET_MINUTES
+        values.setdefault(bucket, []).append(value)
+
+    assert profile.count == sum(len(bucket) for bucket in values.values())
+    for bucket, percentiles in enumerate(profile.percentiles):
+        expected = statistics.quantiles(values[bucket], n=100, method="inclusive")
+        assert percentiles == pytest.approx(
+            [expected[rank - 1] for rank in AGP_PERCENTILES]
+        )
+
+    rows = profile.profile()
+    assert rows[1]["time"] == f"00:{AGP_BUCKET_MINUTES:02d}"
+    assert rows[1]["readings"] == len(values[1])
+
+
+def test_profile_forgets_expired_readings() -> None:
+    """Buckets whose readings all left the window are dropped from the profile."""
+    history = GlucoseHistory()
+    profile = history.add_window(86400, AmbulatoryGlucoseProfile)
+    _append(history, 0, 100)
+    assert profile.percentiles[0] == (100,) * len(AGP_PERCENTILES)
+
+    _append(history, 86400 + 6 * 3600, 120)
+    assert profile.percentiles[0] is None
+    assert [row["time"] for row in profile.profile()] == ["06:00"]
+    assert profile.as_dict()["readings"] == 1
@@ -0,0 +1,127 @@
+"""Tests of the events fired for the new logbook entries."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from benchmarks.mock_server import build_patient
+from custom_components.librelink import logbook
+from custom_components.librelink.api import LogbookEntry, Patient
+from custom_components.librelink.const import LOGBOOK_LOOKBACK_SECONDS
+from custom_components.librelink.logbook import LibreLinkLogbook, SeenIndex
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+PATIENT = Patient.from_api_response_data(build_patient(0, START))
+
+
+def _entry(minutes: float) -> LogbookEntry:
+    return LogbookEntry(
+        timestamp=START + timedelta(minutes=minutes),
+        type=1,
+        value=60,
+        trend=3,
+        alarm_type=0,
+        is_high=False,
+        is_low=True,
+    )
+
+
+class _Hass:
+    """Home Assistant keeping the events fired and the background tasks."""
+
+    def __init__(self) -> None:
+        self.events: list[dict] = []
+        self.tasks: list[asyncio.Task] = []
+        self.bus = self
+
+    def async_fire(self, event_type: str, data: dict) -> None:
+        self.events.append(data)
+
+    def async_create_background_task(self, target, name: str) -> asyncio.Task:
+        self.tasks.append(task := asyncio.ensure_future(target))
+        return task
+
+
+class _API:
+    """API serving the logbook set by the test."""
+
+    def __init__(self) -> None:
+        self.entries: list[LogbookEntry] = []
+
+    async def async_get_logbook(self, patient_id: str) -> list[LogbookEntry]:
+        return sorted(self.entries, key=lambda entry: entry.timestamp)
+
+
+class _Store:
+    """Store keeping the logbook cursors in memory."""
+
+    def __init__(self) -> None:
+        self.cursors: dict[str, tuple[datetime, list[str]]] = {}
+
+    def logbook_cursor(self, patient_id: str) -> tuple[datetime, list[str]] | None:
+        return self.cursors.get(patient_id)
+
+    def async_set_logbook_cursor(
+        self, patient_id: str, cursor: datetime, ids: list[str]
+    ) -> None:
+        self.cursors[patient_id] = (cursor, ids)
+
+
+@pytest.fixture(autouse=True)
+def _no_interval(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Let every poll fetch the logbook."""
+    monkeypatch.setattr(logbook, "LOGBOOK_INTERVAL_SECONDS", 0)
+
+
+def _run(polls: list[list[float]], restart: bool = False) -> list[list[datetime]]:
+    """Poll the logbook holding the given entries, return the times fired by poll."""
+
+    async def run() -> list[list[datetime]]:
+        hass, api, store = _Hass(), _API(), _Store()
+        fired = []
+        for entries in polls:
+            if restart or not fired:
+                book = LibreLinkLogbook(hass, api, store)
+            api.entries = [_entry(minutes) for minutes in entries]
+            book.async_poll([PATIENT])
+            await asyncio.gather(*hass.tasks)
+            fired.append([event["timestamp"] for event in hass.events])
+            hass.events.clear()
+        return fired
+
+    return asyncio.run(run())
+
+
+def _times(*minutes: float) -> list[str]:
+    return [(START + timedelta(minutes=m)).isoformat() for m in minutes]
+
+
+def test_new_entries_fire_once() -> None:
+    """Past entries are recorded on the first poll, new ones fire once."""
+    fired = _run([[0, 10], [0, 10, 20], [0, 10, 20], [10, 20, 30, 40]])
+    assert fired == [[], _times(20), [], _times(30, 40)]
+
+
+def test_late_upload_fires() -> None:
+    """An entry uploaded late fires, unless older than the lookback."""
+    lookback = LOGBOOK_LOOKBACK_SECONDS / 60
+    fired = _run([[0], [0, 60], [-10, 0, 60], [-lookback, 0, 60]])
+    assert fired == [[], _times(60), _times(-10), []]
+
+
+def test_restart_does_not_fire_again() -> None:
+    """Entries seen before a restart do not fire after it."""
+    fired = _run([[0, 10], [0, 10, 20], [0, 10, 20, 30]], restart=True)
+    assert fired == [[], _times(20), _times(30)]
+
+
+def test_seen_index_forgets_the_oldest() -> None:
+    """The index keeps the ids of the last entries only."""
+    seen = SeenIndex(["a", "b"], size=3)
+    seen.add("c")
+    seen.add("d")
+    assert "a" not in seen
+    assert seen.as_list() == ["b", "c", "d"]
@@ -0,0 +1,101 @@
+"""Tests of the predicted high and low binary sensors."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+
+from benchmarks.mock_server import build_patient
+from custom_components.librelink.api import Measurement, Patient
+from custom_components.librelink.binary_sensor import (
+    PredictedHighSensor,
+    PredictedLowSensor,
+    PredictedSensor,
+)
+from custom_components.librelink.history import GlucoseHistory
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+MINUTES = 15
+HYSTERESIS = 10
+
+
+class _Coordinator:
+    """Coordinator serving one patient whose readings are set by the test."""
+
+    last_update_success = True
+
+    def __init__(self) -> None:
+        self.patient = Patient.from_api_response_data(build_patient(0, START))
+        self.data = {self.patient.id: self.patient}
+        self.histories = {self.patient.id: GlucoseHistory()}
+
+    def patient_available(self, patient_id: str) -> bool:
+        return True
+
+    def changed_fields(self, patient_id: str) -> None:
+        return None
+
+    def read(self, minute: int, value: int) -> None:
+        measurement = Measurement(
+            value=value, timestamp=START + timedelta(minutes=minute), trend=3
+        )
+        patient = self.data[self.patient.id] = replace(
+            self.patient, measurement=measurement
+        )
+        self.histories[patient.id].append(measurement, patient.target)
+
+
+def _run(sensor_class: type[PredictedSensor], values: list[int]) -> list[tuple]:
+    """Feed one reading per minute, return the projections and states."""
+    coordinator = _Coordinator()
+    sensor = sensor_class(coordinator, coordinator.patient.id, MINUTES, HYSTERESIS)
+    states = []
+    for minute, value in enumerate(values):
+        coordinator.read(minute, value)
+        sensor._update_cache()
+        states.append((sensor.window.projection(MINUTES * 60), sensor.is_on))
+    return states
+
+
+def _check(states: list[tuple], threshold: int, sign: int) -> None:
+    """Check the state against the projection, moved by the hysteresis once on."""
+    on = False
+    band = 0
+    for projection, is_on in states:
+        if projection is None:
+            assert not is_on
+            continue
+        beyond = sign * (projection - threshold)
+        assert is_on == (beyond >= (-HYSTERESIS if on else 0))
+        band += is_on and beyond < 0
+        on = is_on
+    assert band, "the projection never stayed within the hysteresis band"
+    assert not on
+
+
+def test_predicted_high_has_hysteresis() -> None:
+    """A rise turns the warning on, it only goes off once clearly below."""
+    values = [100 + 3 * minute for minute in range(20)] + [160] * 25
+    states = _run(PredictedHighSensor, values)
+    assert any(is_on for _, is_on in states)
+    _check(states, 180, 1)
+
+
+def test_predicted_low_has_hysteresis() -> None:
+    """A fall turns the warning on, it only goes off once clearly above."""
+    values = [150 - 3 * minute for minute in range(20)] + [90] * 25
+    states = _run(PredictedLowSensor, values)
+    assert any(is_on for _, is_on in states)
+    _check(states, 70, -1)
+
+
+def test_no_prediction_without_trend() -> None:
+    """The sensor is unavailable and off until a trend can be fitted."""
+    coordinator = _Coordinator()
+    sensor = PredictedLowSensor(
+        coordinator, coordinator.patient.id, MINUTES, HYSTERESIS
+    )
+    coordinator.read(0, 40)
+    sensor._update_cache()
+    assert not sensor.available
+    assert not sensor.is_on
@@ -0,0 +1,69 @@
+"""Tests of the poll scheduler aligned on the measurement cadence."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from benchmarks.mock_server import build_patient
+from custom_components.librelink.api import Patient
+from custom_components.librelink.const import (
+    MEASUREMENT_INTERVAL_SECONDS,
+    POLL_RETRY_INTERVAL_SECONDS,
+)
+from custom_components.librelink.scheduler import PollScheduler
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+# Seconds a reading takes to reach LibreView.
+UPLOAD_DELAY = 20
+
+
+def _patient(index: int, reading: datetime) -> Patient:
+    return Patient.from_api_response_data(build_patient(index, reading))
+
+
+def _uploaded(now: datetime) -> datetime:
+    """Return the time of the last reading uploaded at `now`, one per minute."""
+    seconds = int((now - START).total_seconds()) - UPLOAD_DELAY
+    return START + timedelta(seconds=seconds - seconds % MEASUREMENT_INTERVAL_SECONDS)
+
+
+def _simulate(polls: int, stale: datetime | None = None) -> list[float]:
+    """Poll a fresh patient, and a stale one last read at `stale` if given."""
+    scheduler = PollScheduler()
+    now = START + timedelta(minutes=5, seconds=UPLOAD_DELAY + 1)
+    delays = []
+    for _ in range(polls):
+        patients = [_patient(0, _uploaded(now))]
+        if stale is not None:
+            patients.append(_patient(1, stale))
+        delay = scheduler.next_interval(patients, now).total_seconds()
+        delays.append(delay)
+        now += timedelta(seconds=delay)
+    return delays
+
+
+def test_polls_once_per_reading() -> None:
+    """Polls follow the measurement cadence, just after every upload."""
+    delays = _simulate(20)
+    assert all(
+        MEASUREMENT_INTERVAL_SECONDS <= delay <= MEASUREMENT_INTERVAL_SECONDS + 10
+        for delay in delays[2:]
+    )
+
+
+def test_stale_patient_does_not_shorten_polls() -> None:
+    """A disconnected sensor among fresh ones keeps the measurement cadence."""
+    delays = _simulate(20, stale=START)
+    assert delays[2:] == _simulate(20)[2:]
+
+
+def test_missing_reading_is_retried() -> None:
+    """A poll without a new reading is retried on a short interval."""
+    scheduler = PollScheduler()
+    now = START + timedelta(seconds=UPLOAD_DELAY)
+    patients = [_patient(0, START)]
+    scheduler.next_interval(patients, now)
+    now += timedelta(minutes=1)
+    delay = scheduler.next_interval(patients, now)
+    assert delay == timedelta(seconds=POLL_RETRY_INTERVAL_SECONDS)
+    assert scheduler.misses == 1
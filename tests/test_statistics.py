@@ -0,0 +1,182 @@
+"""Tests of the glucose statistics published to the recorder."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+from homeassistant.util import dt as dt_util
+import pytest
+
+from benchmarks.mock_server import build_patient
+from custom_components.librelink import statistics
+from custom_components.librelink.api import Measurement, Patient
+from custom_components.librelink.const import LONG_TERM_STATISTICS_SECONDS
+from custom_components.librelink.statistics import (
+    GLUCOSE,
+    LibreLinkHistoryBackfill,
+    LibreLinkStatisticsWriter,
+    aggregate,
+    imported_hour,
+)
+
+HOUR = timedelta(seconds=LONG_TERM_STATISTICS_SECONDS)
+START = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+class _Store:
+    """Store keeping the backfill cursors in memory."""
+
+    def __init__(self) -> None:
+        self.cursors: dict[str, datetime] = {}
+
+    def backfill_cursor(self, patient_id: str) -> datetime | None:
+        return self.cursors.get(patient_id)
+
+    def async_set_backfill_cursor(self, patient_id: str, cursor: datetime) -> None:
+        self.cursors[patient_id] = cursor
+
+
+class _API:
+    """API serving a reading every 15 minutes of the last 12 hours."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+        self.calls = 0
+
+    async def async_get_graph(self, patient_id: str) -> list[Measurement]:
+        self.calls += 1
+        return [
+            Measurement(value=100, timestamp=self.now - minutes * HOUR / 60, trend=None)
+            for minutes in range(12 * 60, 0, -15)
+        ]
+
+
+@pytest.fixture
+def imported(monkeypatch: pytest.MonkeyPatch) -> list[tuple]:
+    """Capture the statistics imported, by patient."""
+    calls = []
+    monkeypatch.setattr(
+        statistics,
+        "import_statistics",
+        lambda hass, pid, name, buckets: calls.append((pid, buckets)),
+    )
+    return calls
+
+
+def _reading(patient: Patient, at: datetime, value: int = 100) -> Patient:
+    measurement = Measurement(value=value, timestamp=at, trend=3)
+    return replace(patient, measurement=measurement)
+
+
+def test_aggregate_by_hour() -> None:
+    """Readings are summarized per hour, with the time spent in each range."""
+    patient = Patient.from_api_response_data(build_patient(0, START))
+    readings = [(0, 60), (20, 100), (40, 200), (70, 150)]
+    buckets = aggregate(
+        [
+            _reading(patient, START + timedelta(minutes=minutes), value).measurement
+            for minutes, value in reversed(readings)
+        ],
+        patient.target,
+        LONG_TERM_STATISTICS_SECONDS,
+    )
+
+    assert [bucket.start for bucket in buckets] == [
+        START.timestamp(),
+        (START + HOUR).timestamp(),
+    ]
+    first = buckets[0].statistics()
+    assert first[GLUCOSE]["mean"] == pytest.approx(120)
+    assert (first[GLUCOSE]["min"], first[GLUCOSE]["max"]) == (60, 200)
+    assert [
+        first[kind]["mean"]
+        for kind in ("time_below_range", "time_in_range", "time_above_range")
+    ] == [pytest.approx(100 / 3)] * 3
+    assert buckets[1].statistics()["time_in_range"]["mean"] == 100
+
+
+def _writer() -> tuple[LibreLinkStatisticsWriter, _Store]:
+    hass = SimpleNamespace(config=SimpleNamespace(components={"recorder"}))
+    store = _Store()
+    return LibreLinkStatisticsWriter(hass, store), store
+
+
+def test_writer_imports_complete_hours(imported: list[tuple]) -> None:
+    """An hour is imported once over, unless its first readings may be missing."""
+    writer, store = _writer()
+    patient = Patient.from_api_response_data(build_patient(0, START))
+    for minutes in range(30, 150):
+        writer.add(_reading(patient, START + timedelta(minutes=minutes)))
+
+    # The hour just over is only imported after a delay.
+    assert writer.flush(START + 2 * HOUR + timedelta(minutes=1)) == {patient.id}
+    assert not imported
+
+    assert writer.flush(START + 2 * HOUR + timedelta(minutes=10)) == set()
+    ((pid, buckets),) = imported
+    assert [(bucket.start, bucket.count) for bucket in buckets] == [
+        ((START + HOUR).timestamp(), 60)
+    ]
+    assert store.cursors[pid] == START + 2 * HOUR
+
+
+def test_writer_skips_hour_after_reconnection(imported: list[tuple]) -> None:
+    """The hour polling resumed in is left to the backfill."""
+    writer, store = _writer()
+    patient = Patient.from_api_response_data(build_patient(0, START))
+    writer.add(_reading(patient, START))
+    writer.add(_reading(patient, START + HOUR))
+    writer.reset()
+    writer.add(_reading(patient, START + HOUR + timedelta(minutes=30)))
+    writer.add(_reading(patient, START + 2 * HOUR))
+
+    assert writer.flush(START + 3 * HOUR) == {patient.id}
+    assert not imported
+    assert not store.cursors
+
+
+def _backfill(store: _Store, api: _API) -> None:
+    hass = SimpleNamespace(config=SimpleNamespace(components={"recorder"}))
+    patient = Patient.from_api_response_data(build_patient(0, api.now))
+    backfill = LibreLinkHistoryBackfill(hass, api, store)
+    asyncio.run(backfill.async_backfill([patient]))
+
+
+def test_backfill_imports_complete_hours(imported: list[tuple]) -> None:
+    """Only the hours already over are imported, and the cursor moves past them."""
+    now = dt_util.utcnow()
+    store = _Store()
+    _backfill(store, _API(now))
+
+    ((pid, buckets),) = imported
+    current_hour = imported_hour(now)
+    assert store.cursors[pid] == current_hour
+    assert all(bucket.start < current_hour.timestamp() for bucket in buckets)
+    assert all(bucket.count <= 4 for bucket in buckets)
+    assert len(buckets) in (11, 12)
+
+
+def test_backfill_resumes_from_cursor(imported: list[tuple]) -> None:
+    """Hours already imported are not imported twice."""
+    now = dt_util.utcnow()
+    store = _Store()
+    api = _API(now)
+    _backfill(store, api)
+    current_hour = next(iter(store.cursors.values()))
+
+    _backfill(store, api)
+    assert api.calls == 1
+
+    for pid in store.cursors:
+        store.cursors[pid] = current_hour - 2 * HOUR
+    imported.clear()
+    _backfill(store, api)
+    ((_, buckets),) = imported
+    assert [bucket.start for bucket in buckets] == [
+        (current_hour - 2 * HOUR).timestamp(),
+        (current_hour - HOUR).timestamp(),
+    ]
+    assert all(bucket.count == 4 for bucket in buckets)
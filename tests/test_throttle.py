@@ -0,0 +1,114 @@
+"""Tests of the circuit breaker of the LibreView hosts."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+from benchmarks.mock_server import MockLibreLinkServer, MockServerConfig
+from custom_components.librelink.api import LibreLinkAPI, LibreLinkAPIRateLimitError
+from custom_components.librelink.throttle import CircuitBreaker, HostThrottleRegistry
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    """Record enough failures in a row to open the circuit."""
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+
+
+def test_circuit_opens_after_threshold() -> None:
+    """The circuit opens on the threshold-th failure in a row only."""
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_answer_closes_circuit() -> None:
+    """Any answer from the host closes the circuit."""
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    _trip(breaker)
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_single_trial_once_cooled_down() -> None:
+    """Only one trial goes through, a failed one opens the circuit again."""
+    breaker = CircuitBreaker(threshold=2, cooldown=0)
+    _trip(breaker)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.trips == 2
+    assert breaker.allow()
+
+
+def test_failed_trial_doubles_cooldown(monkeypatch: pytest.MonkeyPatch) -> None:
+    """The cooldown doubles after each failed trial, up to its maximum."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(threshold=1, cooldown=10, max_cooldown=30)
+    _trip(breaker)
+
+    for cooldown in (10, 20, 30, 30):
+        now[0] += cooldown - 1
+        assert breaker.state == "open"
+        now[0] += 1
+        assert breaker.allow()
+        breaker.record_failure()
+
+    breaker.record_success()
+    _trip(breaker)
+    now[0] += 10
+    assert breaker.state == "half_open"
+
+
+async def _async_trial(config: MockServerConfig, cancel: bool = False) -> None:
+    async with MockLibreLinkServer(
+        config
+    ) as server, aiohttp.ClientSession() as session:
+        throttles = HostThrottleRegistry()
+        api = LibreLinkAPI(base_url=server.url, session=session, throttles=throttles)
+        # A breaker without cooldown lets the trial through right away.
+        breaker = throttles.get(server.url).breaker = CircuitBreaker(cooldown=0)
+        _trip(breaker)
+        assert breaker.state == "half_open"
+
+        if cancel:
+            task = asyncio.ensure_future(api.async_login("a@b", "x"))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The trial is over, the circuit lets another one through.
+            assert breaker.allow()
+        else:
+            with pytest.raises(LibreLinkAPIRateLimitError):
+                await api.async_login("a@b", "x")
+            assert breaker.state == "closed"
+
+
+def test_rate_limited_trial_closes_circuit() -> None:
+    """A trial answered with a 429 closes the circuit."""
+    asyncio.run(
+        _async_trial(
+            MockServerConfig(rate_limited_rate=1.0, retry_after=0, fail_logins=True)
+        )
+    )
+
+
+def test_cancelled_trial_releases_circuit() -> None:
+    """A cancelled trial does not keep the circuit open."""
+    asyncio.run(_async_trial(MockServerConfig(latency=1.0), cancel=True))
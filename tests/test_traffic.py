@@ -0,0 +1,103 @@
+"""Tests of the recording and offline replay of the API traffic."""
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import aiohttp
+import pytest
+
+from benchmarks.mock_server import MockLibreLinkServer, MockServerConfig
+from custom_components.librelink.api import (
+    AuthTicket,
+    LibreLinkAPI,
+    LibreLinkAPIConnectionError,
+)
+from custom_components.librelink.const import CONNECTION_URL, LOGIN_URL
+from custom_components.librelink.traffic import (
+    REDACTED,
+    ReplaySession,
+    TrafficRecorder,
+    read_recording,
+)
+
+
+async def _async_record(path: Path) -> list:
+    """Log in and poll twice against the mock server, recording the traffic."""
+    async with MockLibreLinkServer(
+        MockServerConfig(patients=2)
+    ) as server, aiohttp.ClientSession() as session:
+        api = LibreLinkAPI(base_url=server.url, session=session)
+        api.recorder = TrafficRecorder(path)
+        await api.async_login("a@b", "secret")
+        await api.async_get_data()
+        patients = await api.async_get_data()
+        await api.recorder.async_close()
+    return patients
+
+
+async def _async_replay(path: Path) -> tuple[list, ReplaySession]:
+    session = ReplaySession(read_recording(path), speed=0)
+    api = LibreLinkAPI(base_url="http://replay", session=session)
+    await api.async_authenticate(
+        "replay",
+        "replay",
+        ticket=AuthTicket(token="replay", expires=2**31 - 1, account_id="replay"),
+    )
+    await api.async_get_data()
+    return await api.async_get_data(), session
+
+
+def test_recording_is_redacted(tmp_path: Path) -> None:
+    """Credentials and tokens never reach the recording."""
+    path = tmp_path / "account.jsonl.gz"
+    asyncio.run(_async_record(path))
+
+    exchanges = list(read_recording(path))
+    assert [exchange["url"] for exchange in exchanges] == [
+        LOGIN_URL,
+        CONNECTION_URL,
+        CONNECTION_URL,
+    ]
+    assert exchanges[0]["request"] == {"email": REDACTED, "password": REDACTED}
+    assert exchanges[0]["response"]["data"]["authTicket"]["token"] == REDACTED
+    assert exchanges[1]["response"]["ticket"]["token"] == REDACTED
+
+
+def test_replay_serves_the_recorded_patients(tmp_path: Path) -> None:
+    """Replaying a recording returns what the host returned, in order."""
+    path = tmp_path / "account.jsonl.gz"
+    recorded = asyncio.run(_async_record(path))
+
+    replayed, session = asyncio.run(_async_replay(path))
+    assert replayed == recorded
+    # The login was never replayed, the persisted ticket was reused.
+    assert session.remaining == 1
+
+
+def test_replay_without_recording_fails(tmp_path: Path) -> None:
+    """A request with no recording left fails as a connection error."""
+    path = tmp_path / "account.jsonl.gz"
+    asyncio.run(_async_record(path))
+
+    async def replay_too_much() -> None:
+        session = ReplaySession(read_recording(path), speed=0)
+        api = LibreLinkAPI(base_url="http://replay", session=session)
+        await api.async_login("replay", "replay")
+        for _ in range(3):
+            await api.async_get_data()
+
+    with pytest.raises(LibreLinkAPIConnectionError):
+        asyncio.run(replay_too_much())
+
+
+def test_truncated_recording_is_readable(tmp_path: Path) -> None:
+    """A recording cut short yields the exchanges written before the cut."""
+    path = tmp_path / "account.jsonl.gz"
+    asyncio.run(_async_record(path))
+    complete = list(read_recording(path))
+
+    path.write_bytes(path.read_bytes()[:-10])
+    truncated = list(read_recording(path))
+    assert truncated == complete[: len(truncated)]